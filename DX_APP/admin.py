@@ -2,6 +2,44 @@ from django.contrib import admin
 
 # Register your models here.
 from django.contrib import admin
-from .models import Product
+from .models import CropPlan, CropPlanWeek, Disease, Product, Symptom, Treatment, UserProfile
 
 admin.site.register(Product)
+
+
+class SymptomInline(admin.TabularInline):
+    model = Symptom
+    extra = 1
+
+
+class TreatmentInline(admin.TabularInline):
+    model = Treatment
+    extra = 1
+
+
+@admin.register(Disease)
+class DiseaseAdmin(admin.ModelAdmin):
+    list_display = ('name', 'crop', 'confidence', 'featured', 'updated_at')
+    list_filter = ('crop', 'featured')
+    search_fields = ('name', 'symptoms__phrase')
+    inlines = [SymptomInline, TreatmentInline]
+
+
+class CropPlanWeekInline(admin.TabularInline):
+    model = CropPlanWeek
+    extra = 1
+
+
+@admin.register(CropPlan)
+class CropPlanAdmin(admin.ModelAdmin):
+    list_display = ('crop', 'lang', 'version', 'updated_at')
+    list_filter = ('lang',)
+    search_fields = ('crop',)
+    inlines = [CropPlanWeekInline]
+
+
+@admin.register(UserProfile)
+class UserProfileAdmin(admin.ModelAdmin):
+    list_display = ('user', 'phone', 'user_type', 'location')
+    list_filter = ('user_type',)
+    search_fields = ('user__username', 'user__email', 'phone')
@@ -0,0 +1,133 @@
+# DX_APP/alerts.py
+"""
+PriceAlert evaluation.
+
+Untriggered alerts are loaded once into an AlertIndex: per (crop, alert_type)
+a sorted array of thresholds and the matching alert ids. Evaluating a batch
+of prices then needs one aggregate per crop and one binary search per
+(crop, alert_type) group:
+
+* ``above``  fires when the highest avg_price of the crop is >= target
+* ``below``  fires when the lowest avg_price is <= target
+* ``change`` fires when the largest |trend_percentage| is >= target (a %)
+
+The alerts that fire are always a prefix or a suffix of the sorted
+thresholds. They are sliced off the index and marked with one UPDATE per
+chunk of ids, and their notifications are queued (see notifications.py).
+"""
+import numpy as np
+from django.db import transaction
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .models import PriceAlert
+from .notifications import enqueue_notifications
+
+UPDATE_CHUNK = 5000
+
+
+def crop_key(name):
+    return name.strip().casefold()
+
+
+def crop_extremes(prices):
+    """{crop: (highest avg_price, lowest avg_price, largest |trend|)} for a batch of CropPrice."""
+    extremes = {}
+    for price in prices:
+        if not price.is_active:
+            continue
+        key = crop_key(price.name)
+        value = float(price.avg_price)
+        move = abs(float(price.trend_percentage))
+        if key in extremes:
+            high, low, largest = extremes[key]
+            extremes[key] = (max(high, value), min(low, value), max(largest, move))
+        else:
+            extremes[key] = (value, value, move)
+    return extremes
+
+
+def mark_triggered(ids, now=None):
+    """Set triggered_at on the given alerts in bulk; returns the ids of the alerts this call triggered.
+
+    An alert another run triggered first is left alone and not returned, so
+    overlapping ingests never both notify for it. The rows are told apart
+    by their new triggered_at; a tie is caught by the notifications'
+    (alert, channel, triggered_at) unique constraint.
+    """
+    now = now or timezone.now()
+    ids = [int(alert_id) for alert_id in ids]
+    marked = []
+    for start in range(0, len(ids), UPDATE_CHUNK):
+        chunk = ids[start:start + UPDATE_CHUNK]
+        with transaction.atomic():
+            if PriceAlert.objects.filter(id__in=chunk, triggered_at__isnull=True).update(triggered_at=now):
+                marked += PriceAlert.objects.filter(id__in=chunk, triggered_at=now).values_list('id', flat=True)
+    return marked
+
+
+class AlertIndex:
+    """Active, untriggered alerts grouped by (crop, alert_type) with sorted thresholds."""
+
+    def __init__(self, groups):
+        self.groups = groups
+
+    @classmethod
+    def load(cls):
+        collected = {}
+        # Cast in SQL: building a million Decimals just to turn them into floats is most of the load time
+        rows = PriceAlert.objects.filter(is_active=True, triggered_at__isnull=True).values_list(
+            'crop', 'alert_type', Cast('target_price', FloatField()), 'id',
+        )
+        for crop, alert_type, target, alert_id in rows.iterator(chunk_size=10000):
+            thresholds, ids = collected.setdefault((crop_key(crop), alert_type), ([], []))
+            thresholds.append(float(target))
+            ids.append(alert_id)
+
+        groups = {}
+        for key, (thresholds, ids) in collected.items():
+            thresholds = np.array(thresholds)
+            order = np.argsort(thresholds, kind='stable')
+            groups[key] = (thresholds[order], np.array(ids, dtype=np.int64)[order])
+        return cls(groups)
+
+    def __len__(self):
+        return sum(len(ids) for thresholds, ids in self.groups.values())
+
+    def _fire(self, key, value, side):
+        """Cut the alerts reached by value off group key; side 'low' fires thresholds <= value."""
+        group = self.groups.get(key)
+        if group is None:
+            return None
+        thresholds, ids = group
+        if side == 'low':
+            cut = np.searchsorted(thresholds, value, side='right')
+            fired, self.groups[key] = ids[:cut], (thresholds[cut:], ids[cut:])
+        else:
+            cut = np.searchsorted(thresholds, value, side='left')
+            fired, self.groups[key] = ids[cut:], (thresholds[:cut], ids[:cut])
+        return fired
+
+    def match(self, prices):
+        """Ids of every alert the batch triggers; they are removed from the index."""
+        fired = []
+        for crop, (high, low, move) in crop_extremes(prices).items():
+            for key, value, side in (
+                ((crop, 'above'), high, 'low'),
+                ((crop, 'below'), low, 'high'),
+                ((crop, 'change'), move, 'low'),
+            ):
+                ids = self._fire(key, value, side)
+                if ids is not None and len(ids):
+                    fired.append(ids)
+        return np.concatenate(fired) if fired else np.empty(0, dtype=np.int64)
+
+    def evaluate(self, prices, now=None):
+        """match(), mark the triggered alerts and queue their notifications; returns the ids this call triggered."""
+        ids = self.match(prices)
+        if len(ids):
+            now = now or timezone.now()
+            ids = np.array(mark_triggered(ids, now), dtype=np.int64)
+            enqueue_notifications(ids, now)
+        return ids
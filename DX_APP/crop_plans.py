@@ -0,0 +1,99 @@
+# DX_APP/crop_plans.py
+"""
+Weekly crop plans for the recommendation result page.
+
+Plans are CropPlan/CropPlanWeek rows, one plan per (crop, language), edited
+in the admin. Each plan renders to a single HTML fragment
+(DX_APP/crop_plan.html) that lives in the template fragment cache under
+(crop, lang, version, release). Every save bumps the version, and every
+deploy that changes a template or view changes the release (see
+page_cache.release()), so an edited plan or template gets a new key and
+never needs invalidating.
+
+A request needs only the (crop, lang) -> version index, which each process
+keeps in memory and re-reads every ``CROP_PLAN_RELOAD_INTERVAL`` seconds.
+A fragment that is already cached costs one cache get. The weeks are
+queried and looped over only when a fragment is rendered for the first
+time, or ahead of time by ``warm_up()``.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.template.loader import render_to_string
+from django.utils.functional import cached_property
+
+from . import page_cache
+from .models import CropPlan, CropPlanWeek
+
+logger = logging.getLogger(__name__)
+
+LANGUAGES = [code for code, label in CropPlan.LANGUAGES]
+CACHE_TIMEOUT = getattr(settings, 'CROP_PLAN_CACHE_TIMEOUT', 86400)
+
+
+class Plan:
+    """What crop_plan.html needs; the weeks are loaded only when the fragment is rendered."""
+
+    timeout = CACHE_TIMEOUT
+
+    def __init__(self, plan_id, crop, lang, version):
+        self.id = plan_id
+        self.crop = crop
+        self.lang = lang
+        self.version = version
+
+    @property
+    def release(self):
+        return page_cache.release()
+
+    @cached_property
+    def weeks(self):
+        return list(CropPlanWeek.objects.filter(plan_id=self.id).values(
+            'week', 'task', 'medicine', 'precaution', 'icon', 'tip',
+        ))
+
+
+class PlanIndex:
+    """(crop, lang) -> Plan for every plan, re-read every check_interval seconds."""
+
+    def __init__(self, check_interval=30.0):
+        self.check_interval = check_interval
+        self._plans = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._plans is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return self._plans
+        with self._lock:
+            if self._plans is None or time.monotonic() - self._checked_at >= self.check_interval:
+                rows = CropPlan.objects.values_list('id', 'crop', 'lang', 'version')
+                self._plans = {
+                    (crop.lower(), lang): Plan(plan_id, crop.lower(), lang, version)
+                    for plan_id, crop, lang, version in rows
+                }
+                self._checked_at = time.monotonic()
+            return self._plans
+
+
+plan_index = PlanIndex(getattr(settings, 'CROP_PLAN_RELOAD_INTERVAL', 30.0))
+
+
+def crop_plan(crop, lang):
+    """The Plan to include for a recommended crop, or None when there is none in that language."""
+    return plan_index.get().get((crop.lower(), lang))
+
+
+def warm_up():
+    """Render every plan into the fragment cache now instead of on the first result page that shows it."""
+    try:
+        plans = list(plan_index.get().values())
+    except DatabaseError:
+        logger.warning('Crop plans not available yet (migrations not applied?)')
+        return 0
+    for plan in plans:
+        render_to_string('DX_APP/crop_plan.html', {'plan': plan})
+    return len(plans)
@@ -0,0 +1,263 @@
+# DX_APP/diagnosis.py
+"""
+Symptom-based disease diagnosis from the Disease/Symptom/Treatment tables.
+
+The knowledge base is read once per process into a ``KnowledgeBase`` with
+two indexes:
+
+* one Aho–Corasick automaton per crop over all symptom phrases of that
+  crop's diseases. Phrases and text are normalised to lowercase words
+  separated by single spaces and matched on word boundaries
+  ("yellow_leaves", "Yellow leaves!" and "yellow  leaves" all match the
+  phrase "yellow leaves"; "yellowish leaves" does not).
+* a TF-IDF ``SymptomIndex`` (see symptom_search.py) over each disease's
+  name, description and phrases, for descriptions that use none of the
+  phrases verbatim.
+
+``diagnose()`` ranks the diseases of the crop (and plant part) whose
+phrases occur in the description first, then the most similar ones by
+TF-IDF cosine. The phrase match costs the same however many diseases are
+stored; the ranking grows only with the diseases sharing n-grams with the
+description.
+``with_image_evidence()`` puts a confident leaf image prediction first.
+
+The tables are checked for changes every ``DISEASE_KB_RELOAD_INTERVAL``
+seconds (three aggregate queries) and the indexes are rebuilt when they
+moved, so admin edits reach every worker without a restart. The WSGI/ASGI
+entry points build them at startup with ``warm_up()``.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Count, Max
+
+from .models import Disease, Symptom, Treatment
+from .symptom_search import TOP_K, SymptomIndex
+
+logger = logging.getLogger(__name__)
+
+IMAGE_MIN_PROBABILITY = 60  # % a leaf image prediction needs to lead the diagnosis
+NON_WORD = re.compile(r'[\W_]+')
+
+
+def normalize(text):
+    """Lowercase words separated by single spaces, padded with a space on each side."""
+    return f' {NON_WORD.sub(" ", text.lower()).strip()} '
+
+
+class PhraseMatcher:
+    """Aho–Corasick automaton: finds every occurrence of many phrases in one pass."""
+
+    def __init__(self, phrases):
+        """phrases: iterable of (phrase, value); find() returns the values of those present."""
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        for phrase, value in phrases:
+            node = 0
+            for char in normalize(phrase):
+                child = self.goto[node].get(char)
+                if child is None:
+                    child = len(self.goto)
+                    self.goto[node][char] = child
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                node = child
+            self.out[node].append(value)
+
+        # Breadth-first, so every failure target is final before its children are linked
+        queue = list(self.goto[0].values())
+        for node in queue:
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                target = self.fail[node]
+                while target and char not in self.goto[target]:
+                    target = self.fail[target]
+                self.fail[child] = self.goto[target].get(char, 0) if node else 0
+                inherited = self.out[self.fail[child]]
+                if inherited:
+                    self.out[child] = self.out[child] + inherited
+
+    def find(self, text):
+        """Values of every phrase occurring in the normalised text, once per occurrence."""
+        goto, fail, out = self.goto, self.fail, self.out
+        node = 0
+        found = []
+        for char in normalize(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if out[node]:
+                found.extend(out[node])
+        return found
+
+
+class KnowledgeBase:
+    def __init__(self, diseases, matchers, index, disease_ids, candidates, featured):
+        self.diseases = diseases
+        self.matchers = matchers
+        self.index = index
+        self.disease_ids = disease_ids
+        self.rows = {disease_id: row for row, disease_id in enumerate(disease_ids)}
+        self.names = {(disease['crop'], disease['disease'].casefold()): disease_id for disease_id, disease in diseases.items()}
+        self.candidates = candidates
+        self.featured = featured
+
+    @classmethod
+    def load(cls):
+        diseases = {}
+        for disease_id, crop, name, confidence, description, causes, summary in Disease.objects.values_list(
+            'id', 'crop', 'name', 'confidence', 'description', 'causes', 'summary',
+        ):
+            diseases[disease_id] = {
+                'crop': crop, 'disease': name, 'confidence': confidence,
+                'description': description, 'causes': causes, 'summary': summary,
+                'steps': [], 'phrases': [], 'parts': set(),
+            }
+        for disease_id, step in Treatment.objects.order_by('disease', 'position', 'id').values_list('disease', 'step'):
+            diseases[disease_id]['steps'].append(step)
+        for disease_id, phrase, plant_part in Symptom.objects.values_list('disease', 'phrase', 'plant_part'):
+            diseases[disease_id]['phrases'].append(phrase)
+            diseases[disease_id]['parts'].add(plant_part)
+
+        phrases = {}
+        disease_ids = list(diseases)
+        documents = []
+        candidates = {}
+        for disease_id, disease in diseases.items():
+            for phrase in disease['phrases']:
+                phrases.setdefault(disease['crop'], []).append((phrase, (disease_id, phrase)))
+            documents.append('. '.join([disease['disease'], disease['description'], disease['summary'], *disease['phrases']]))
+            # A disease with no symptom tied to a part (or one tied to none) can show on any part
+            any_part = not disease['parts'] or '' in disease['parts']
+            for plant_part in ['', *(code for code, label in Symptom.PLANT_PARTS)]:
+                if any_part or not plant_part or plant_part in disease['parts']:
+                    candidates.setdefault((disease['crop'], plant_part), []).append(disease_id)
+            disease['treatment'] = '; '.join(disease.pop('steps'))
+            del disease['summary'], disease['phrases'], disease['parts']
+
+        matchers = {crop: PhraseMatcher(crop_phrases) for crop, crop_phrases in phrases.items()}
+        rows = {disease_id: row for row, disease_id in enumerate(disease_ids)}
+        candidates = {
+            key: (np.array([rows[disease_id] for disease_id in ids]), frozenset(ids))
+            for key, ids in candidates.items()
+        }
+
+        crop_names = dict(Disease.CROPS)
+        featured = [
+            {'name': name, 'crop': card_crop or crop_names.get(crop, crop), 'symptoms': summary, 'icon': icon,
+             'color': color}
+            for name, crop, card_crop, summary, icon, color in Disease.objects.filter(featured=True)
+            .order_by('card_position', 'id').values_list('name', 'crop', 'card_crop', 'summary', 'icon', 'color')
+        ]
+        return cls(diseases, matchers, SymptomIndex(documents), disease_ids, candidates, featured)
+
+    def diagnose(self, crop, text, plant_part=None, k=TOP_K):
+        """Up to k candidate diseases for the crop, best first, each with a 0-100 similarity score.
+
+        Diseases with symptom phrases in the text come first (most distinct
+        phrases, then similarity, then confidence); the rest are ranked by
+        TF-IDF cosine similarity and must reach symptom_search.MIN_SCORE.
+        """
+        if (crop, plant_part or '') not in self.candidates:
+            return []
+        rows, allowed = self.candidates[crop, plant_part or '']
+        scores = self.index.scores(text)
+
+        matched = Counter(
+            disease_id for disease_id, phrase in set(self.matchers[crop].find(text)) if disease_id in allowed
+        ) if crop in self.matchers else Counter()
+        ranked = sorted(matched, key=lambda disease_id: (
+            -matched[disease_id], -scores.get(self.rows[disease_id]), -self.diseases[disease_id]['confidence'],
+        ))
+        ranked += [
+            self.disease_ids[row] for row, score in scores.top(rows, k + len(ranked))
+            if self.disease_ids[row] not in matched
+        ]
+        return [self._result(disease_id, scores) for disease_id in ranked[:k]]
+
+    def lookup(self, crop, name):
+        """The crop's disease called name (any case) as a diagnose() result without a score, or None."""
+        disease_id = self.names.get((crop, name.casefold()))
+        if disease_id is None:
+            return None
+        return {key: value for key, value in self.diseases[disease_id].items() if key != 'crop'}
+
+    def _result(self, disease_id, scores):
+        result = {key: value for key, value in self.diseases[disease_id].items() if key != 'crop'}
+        result['score'] = round(scores.get(self.rows[disease_id]) * 100, 1)
+        return result
+
+
+class KnowledgeBaseCache:
+    """Holds the loaded KnowledgeBase and rebuilds it when the tables change."""
+
+    def __init__(self, check_interval=30.0):
+        self.check_interval = check_interval
+        self._current = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _table_version():
+        # Admin edits save the disease (bumping updated_at); symptom/treatment rows are counted
+        diseases = Disease.objects.aggregate(count=Count('id'), updated=Max('updated_at'))
+        details = Symptom.objects.aggregate(count=Count('id'), last=Max('id'))
+        steps = Treatment.objects.aggregate(count=Count('id'), last=Max('id'))
+        return (*diseases.values(), *details.values(), *steps.values())
+
+    def get(self):
+        if self._current is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return self._current
+        with self._lock:
+            if self._current is not None and time.monotonic() - self._checked_at < self.check_interval:
+                return self._current
+            version = self._table_version()
+            # Other threads keep the current version (fast path) while this one rebuilds
+            self._checked_at = time.monotonic()
+            if self._current is None or version != self._version:
+                self._current = KnowledgeBase.load()
+                self._version = version
+            return self._current
+
+
+knowledge_base = KnowledgeBaseCache(getattr(settings, 'DISEASE_KB_RELOAD_INTERVAL', 30.0))
+
+
+def diagnose(crop, text, plant_part=None, k=TOP_K):
+    return knowledge_base.get().diagnose(crop, text, plant_part, k)
+
+
+def with_image_evidence(candidates, crop, predictions):
+    """candidates with the disease the leaf image most likely shows (see leaf_classifier.py) moved or added to the front."""
+    best = predictions[0]
+    if best['healthy'] or best['probability'] < IMAGE_MIN_PROBABILITY:
+        return candidates
+    if best['crop'] and best['crop'].casefold() != crop:
+        return candidates
+    found = knowledge_base.get().lookup(crop, best['disease'])
+    if found is None:
+        return candidates
+    match = next((candidate for candidate in candidates if candidate['disease'] == found['disease']), found)
+    rest = [candidate for candidate in candidates if candidate is not match]
+    return [{**match, 'image_probability': best['probability']}, *rest][:TOP_K]
+
+
+def featured_diseases():
+    return knowledge_base.get().featured
+
+
+def warm_up():
+    """Build the indexes now instead of on the first diagnosis request."""
+    try:
+        knowledge_base.get()
+    except DatabaseError:
+        logger.warning('Disease knowledge base not available yet (migrations not applied?)')
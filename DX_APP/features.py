@@ -0,0 +1,53 @@
+# DX_APP/features.py
+"""
+Feature engineering shared by training (ml/train_model.py) and serving.
+
+Works on plain NumPy arrays so the serving path never has to build a
+pandas DataFrame. ``build_features`` reproduces the columns that training
+used to create with ``pd.cut``/``pd.get_dummies``, in the same order.
+"""
+import numpy as np
+
+INPUT_FEATURES = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+
+# pH buckets, right-inclusive like pd.cut: (0, 5.5] acidic, (5.5, 6.5] slightly acidic, ...
+PH_BINS = np.array([0, 5.5, 6.5, 7.5, 8.5, 14])
+PH_CATEGORIES = ['acidic', 'slightly_acidic', 'neutral', 'slightly_alkaline', 'alkaline']
+
+FEATURE_COLUMNS = INPUT_FEATURES + [
+    'N_P_ratio', 'N_K_ratio', 'temp_humidity', 'nutrient_sum',
+] + [f'ph_category_{name}' for name in PH_CATEGORIES[1:]]  # drop_first=True
+
+
+def build_features(inputs):
+    """Return the (n, 15) engineered matrix for an (n, 7) input array.
+
+    Columns follow ``FEATURE_COLUMNS``. A pH outside (0, 14] falls in no
+    bucket, so all of its one-hot columns are 0, as with ``pd.cut``.
+    """
+    inputs = np.asarray(inputs, dtype=np.float64)
+    if inputs.ndim != 2 or inputs.shape[1] != len(INPUT_FEATURES):
+        raise ValueError(f'Expected an (n, {len(INPUT_FEATURES)}) array, got shape {inputs.shape}')
+
+    N, P, K, temperature, humidity, ph = (inputs[:, i] for i in range(6))
+    out = np.empty((inputs.shape[0], len(FEATURE_COLUMNS)))
+    out[:, :7] = inputs
+    out[:, 7] = N / (P + 1)
+    out[:, 8] = N / (K + 1)
+    out[:, 9] = temperature * humidity / 100
+    out[:, 10] = N + P + K
+
+    # searchsorted(side='left') gives i with bins[i-1] < ph <= bins[i];
+    # bucket 1 is 'acidic', 0 and 6 are out of range.
+    bucket = np.searchsorted(PH_BINS, ph, side='left')
+    out[:, 11:] = bucket[:, None] == np.arange(2, len(PH_BINS))
+    return out
+
+
+def check_feature_columns(feature_columns):
+    """Raise ``ValueError`` if a model artifact expects different columns."""
+    if list(feature_columns) != FEATURE_COLUMNS:
+        raise ValueError(
+            f'Model was trained on {list(feature_columns)}, '
+            f'but build_features produces {FEATURE_COLUMNS}'
+        )
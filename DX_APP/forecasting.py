@@ -0,0 +1,99 @@
+# DX_APP/forecasting.py
+"""
+Demand forecasts for the market insights page.
+
+``run()`` (run daily by ``manage.py forecast_demand``) reads the daily
+PriceRollups of the last ``HISTORY_DAYS`` into one matrix with a row per
+(crop, market) series. Chunks of rows are fitted in a process pool with
+the vectorised models in timeseries.py. The expected price change over the
+next ``horizon`` days, against the average of the last week, is stored as
+that series' demand level. Upcoming forecasts are replaced in one
+transaction, so the page never reads a half-written run, and it serves
+them straight from the DemandForecast table.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from itertools import repeat
+
+import numpy as np
+from django.db import transaction
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from . import timeseries
+from .models import DemandForecast, PriceRollup
+from .price_history import bucket_start
+
+HORIZON = 7
+HISTORY_DAYS = 90
+MIN_OBSERVED = 2 * timeseries.SEASON
+CHUNK_SIZE = 2000
+MAX_CHANGE = 999.99  # change_percentage is Decimal(5, 2)
+
+# Lowest expected price change (%) for each demand level, highest first
+DEMAND_LEVELS = [(10, 'Very High'), (3, 'High'), (-3, 'Medium')]
+
+
+def demand_level(change):
+    for threshold, level in DEMAND_LEVELS:
+        if change >= threshold:
+            return level
+    return 'Low'
+
+
+def load_series(days=HISTORY_DAYS, until=None):
+    """(keys, matrix): one row of daily average prices per (name, market_name), NaN where no ticks."""
+    end = bucket_start(until or timezone.now(), 'day')
+    start = end - timedelta(days=days - 1)
+    rows = PriceRollup.objects.filter(period='day', bucket__gte=start, bucket__lte=end).values_list(
+        'name', 'market_name', 'bucket', Cast('price_sum', FloatField()), 'tick_count',
+    )
+    keys, positions, columns, averages = {}, [], [], []
+    for name, market_name, bucket, price_sum, tick_count in rows.iterator(chunk_size=10000):
+        positions.append(keys.setdefault((name, market_name), len(keys)))
+        columns.append((bucket - start).days)
+        averages.append(price_sum / tick_count)
+
+    matrix = np.full((len(keys), days), np.nan)
+    matrix[positions, columns] = averages
+    return list(keys), matrix
+
+
+def fit_all(matrix, horizon=HORIZON, workers=None, chunk_size=CHUNK_SIZE):
+    """timeseries.fit over row chunks, in a process pool when there is more than one chunk."""
+    chunks = [matrix[start:start + chunk_size] for start in range(0, len(matrix), chunk_size)]
+    if workers == 1 or len(chunks) <= 1:
+        results = [timeseries.fit(chunk, horizon) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(timeseries.fit, chunks, repeat(horizon)))
+    if not results:
+        return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0)
+    return tuple(np.concatenate(parts) for parts in zip(*results))
+
+
+def run(horizon=HORIZON, days=HISTORY_DAYS, workers=None, chunk_size=CHUNK_SIZE):
+    """Forecast every series with enough history and replace the upcoming forecasts; returns the count."""
+    keys, matrix = load_series(days)
+    enough = (~np.isnan(matrix)).sum(axis=1) >= MIN_OBSERVED
+    keys = [key for key, keep in zip(keys, enough) if keep]
+    best, expected, recent = fit_all(matrix[enough], horizon, workers, chunk_size)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        changes = np.clip((expected - recent) / recent * 100, -MAX_CHANGE, MAX_CHANGE)
+    changes[~(recent > 0)] = 0  # no meaningful change against a zero price
+    forecast_date = timezone.localdate() + timedelta(days=1)
+    forecasts = [
+        DemandForecast(
+            crop=name, market_name=market_name, period=f'Next {horizon} days',
+            demand_level=demand_level(change), change_percentage=Decimal(f'{change:.2f}'),
+            forecast_date=forecast_date, method=timeseries.METHODS[method],
+        )
+        for (name, market_name), method, change in zip(keys, best.tolist(), changes.tolist())
+    ]
+    with transaction.atomic():
+        DemandForecast.objects.filter(forecast_date__gte=timezone.localdate()).delete()
+        DemandForecast.objects.bulk_create(forecasts, batch_size=1000)
+    return len(forecasts)
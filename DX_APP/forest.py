@@ -0,0 +1,150 @@
+# DX_APP/forest.py
+"""
+Flat-array tree-ensemble predictor.
+
+``FlatForest.from_sklearn`` copies every tree of a fitted forest classifier
+into a few contiguous NumPy arrays (feature, threshold, children, leaf
+value). ``predict_proba`` walks all trees for all rows together with array
+indexing, which skips sklearn's per-call validation, joblib dispatch and
+per-tree Python calls. Those fixed costs dominate when scoring one row or
+a small batch; for large batches sklearn's compiled traversal wins, so
+callers should only route small batches here (see ``FLAT_MAX_ROWS``).
+
+The object only holds NumPy arrays, so a joblib dump of it can be loaded
+with ``mmap_mode='r'`` and shared by every worker process.
+"""
+import os
+import pickle
+
+import joblib
+import numpy as np
+
+# Largest batch for which the flat walk beats sklearn's compiled predict
+FLAT_MAX_ROWS = 256
+
+
+class FlatForest:
+    """Drop-in for the ``predict``/``predict_proba`` side of a forest classifier.
+
+    Node ``i`` of the concatenated trees tests ``X[:, feature[i]] <=
+    threshold[i]`` and continues at ``children[i, 1]`` (left) if true or
+    ``children[i, 0]`` (right) if false. ``value[i]`` holds the normalised
+    class distribution of leaf ``i``.
+    """
+
+    def __init__(self, feature, threshold, children, is_leaf, value, roots, classes, n_features_in):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.is_leaf = is_leaf
+        self.value = value
+        self.roots = roots
+        self.classes_ = classes
+        self.n_features_in_ = n_features_in
+
+    @classmethod
+    def from_sklearn(cls, forest):
+        """Flatten a fitted sklearn forest classifier (single output only)."""
+        if getattr(forest, 'n_outputs_', 1) != 1:
+            raise ValueError('Only single-output forests can be flattened')
+
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        offsets = np.concatenate([[0], np.cumsum([tree.node_count for tree in trees])[:-1]])
+
+        feature, threshold, children, is_leaf, value = [], [], [], [], []
+        for tree, offset in zip(trees, offsets):
+            leaf = tree.children_left == -1
+            feature.append(np.where(leaf, 0, tree.feature))
+            threshold.append(np.where(leaf, 0.0, tree.threshold))
+            children.append(np.column_stack([tree.children_right, tree.children_left]) + offset)
+            is_leaf.append(leaf)
+            leaf_value = tree.value[:, 0, :]
+            totals = leaf_value.sum(axis=1, keepdims=True)
+            # sklearn >= 1.4 stores class fractions already; older versions store counts and normalise at predict
+            if not np.allclose(totals[leaf], 1):
+                leaf_value = leaf_value / np.where(totals == 0, 1, totals)
+            value.append(leaf_value)
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(feature), dtype=np.intp),
+            threshold=np.ascontiguousarray(np.concatenate(threshold), dtype=np.float64),
+            children=np.ascontiguousarray(np.concatenate(children), dtype=np.intp),
+            is_leaf=np.concatenate(is_leaf),
+            value=np.ascontiguousarray(np.concatenate(value), dtype=np.float64),
+            roots=offsets.astype(np.intp),
+            classes=np.asarray(forest.classes_),
+            n_features_in=forest.n_features_in_,
+        )
+
+    def apply(self, X):
+        """Return the (rows, trees) matrix of leaf indices reached by ``X``."""
+        n_rows, n_trees = X.shape[0], len(self.roots)
+        values = X.ravel()
+        children = self.children.ravel()
+        row_offset = np.repeat(np.arange(n_rows) * self.n_features_in_, n_trees)
+
+        # One cursor per (row, tree); only cursors still on an internal node move
+        nodes = np.tile(self.roots, n_rows)
+        active = np.flatnonzero(~self.is_leaf[nodes])
+        while active.size:
+            current = nodes[active]
+            go_left = (
+                np.take(values, row_offset[active] + np.take(self.feature, current))
+                <= np.take(self.threshold, current)
+            )
+            current = np.take(children, 2 * current + go_left)
+            nodes[active] = current
+            active = active[~np.take(self.is_leaf, current)]
+        return nodes.reshape(n_rows, n_trees)
+
+    def predict_proba(self, X):
+        # sklearn compares float32 inputs against float64 thresholds; do the same
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f'Expected an (n, {self.n_features_in_}) array, got shape {X.shape}')
+        return np.take(self.value, self.apply(X), axis=0).mean(axis=1)
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def check_parity(forest, flat, X):
+    """Raise ``ValueError`` unless ``flat`` reproduces ``forest`` on ``X``."""
+    if not np.allclose(forest.predict_proba(X), flat.predict_proba(X), rtol=0, atol=1e-9):
+        raise ValueError('Flattened forest probabilities differ from sklearn')
+    if not np.array_equal(forest.predict(X), flat.predict(X)):
+        raise ValueError('Flattened forest predictions differ from sklearn')
+
+
+def sample_inputs(flat, n_rows, seed=0):
+    """Random rows spanning every split threshold, for parity checks and benchmarks."""
+    rng = np.random.default_rng(seed)
+    X = np.empty((n_rows, flat.n_features_in_))
+    for column in range(flat.n_features_in_):
+        used = flat.threshold[(flat.feature == column) & ~flat.is_leaf]
+        low, high = (used.min(), used.max()) if used.size else (0.0, 1.0)
+        margin = (high - low) * 0.1 + 1.0
+        X[:, column] = rng.uniform(low - margin, high + margin, n_rows)
+    return X
+
+
+def export_artifacts(source, dest):
+    """Save ``source`` as an uncompressed joblib file with a ``flat_model`` added.
+
+    The flattened forest is checked against sklearn before anything is
+    written. The file is written next to ``dest`` and moved into place
+    atomically, so running registries never see a half-written model.
+    """
+    with open(source, 'rb') as f:
+        artifacts = pickle.load(f)
+    if not isinstance(artifacts, dict):
+        artifacts = {'model': artifacts, 'label_encoder': None, 'feature_columns': None}
+
+    flat = FlatForest.from_sklearn(artifacts['model'])
+    check_parity(artifacts['model'], flat, sample_inputs(flat, 2000))
+    artifacts['flat_model'] = flat
+
+    tmp_path = f'{dest}.tmp'
+    joblib.dump(artifacts, tmp_path)
+    os.replace(tmp_path, dest)
+    return dest
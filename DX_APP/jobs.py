@@ -0,0 +1,321 @@
+# DX_APP/jobs.py
+"""
+Background jobs for work too heavy for a request: leaf image diagnoses and
+large crop recommendation batches.
+
+``submit()`` stores a Job row and returns at once. The client gets the job
+id and polls ``/api/jobs/<id>/`` or follows ``/api/jobs/<id>/stream/``.
+``Worker`` (run by ``manage.py run_jobs``, as many processes as wanted)
+drains the table; handlers run in threads of those worker processes,
+never in a web process:
+
+* claims due jobs with a lease and a claim token, like the notification
+  dispatcher, so concurrent workers never run the same job
+* runs at most ``CONCURRENCY[kind]`` jobs of each kind at once, in threads,
+  lowest ``priority`` first. A backlog of bulk batches can therefore
+  never hold every slot while interactive diagnoses wait.
+* renews a running job's lease every third of ``LEASE_SECONDS``, so the
+  lease can stay short whatever the job's run time
+* gives up on a job still running after ``TIMEOUT[kind]`` seconds: it
+  stops renewing and records the attempt as timed out. The thread cannot
+  be killed, so its slot stays taken until the handler returns.
+* counts an attempt at every claim, so a job whose worker dies mid-run
+  is retried once its lease expires and failed after ``MAX_ATTEMPTS``
+* retries unexpected errors with backoff up to ``MAX_ATTEMPTS``; a
+  ``JobError`` (bad input) fails the job straight away
+* deletes finished jobs once their result is ``RESULT_TTL`` seconds old
+
+The web processes only insert and read rows, so long jobs cannot starve
+page requests of workers. Each user may have at most
+``MAX_PENDING_PER_USER`` jobs queued or running.
+"""
+import asyncio
+import io
+import logging
+import random
+import uuid
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .diagnosis import diagnose, with_image_evidence
+from .leaf_classifier import predict_leaf
+from .model_registry import registry as model_registry
+from .models import Job
+from .prediction_cache import cached_recommend
+from .recommendation import JOB_MAX_BATCH_ROWS, rows_from_body, validate_rows
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'CONCURRENCY': {'leaf_diagnosis': 4, 'recommendation_batch': 1},
+    'PRIORITY': {'leaf_diagnosis': 1, 'recommendation_batch': 5},
+    'RESULT_TTL': 3600,  # seconds a finished job's result stays readable
+    'MAX_ATTEMPTS': 3,
+    'BACKOFF_SECONDS': 10,
+    'LEASE_SECONDS': 60,  # renewed while the job runs
+    'TIMEOUT': {'leaf_diagnosis': 120, 'recommendation_batch': 1800},  # seconds per attempt
+    'MAX_PENDING_PER_USER': 5,
+    'POLL_SECONDS': 1,
+    'PURGE_SECONDS': 300,
+}
+
+KINDS = [code for code, label in Job.KINDS]
+
+
+class JobError(Exception):
+    """The job cannot succeed (bad input); it fails without being retried.
+
+    detail, if given, is stored as the failed job's result.
+    """
+
+    def __init__(self, message, detail=None):
+        super().__init__(message)
+        self.detail = detail
+
+
+# ---------- handlers (blocking; run in threads) ----------
+
+def run_leaf_diagnosis(payload, data):
+    try:
+        predictions = predict_leaf(io.BytesIO(data or b''))
+    except (OSError, ValueError) as e:
+        raise JobError(f'Unreadable image: {e}')
+    if predictions is None:
+        raise JobError('Leaf image model not available')
+    crop = payload['crop_type']
+    candidates = diagnose(crop, payload.get('symptoms', ''), payload.get('plant_part'))
+    candidates = with_image_evidence(candidates, crop, predictions)
+    return {'image_predictions': predictions, 'candidates': candidates}
+
+
+def run_recommendation_batch(payload, data):
+    try:
+        rows, errors = rows_from_body(data or b'', payload['format'] == 'csv')
+    except ValueError:
+        raise JobError('Could not parse request body')
+    except ValidationError as e:
+        raise JobError(e.messages[0])
+    if not rows:
+        raise JobError('No rows supplied')
+    if len(rows) > JOB_MAX_BATCH_ROWS:
+        raise JobError(f'At most {JOB_MAX_BATCH_ROWS} rows per job')
+    matrix, errors = validate_rows(rows, errors)
+    if errors:
+        raise JobError('Invalid rows', {
+            'rows': [{'row': index, 'errors': errors[index]} for index in sorted(errors)],
+        })
+
+    loaded = model_registry.get()
+    if not loaded:
+        raise JobError('Model not loaded')
+    crops, confidences = cached_recommend(loaded, matrix)
+    return {
+        'count': len(crops),
+        'results': [
+            {'crop': crop, 'confidence': round(confidence, 4)}
+            for crop, confidence in zip(crops.tolist(), confidences.tolist())
+        ],
+    }
+
+
+HANDLERS = {'leaf_diagnosis': run_leaf_diagnosis, 'recommendation_batch': run_recommendation_batch}
+
+
+def submit(kind, payload, data=None, user=None, priority=None, config=None):
+    """Queue a job and return it; it runs as soon as a worker has a free slot for its kind."""
+    config = config or load_config()
+    if priority is None:
+        priority = config['PRIORITY'].get(kind, 5)
+    return Job.objects.create(
+        kind=kind, payload=payload, data=data, priority=priority,
+        user=user if user is not None and user.is_authenticated else None,
+    )
+
+
+def pending_count(user):
+    """How many of user's jobs are queued or running."""
+    return Job.objects.filter(user=user, status__in=('pending', 'running')).count()
+
+
+def describe(job):
+    """JSON view of a job for the API."""
+    return {
+        'id': str(job.id),
+        'kind': job.kind,
+        'status': job.status,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+        'expires_at': job.expires_at,
+        'result': job.result,
+        'error': job.error,
+    }
+
+
+def visible_job(job_id, user):
+    """The job if it exists, has not expired and user may read it, else None."""
+    job = Job.objects.filter(id=job_id).defer('data', 'payload').first()
+    if job is None or (job.expires_at and job.expires_at <= timezone.now()):
+        return None
+    if job.user_id is not None and job.user_id != user.id:
+        return None
+    return job
+
+
+# ---------- queue operations (sync, called through sync_to_async) ----------
+
+def claim(kind, limit, config):
+    """Lease up to limit due jobs of one kind to this caller, lowest priority value first.
+
+    Each claim counts as an attempt. A job whose lease ran out with no
+    attempts left (its worker died every time) is failed instead.
+    """
+    now = timezone.now()
+    Job.objects.filter(
+        kind=kind, status='running', leased_until__lt=now, attempts__gte=config['MAX_ATTEMPTS'],
+    ).update(
+        status='failed', error='The worker stopped while running the job', data=None, leased_until=None,
+        finished_at=now, expires_at=now + timedelta(seconds=config['RESULT_TTL']),
+    )
+    due = Q(kind=kind) & (
+        Q(status='pending', next_attempt_at__lte=now) | Q(status='running', leased_until__lt=now)
+    )
+    ids = list(Job.objects.filter(due).order_by('priority', 'next_attempt_at').values_list('id', flat=True)[:limit])
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    # Re-checking `due` makes the UPDATE the arbiter when workers race for the same ids
+    Job.objects.filter(due, id__in=ids).update(
+        status='running', claim_token=token, started_at=now, attempts=F('attempts') + 1,
+        leased_until=now + timedelta(seconds=config['LEASE_SECONDS']),
+    )
+    return list(Job.objects.filter(claim_token=token, status='running').only(
+        'id', 'kind', 'payload', 'data', 'attempts', 'claim_token',
+    ))
+
+
+def renew(job, config):
+    """Extend the lease on a running job; False if another worker has taken it over."""
+    return bool(Job.objects.filter(id=job.id, claim_token=job.claim_token, status='running').update(
+        leased_until=timezone.now() + timedelta(seconds=config['LEASE_SECONDS']),
+    ))
+
+
+def record(job, result, error, retry, config):
+    """Store a job's outcome; failed attempts go back to pending until MAX_ATTEMPTS (counted by claim()).
+
+    Nothing is written once the job has left this claim (a timed-out
+    handler returning late, or a lease another worker took over).
+    """
+    now = timezone.now()
+    leased = Job.objects.filter(id=job.id, claim_token=job.claim_token, status='running')
+    if error is None:
+        changes = {'status': 'done', 'result': result, 'error': ''}
+    elif retry and job.attempts < config['MAX_ATTEMPTS']:
+        delay = config['BACKOFF_SECONDS'] * 2 ** (job.attempts - 1)
+        leased.update(
+            status='pending', error=error, leased_until=None,
+            next_attempt_at=now + timedelta(seconds=random.uniform(delay / 2, delay)),
+        )
+        return
+    else:
+        changes = {'status': 'failed', 'result': result, 'error': error}
+    leased.update(
+        **changes, data=None, leased_until=None, finished_at=now,
+        expires_at=now + timedelta(seconds=config['RESULT_TTL']),
+    )
+
+
+def purge_expired():
+    """Delete jobs whose results have expired; returns how many."""
+    deleted, _ = Job.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
+
+
+def perform(job):
+    """Run the job's handler; returns (result, error, retry)."""
+    try:
+        return HANDLERS[job.kind](job.payload, job.data), None, False
+    except JobError as e:
+        return e.detail, str(e), False
+    except Exception as e:  # a handler bug or a transient failure: try again later
+        logger.exception('Job %s (%s) failed', job.id, job.kind)
+        return None, repr(e), True
+
+
+class Worker:
+    def __init__(self, config=None):
+        self.config = config or load_config()
+        self.running = {kind: 0 for kind in KINDS}
+        self.tasks = set()
+
+    async def execute(self, job):
+        work = asyncio.ensure_future(asyncio.to_thread(perform, job))
+        heartbeat = asyncio.get_running_loop().create_task(self.heartbeat(job))
+        timeout = self.config['TIMEOUT'].get(job.kind)
+        try:
+            try:
+                result, error, retry = await asyncio.wait_for(asyncio.shield(work), timeout)
+            except asyncio.TimeoutError:
+                logger.error('Job %s (%s) timed out after %s seconds', job.id, job.kind, timeout)
+                result, error, retry = None, f'Timed out after {timeout} seconds', True
+            finally:
+                heartbeat.cancel()
+            await sync_to_async(record)(job, result, error, retry, self.config)
+            await work  # a timed-out handler keeps its thread, and so its slot, until it returns
+        finally:
+            self.running[job.kind] -= 1
+
+    async def heartbeat(self, job):
+        """Renew the job's lease until cancelled or the lease is lost."""
+        while True:
+            await asyncio.sleep(self.config['LEASE_SECONDS'] / 3)
+            if not await sync_to_async(renew)(job, self.config):
+                logger.warning('Job %s lost its lease while running', job.id)
+                return
+
+    async def fill(self):
+        """Claim as many jobs of each kind as it has free slots and start them; returns how many."""
+        started = 0
+        for kind in KINDS:
+            free = self.config['CONCURRENCY'].get(kind, 1) - self.running[kind]
+            if free <= 0:
+                continue
+            for job in await sync_to_async(claim)(kind, free, self.config):
+                self.running[kind] += 1
+                task = asyncio.get_running_loop().create_task(self.execute(job))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+                started += 1
+        return started
+
+    async def run(self, once=False):
+        """Run jobs until stopped; with once=True, stop when nothing is due or running and return how many ran."""
+        loop = asyncio.get_running_loop()
+        purged_at = -self.config['PURGE_SECONDS']
+        total = 0
+        while True:
+            if loop.time() - purged_at >= self.config['PURGE_SECONDS']:
+                await sync_to_async(purge_expired)()
+                purged_at = loop.time()
+            started = await self.fill()
+            total += started
+            if once and not started and not self.tasks:
+                return total
+            if self.tasks:
+                # Wake up as soon as a slot frees, or to pick up newly submitted jobs
+                await asyncio.wait(self.tasks, timeout=self.config['POLL_SECONDS'], return_when=asyncio.FIRST_COMPLETED)
+            else:
+                await asyncio.sleep(self.config['POLL_SECONDS'])
+
+
+def load_config():
+    config = {**DEFAULTS, **getattr(settings, 'JOBS', {})}
+    for name in ('CONCURRENCY', 'PRIORITY', 'TIMEOUT'):
+        config[name] = {**DEFAULTS[name], **config[name]}
+    return config
@@ -0,0 +1,161 @@
+# DX_APP/leaderboard.py
+"""
+Top gainers / top losers, maintained incrementally.
+
+Each scope (all markets, one state, one market) has a gainers and a losers
+TrendLeaderboard row holding its best ``BOARD_SIZE`` listings, already
+sorted. The price ingester merges every batch into the boards it touches,
+so the page reads the first N entries of one row and never sorts.
+
+A board only holds the top BOARD_SIZE, so a listing that falls off it is
+forgotten. When updates push entries below the old cut-off and leave fewer
+than BOARD_SIZE entries that are known to be correct, the board is
+reloaded from CropPrice. That reload walks the partial trend_percentage
+index with a LIMIT. Keeping BOARD_SIZE well above what the page shows
+makes these reloads rare.
+
+Boards are only written by the ingester and ``manage.py
+rebuild_leaderboards``. ``top()`` never writes, so page reads take no row
+locks and work against a read replica. A scope with no board yet is
+answered from CropPrice directly, with a LIMIT of what the page shows.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .models import CropPrice, TrendLeaderboard
+
+BOARD_SIZE = 50
+DIRECTIONS = [code for code, label in TrendLeaderboard.DIRECTIONS]
+
+SCOPES = (
+    ['all']
+    + [f'state:{code}' for code, label in CropPrice.STATES]
+    + [f'market:{code}' for code, label in CropPrice.MARKETS]
+)
+
+
+def scope_for(state=None, market=None):
+    """The narrowest board for a page filter; a market implies its state."""
+    if market:
+        return f'market:{market}'
+    if state:
+        return f'state:{state}'
+    return 'all'
+
+
+def _scopes_of(entry):
+    return ('all', f'state:{entry["state"]}', f'market:{entry["market"]}')
+
+
+def _key(entry):
+    return (entry['name'], entry['grade'], entry['market'], entry['state'])
+
+
+def _qualifies(entry, direction):
+    return entry['trend'] > 0 if direction == 'gainers' else entry['trend'] < 0
+
+
+def _rank(entry, direction):
+    return -entry['trend'] if direction == 'gainers' else entry['trend']
+
+
+def _entry(name, grade, market, state, trend):
+    return {'name': name, 'grade': grade, 'market': market, 'state': state, 'trend': float(trend)}
+
+
+def load_board(scope, direction, size=BOARD_SIZE):
+    """Top entries of a scope straight from CropPrice (an index range scan with a LIMIT)."""
+    query = CropPrice.objects.filter(is_active=True)
+    kind, _, code = scope.partition(':')
+    if kind == 'state':
+        query = query.filter(state=code)
+    elif kind == 'market':
+        query = query.filter(market_name=code)
+    if direction == 'gainers':
+        query = query.filter(trend_percentage__gt=0).order_by('-trend_percentage')
+    else:
+        query = query.filter(trend_percentage__lt=0).order_by('trend_percentage')
+    rows = query.values_list('name', 'grade', 'market_name', 'state', 'trend_percentage')[:size]
+    return [_entry(*row) for row in rows]
+
+
+def merge_board(entries, updates, direction, size=BOARD_SIZE):
+    """Merge updated listings into a sorted board.
+
+    Returns the new entries, or None if they can no longer be trusted to be
+    the true top ``size`` and the board must be reloaded.
+    """
+    full = len(entries) >= size
+    updated = {_key(entry) for entry in updates}
+    merged = [entry for entry in entries if _key(entry) not in updated]
+    merged += [entry for entry in updates if _qualifies(entry, direction)]
+    merged.sort(key=lambda entry: _rank(entry, direction))
+
+    if not full:
+        # The board held every qualifying listing, so the merge is exact
+        return merged[:size]
+    # Listings that were never on the board rank no better than its old last entry
+    cutoff = _rank(entries[-1], direction)
+    exact = [entry for entry in merged if _rank(entry, direction) <= cutoff]
+    return exact[:size] if len(exact) >= size else None
+
+
+def update_boards(prices):
+    """Merge a batch of saved CropPrice objects into the boards of their scopes.
+
+    Call inside the transaction that wrote the prices. Costs one read of the
+    affected boards and one bulk_update, plus a reload for any board that
+    could not be merged.
+    """
+    updates = {}
+    for price in prices:
+        entry = _entry(price.name, price.grade, price.market_name, price.state, price.trend_percentage)
+        if not price.is_active:
+            entry['trend'] = 0.0  # qualifies for neither direction, so it drops off the boards
+        for scope in _scopes_of(entry):
+            updates.setdefault(scope, []).append(entry)
+
+    with transaction.atomic():
+        boards = {
+            (board.scope, board.direction): board
+            for board in TrendLeaderboard.objects.select_for_update().filter(scope__in=updates)
+        }
+        changed = []
+        for scope, entries in updates.items():
+            for direction in DIRECTIONS:
+                board = boards.get((scope, direction))
+                if board is None:
+                    board = TrendLeaderboard(scope=scope, direction=direction, entries=load_board(scope, direction))
+                    board.save()
+                    continue
+                merged = merge_board(board.entries, entries, direction)
+                board.entries = merged if merged is not None else load_board(scope, direction)
+                board.updated_at = timezone.now()  # bulk_update skips auto_now
+                changed.append(board)
+        TrendLeaderboard.objects.bulk_update(changed, ['entries', 'updated_at'])
+
+
+def rebuild_boards():
+    """Reload every board from CropPrice, e.g. after prices were edited outside the ingester."""
+    with transaction.atomic():
+        for scope in SCOPES:
+            for direction in DIRECTIONS:
+                TrendLeaderboard.objects.update_or_create(
+                    scope=scope, direction=direction,
+                    defaults={'entries': load_board(scope, direction)},
+                )
+
+
+def top(scope, limit):
+    """(gainers, losers) of a scope, best first, from the stored boards in one query; read-only."""
+    boards = dict(
+        TrendLeaderboard.objects.filter(scope=scope).values_list('direction', 'entries')
+    )
+    result = []
+    for direction in DIRECTIONS:
+        entries = boards.get(direction)
+        if entries is None:
+            # Not built yet (no ingest or rebuild_leaderboards since the scope appeared)
+            entries = load_board(scope, direction, size=limit)
+        result.append(entries[:limit])
+    return tuple(result)
@@ -0,0 +1,154 @@
+# DX_APP/leaf_classifier.py
+"""
+Image-based diagnosis from the leaf photo on the disease diagnosis form.
+
+The model (``settings.LEAF_MODEL_PATH``, written by ml/train_leaf_model.py)
+is a small scikit-learn classifier over leaf_features.image_features. It
+is loaded lazily and re-loaded when the file changes. When there is no
+model file, image diagnosis is simply skipped.
+
+Decoding and classification run in a bounded thread pool
+(``LEAF_CLASSIFIER['WORKERS']`` threads). At most ``MAX_PENDING`` images are
+in flight per process. A request whose image cannot get a slot, or is not
+classified within ``TIMEOUT`` seconds, carries on with the text diagnosis
+alone, so a burst of large uploads never ties up every request worker.
+Pillow and NumPy release the GIL for most of the decode/feature work.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import joblib
+from django.conf import settings
+from PIL import UnidentifiedImageError
+
+from .leaf_features import FEATURE_VERSION, extract
+from .metrics import timer
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'WORKERS': 2,
+    'MAX_PENDING': 8,
+    'TIMEOUT': 2.0,  # seconds
+    'TOP_K': 3,
+}
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(__file__), 'model_artifacts', 'leaf_model.joblib')
+
+
+def parse_label(label):
+    """(crop, disease) of a class label; PlantVillage style 'Tomato___Early_blight', disease None when healthy."""
+    crop, _, disease = label.rpartition('___')
+    disease = disease.replace('_', ' ').strip()
+    return crop.replace('_', ' ').strip(), (None if disease.lower() == 'healthy' else disease)
+
+
+class LeafClassifier:
+    def __init__(self, path, config):
+        self.path = str(path)
+        self.config = config
+        self.slots = threading.BoundedSemaphore(config['MAX_PENDING'])
+        self._pool = None
+        self._artifacts = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _file_version(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def artifacts(self):
+        """The loaded model dict, or None without a usable model file."""
+        version = self._file_version()
+        if version == self._version:
+            return self._artifacts
+        with self._lock:
+            if version != self._version:
+                self._version = version
+                self._artifacts = None
+                if version is not None:
+                    try:
+                        artifacts = joblib.load(self.path)
+                        if artifacts.get('feature_version') != FEATURE_VERSION:
+                            raise ValueError(f'model was trained on feature version {artifacts.get("feature_version")}')
+                        self._artifacts = artifacts
+                    except Exception:
+                        logger.exception('Could not load leaf model from %s', self.path)
+            return self._artifacts
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(self.config['WORKERS'], thread_name_prefix='leaf-classifier')
+        return self._pool
+
+    def predict(self, source, artifacts):
+        """Top (label, probability) pairs for one image; runs on a pool thread."""
+        features = extract(source, artifacts['image_size'])
+        probabilities = artifacts['model'].predict_proba(features.reshape(1, -1))[0]
+        best = probabilities.argsort()[::-1][:self.config['TOP_K']]
+        return [(artifacts['labels'][i], float(probabilities[i])) for i in best]
+
+    def classify(self, upload):
+        """Predictions for an uploaded image, or None (no model, busy, timed out or unreadable)."""
+        artifacts = self.artifacts()
+        if artifacts is None:
+            return None
+        if not self.slots.acquire(blocking=False):
+            logger.warning('Leaf classifier busy; skipping image diagnosis')
+            return None
+        # Large uploads are spooled to disk by Django; hand the worker the path, not the request's file
+        source = upload.temporary_file_path() if hasattr(upload, 'temporary_file_path') else upload.file
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        try:
+            future = self.pool.submit(self.predict, source, artifacts)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda done: self.slots.release())
+        try:
+            # Timed here: the pool thread does not see the request's metrics
+            with timer('inference'):
+                return future.result(self.config['TIMEOUT'])
+        except TimeoutError:
+            logger.warning('Leaf image not classified within %ss', self.config['TIMEOUT'])
+        except (UnidentifiedImageError, ValueError, OSError) as e:
+            logger.info('Unreadable leaf image: %s', e)
+        return None
+
+
+leaf_classifier = LeafClassifier(
+    getattr(settings, 'LEAF_MODEL_PATH', DEFAULT_MODEL_PATH),
+    {**DEFAULTS, **getattr(settings, 'LEAF_CLASSIFIER', {})},
+)
+
+
+def describe(predictions):
+    """[{'label', 'crop', 'disease', 'healthy', 'probability'}] for (label, probability) pairs."""
+    results = []
+    for label, probability in predictions:
+        crop, disease = parse_label(label)
+        results.append({
+            'label': label, 'crop': crop, 'disease': disease or 'Healthy',
+            'healthy': disease is None, 'probability': round(probability * 100, 1),
+        })
+    return results
+
+
+def classify_leaf(upload):
+    """describe()d predictions for an uploaded image, best first, or None when it was not classified."""
+    predictions = leaf_classifier.classify(upload)
+    return None if predictions is None else describe(predictions)
+
+
+def predict_leaf(source):
+    """Predictions for an image without the pool or timeout (for the job worker); None without a model."""
+    artifacts = leaf_classifier.artifacts()
+    return None if artifacts is None else describe(leaf_classifier.predict(source, artifacts))
@@ -0,0 +1,75 @@
+# DX_APP/leaf_features.py
+"""
+Leaf image features shared by training (ml/train_leaf_model.py) and serving.
+
+Uploads are decoded straight to a small square: Pillow reads the header
+first, and for JPEGs ``draft()`` lets the decoder produce a 1/2-1/8 scale
+image, so a 12-megapixel phone photo never exists at full size in memory.
+The features are plain NumPy: colour histograms (HSV) and colour moments of
+the leaf pixels, which pick up yellowing, browning and powdery patches,
+and a coarse histogram of oriented gradients for spot and lesion texture.
+"""
+import numpy as np
+from PIL import Image
+
+FEATURE_VERSION = 1
+IMAGE_SIZE = 128
+MAX_PIXELS = 50_000_000  # refuse anything larger before decoding it
+
+HUE_BINS, SATURATION_BINS, VALUE_BINS = 18, 8, 8
+CELLS = 4  # HOG grid is CELLS x CELLS
+ORIENTATIONS = 9
+
+FEATURE_COUNT = HUE_BINS + SATURATION_BINS + VALUE_BINS + 6 + CELLS * CELLS * ORIENTATIONS + 1
+
+GRAY_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def load_image(source, size=IMAGE_SIZE):
+    """Decode a path or file object to a size x size RGB image, at reduced scale where the format allows."""
+    with Image.open(source) as image:
+        if image.width * image.height > MAX_PIXELS:
+            raise ValueError(f'Image of {image.width}x{image.height} pixels is too large')
+        image.draft('RGB', (size, size))
+        image = image.convert('RGB')
+        return image.resize((size, size), Image.Resampling.BILINEAR, reducing_gap=2.0)
+
+
+def leaf_mask(hsv):
+    """Pixels that look like plant tissue rather than a pale or dark background."""
+    mask = (hsv[..., 1] > 0.15) & (hsv[..., 2] > 0.1)
+    # Almost nothing saturated (e.g. a powdery, whitened leaf): use the whole image
+    return mask if mask.mean() > 0.05 else np.ones_like(mask)
+
+
+def image_features(image):
+    """The FEATURE_COUNT-long float32 vector of a load_image() result."""
+    rgb = np.asarray(image, dtype=np.float32) / 255
+    hsv = np.asarray(image.convert('HSV'), dtype=np.float32) / 255
+    mask = leaf_mask(hsv)
+    count = mask.sum()
+
+    histograms = [
+        np.histogram(hsv[..., channel][mask], bins=bins, range=(0, 1))[0] / count
+        for channel, bins in ((0, HUE_BINS), (1, SATURATION_BINS), (2, VALUE_BINS))
+    ]
+    pixels = rgb[mask]
+    moments = np.concatenate([pixels.mean(axis=0), pixels.std(axis=0)])
+
+    gray = rgb @ GRAY_WEIGHTS
+    dy, dx = np.gradient(gray)
+    magnitude = np.hypot(dx, dy)
+    orientation = np.minimum((np.arctan2(dy, dx) % np.pi) / np.pi * ORIENTATIONS, ORIENTATIONS - 1).astype(np.intp)
+    rows, columns = np.indices(gray.shape)
+    cell = (rows * CELLS // gray.shape[0]) * CELLS + columns * CELLS // gray.shape[1]
+    hog = np.bincount(
+        (cell * ORIENTATIONS + orientation).ravel(), weights=magnitude.ravel(),
+        minlength=CELLS * CELLS * ORIENTATIONS,
+    )
+    hog /= np.linalg.norm(hog) + 1e-6
+
+    return np.concatenate([*histograms, moments, hog, [mask.mean()]]).astype(np.float32)
+
+
+def extract(source, size=IMAGE_SIZE):
+    return image_features(load_image(source, size))
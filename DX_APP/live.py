@@ -0,0 +1,179 @@
+# DX_APP/live.py
+"""
+Live updates for the market insights page over server-sent events.
+
+All open streams in a process share one ``Broadcaster``. While at least
+one client is connected, it polls the database every ``POLL_SECONDS`` for
+two things: CropPrice rows changed since its cursor, and in-app
+Notifications queued since its cursor. It pushes the results into a
+small asyncio.Queue per client. A thousand idle clients therefore cost
+two indexed queries per interval and one coroutine each, not a thread
+each. Serve DX_PROJECT.asgi with an ASGI server to get that; under WSGI
+every stream holds a worker thread.
+
+A client whose queue overflows, or a poll that finds more changed rows
+than ``MAX_PRICE_EVENTS`` (e.g. during a daily feed), gets a single
+``resync`` event instead of a flood. The page then refreshes once.
+"""
+import asyncio
+import json
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from . import jobs
+from .market_data import PRICE_FIELDS, alert_row, price_row
+from .models import CropPrice, Notification
+
+POLL_SECONDS = 2
+KEEPALIVE_SECONDS = 15
+QUEUE_SIZE = 100
+MAX_PRICE_EVENTS = 200
+RETRY_MS = 5000
+JOB_POLL_SECONDS = 1
+
+RESYNC = ('resync', {})
+
+
+class Subscriber:
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+
+    def push(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too far behind to catch up event by event: tell the page to reload
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+
+class Broadcaster:
+    """One poller per process fanning changes out to every open stream."""
+
+    def __init__(self, poll_seconds=POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self.subscribers = set()
+        self.task = None
+        self.price_cursor = None
+        self.notification_cursor = None
+
+    def subscribe(self, user_id=None):
+        subscriber = Subscriber(user_id)
+        self.subscribers.add(subscriber)
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.run())
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+    def _start_cursors(self):
+        latest = Notification.objects.order_by('-id').values_list('id', flat=True).first()
+        self.price_cursor = (timezone.now(), 0)
+        self.notification_cursor = latest or 0
+
+    def changes(self):
+        """Changed prices, and new in-app alerts per user id, since the cursors; moves the cursors forward."""
+        moment, last_id = self.price_cursor
+        # >= keeps the query on the partial updated_at index; rows already sent at `moment` are skipped below
+        rows = [
+            row for row in CropPrice.objects.filter(is_active=True, updated_at__gte=moment)
+            .order_by('updated_at', 'id').values('id', *PRICE_FIELDS)[:MAX_PRICE_EVENTS + 1]
+            if row['updated_at'] > moment or row['id'] > last_id
+        ]
+        if len(rows) > MAX_PRICE_EVENTS:
+            latest = CropPrice.objects.filter(is_active=True).order_by('-updated_at', '-id').values_list(
+                'updated_at', 'id',
+            ).first()
+            self.price_cursor = latest
+            prices = [RESYNC]
+        else:
+            if rows:
+                self.price_cursor = (rows[-1]['updated_at'], rows[-1]['id'])
+            prices = [('price', price_row(row)) for row in rows]
+
+        alerts = {}
+        for row in Notification.objects.filter(id__gt=self.notification_cursor, channel='app').order_by('id').values(
+            'id', 'user_id', 'triggered_at', 'alert__crop', 'alert__alert_type', 'alert__target_price',
+        ):
+            self.notification_cursor = row['id']
+            alerts.setdefault(row['user_id'], []).append(('alert', alert_row({
+                'crop': row['alert__crop'],
+                'alert_type': row['alert__alert_type'],
+                'target_price': row['alert__target_price'],
+                'triggered_at': row['triggered_at'],
+            })))
+        return prices, alerts
+
+    async def run(self):
+        await sync_to_async(self._start_cursors)()
+        while self.subscribers:
+            await asyncio.sleep(self.poll_seconds)
+            if not self.subscribers:
+                break
+            prices, alerts = await sync_to_async(self.changes)()
+            for subscriber in list(self.subscribers):
+                for event in prices + alerts.get(subscriber.user_id, []):
+                    subscriber.push(event)
+
+
+_broadcasters = weakref.WeakKeyDictionary()
+
+
+def get_broadcaster():
+    """The broadcaster of the running event loop (one per process under ASGI)."""
+    loop = asyncio.get_running_loop()
+    if loop not in _broadcasters:
+        _broadcasters[loop] = Broadcaster()
+    return _broadcasters[loop]
+
+
+def format_event(name, data):
+    return f'event: {name}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n'
+
+
+async def event_stream(user_id=None):
+    """SSE body for one client; unsubscribes when the client goes away."""
+    # Subscribe here rather than in the view: under WSGI the body is consumed on a different loop
+    broadcaster = get_broadcaster()
+    subscriber = broadcaster.subscribe(user_id)
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        while True:
+            try:
+                name, data = await asyncio.wait_for(subscriber.queue.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            yield format_event(name, data)
+    finally:
+        broadcaster.unsubscribe(subscriber)
+
+
+async def job_events(job_id, user):
+    """SSE body following one background job: a ``status`` event per change, then the stream ends."""
+    yield f'retry: {RETRY_MS}\n\n'
+    status = None
+    quiet = 0
+    while True:
+        job = await sync_to_async(jobs.visible_job)(job_id, user)
+        if job is None:
+            yield format_event('gone', {})
+            return
+        if job.status != status:
+            status = job.status
+            quiet = 0
+            yield format_event('status', jobs.describe(job))
+            if status in ('done', 'failed'):
+                return
+        else:
+            quiet += JOB_POLL_SECONDS
+            if quiet >= KEEPALIVE_SECONDS:
+                quiet = 0
+                yield ': keepalive\n\n'
+        await asyncio.sleep(JOB_POLL_SECONDS)
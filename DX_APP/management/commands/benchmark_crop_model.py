@@ -0,0 +1,37 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from DX_APP.forest import check_parity, sample_inputs
+from DX_APP.model_registry import registry
+
+
+class Command(BaseCommand):
+    help = 'Compare sklearn and flattened-forest latency (p50/p99) for 1, 10 and 1000 rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeats', type=int, default=200, help='Timed calls per batch size')
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 1000])
+
+    def handle(self, *args, **options):
+        loaded = registry.get()
+        if loaded is None or loaded.flat_model is None:
+            raise CommandError('No forest model available to benchmark')
+
+        X = sample_inputs(loaded.flat_model, max(options['sizes']))
+        check_parity(loaded.model, loaded.flat_model, X)
+        self.stdout.write('Parity with sklearn: OK')
+
+        self.stdout.write(f'{"rows":>6} {"predictor":>10} {"p50 ms":>10} {"p99 ms":>10}')
+        for size in options['sizes']:
+            batch = X[:size]
+            for name, predictor in (('sklearn', loaded.model), ('flat', loaded.flat_model)):
+                predictor.predict_proba(batch)  # warm up
+                timings = []
+                for _ in range(options['repeats']):
+                    start = time.perf_counter()
+                    predictor.predict_proba(batch)
+                    timings.append(time.perf_counter() - start)
+                p50, p99 = np.percentile(timings, [50, 99]) * 1000
+                self.stdout.write(f'{size:>6} {name:>10} {p50:>10.3f} {p99:>10.3f}')
@@ -0,0 +1,71 @@
+import random
+import time
+from decimal import Decimal
+
+import numpy as np
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+
+from DX_APP.models import CropPrice
+from DX_APP.views import market_insights
+
+
+class Command(BaseCommand):
+    help = 'Render market insights against a throwaway database with growing CropPrice tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 100000, 1000000],
+                            help='Table sizes to measure at')
+        parser.add_argument('--repeats', type=int, default=20, help='Timed renders per size')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.stdout.write(f'{"rows":>9} {"queries":>8} {"p50 ms":>8} {"p99 ms":>8}')
+            inserted = 0
+            for target in sorted(options['rows']):
+                inserted = self.fill(inserted, target)
+                queries, timings = self.measure(options['repeats'])
+                p50, p99 = np.percentile(timings, [50, 99]) * 1000
+                self.stdout.write(f'{target:>9} {queries:>8} {p50:>8.1f} {p99:>8.1f}')
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def fill(self, start, target, batch_size=10000):
+        rng = random.Random(start)
+        crops, states, markets = CropPrice.CROP_TYPES, CropPrice.STATES, CropPrice.MARKETS
+        while start < target:
+            batch = []
+            for lot in range(start, start + min(batch_size, target - start)):
+                crop_type, crop_name = rng.choice(crops)
+                low = rng.randint(1000, 4000)
+                batch.append(CropPrice(
+                    name=crop_name, crop_type=crop_type, grade=f'Lot {lot}',  # listings are unique
+                    min_price=low, max_price=low + 500, avg_price=low + 250,
+                    trend_percentage=Decimal(rng.randint(-999, 999)) / 100,
+                    state=rng.choice(states)[0], market_name=rng.choice(markets)[0],
+                    is_active=rng.random() < 0.9,
+                ))
+            CropPrice.objects.bulk_create(batch)
+            start += len(batch)
+        return start
+
+    def measure(self, repeats):
+        request = RequestFactory().get('/market-insights/')
+        request.user = AnonymousUser()
+        market_insights(request)  # warm template and query caches
+        # The capped query log is full after bulk_create; counts come out as 0 otherwise
+        connection.queries_log.clear()
+
+        timings = []
+        for _ in range(repeats):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                market_insights(request)
+                timings.append(time.perf_counter() - started)
+        return len(captured), timings
@@ -0,0 +1,71 @@
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from DX_APP.alerts import AlertIndex, mark_triggered
+from DX_APP.models import CropPrice, PriceAlert
+from DX_APP.price_feed import BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Time PriceAlert evaluation against a throwaway database of random alerts and price updates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alerts', type=int, default=1000000, help='Alerts to create')
+        parser.add_argument('--updates', type=int, default=10000, help='Price updates to evaluate')
+        parser.add_argument('--crops', type=int, default=500, help='Distinct crop names')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help='Updates per evaluation, as in ingest_prices')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            rng = random.Random(0)
+            crops = [f'Crop {i}' for i in range(options['crops'])]
+            self.fill(rng, crops, options['alerts'])
+
+            started = time.perf_counter()
+            index = AlertIndex.load()
+            load_time = time.perf_counter() - started
+
+            updates = [
+                CropPrice(name=rng.choice(crops), avg_price=Decimal(rng.randint(1000, 4000)),
+                          trend_percentage=Decimal(rng.randint(-3000, 3000)) / 100, is_active=True)
+                for _ in range(options['updates'])
+            ]
+            match_time = mark_time = 0.0
+            triggered = 0
+            for start in range(0, len(updates), options['batch_size']):
+                started = time.perf_counter()
+                ids = index.match(updates[start:start + options['batch_size']])
+                match_time += time.perf_counter() - started
+                started = time.perf_counter()
+                triggered += len(mark_triggered(ids))
+                mark_time += time.perf_counter() - started
+
+            self.stdout.write(f'{options["alerts"]} alerts x {options["updates"]} price updates')
+            self.stdout.write(f'  load index    {load_time * 1000:9.1f} ms')
+            self.stdout.write(f'  match         {match_time * 1000:9.1f} ms')
+            self.stdout.write(f'  mark          {mark_time * 1000:9.1f} ms  ({triggered} alerts triggered)')
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def fill(self, rng, crops, count, batch_size=10000):
+        users = [User.objects.create(username=f'bench{i}') for i in range(10)]
+        for start in range(0, count, batch_size):
+            batch = []
+            for _ in range(min(batch_size, count - start)):
+                alert_type = rng.choice(('above', 'below', 'change'))
+                target = rng.randint(1, 50) if alert_type == 'change' else rng.randint(1000, 4000)
+                batch.append(PriceAlert(
+                    user=rng.choice(users), crop=rng.choice(crops), alert_type=alert_type,
+                    target_price=Decimal(target),
+                ))
+            PriceAlert.objects.bulk_create(batch)
@@ -0,0 +1,62 @@
+import random
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from DX_APP.symptom_search import SymptomIndex
+
+# A small symptom vocabulary: every word is shared by many diseases, so queries touch long postings (a worst case)
+WORDS = (
+    'leaf leaves stem root fruit flower seed pod tuber spot spots lesion lesions yellow yellowing brown black white '
+    'grey orange purple red dark pale water soaked wilting wilt curl curling rot rotting blight mildew rust mosaic '
+    'streak stripe ring canker gall scab smut mold powdery downy sunken raised circular angular margin edge tip '
+    'vein veins underside upper surface powder coating ooze oozing dry drying dead dying stunted growth drop '
+    'dropping premature shrivelled cracked hollow soft sticky honeydew sooty patches halo concentric rings blotch '
+    'blotches necrosis necrotic chlorosis chlorotic deformed distorted small large early late humid warm wet '
+    'fungal bacterial viral insect pest spreading plants field lower older younger shoots branches bark collar base'
+).split()
+SYLLABLES = ['ra', 'ko', 'mi', 'tan', 'sel', 'vor', 'pha', 'zu', 'len', 'dri', 'ost', 'cer', 'bla', 'nu']
+KINDS = ['blight', 'rot', 'spot', 'wilt', 'mildew', 'rust', 'mosaic']
+
+
+class Command(BaseCommand):
+    help = 'Time symptom text search (p50/p99) over a synthetic knowledge base of random diseases'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--diseases', type=int, default=10000, help='Diseases in the index')
+        parser.add_argument('--queries', type=int, default=1000, help='Timed queries')
+        parser.add_argument('--target-ms', type=float, default=5.0, help='p99 latency to check against')
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        documents = [self.document(rng) for _ in range(options['diseases'])]
+        started = time.perf_counter()
+        index = SymptomIndex(documents)
+        build_time = time.perf_counter() - started
+
+        queries = [' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 12))) for _ in range(options['queries'])]
+        index.search(queries[0])  # warm up
+        timings, touched = [], []
+        for query in queries:
+            started = time.perf_counter()
+            index.search(query)
+            timings.append(time.perf_counter() - started)
+        for query in queries[:100]:
+            touched.append(len(index.scores(query).rows))
+
+        p50, p99 = np.percentile(timings, [50, 99]) * 1000
+        self.stdout.write(f'{options["diseases"]} diseases, index built in {build_time:.1f} s')
+        self.stdout.write(f'  query p50 {p50:7.3f} ms   p99 {p99:7.3f} ms')
+        self.stdout.write(f'  diseases scored per query (median): {int(np.median(touched))}')
+        if p99 <= options['target_ms']:
+            self.stdout.write(self.style.SUCCESS(f'p99 within the {options["target_ms"]:g} ms target'))
+        else:
+            self.stdout.write(self.style.WARNING(f'p99 above the {options["target_ms"]:g} ms target'))
+
+    @staticmethod
+    def document(rng):
+        name = ''.join(rng.choice(SYLLABLES) for _ in range(3)) + ' ' + rng.choice(KINDS)
+        description = ' '.join(rng.choice(WORDS) for _ in range(25))
+        phrases = [' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 4))) for _ in range(5)]
+        return '. '.join([name, description, *phrases])
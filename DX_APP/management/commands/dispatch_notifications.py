@@ -0,0 +1,17 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from DX_APP.notifications import Dispatcher
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued price alert notifications (email, SMS, in-app)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once nothing is due instead of polling forever')
+
+    def handle(self, *args, **options):
+        delivered = asyncio.run(Dispatcher().run(once=options['once']))
+        self.stdout.write(self.style.SUCCESS(f'Processed {delivered} notifications'))
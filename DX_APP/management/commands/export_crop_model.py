@@ -0,0 +1,24 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from DX_APP.forest import export_artifacts
+from DX_APP.model_registry import SOURCE_MODEL_PATH
+
+
+class Command(BaseCommand):
+    help = 'Convert a pickled crop model into a memory-mappable .joblib file with a flattened forest'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default=SOURCE_MODEL_PATH,
+                            help='Pickled model or artifacts dict to convert')
+        parser.add_argument('--dest', help='Output path (defaults to SOURCE with a .joblib suffix)')
+
+    def handle(self, *args, **options):
+        source = options['source']
+        dest = options['dest'] or os.path.splitext(source)[0] + '.joblib'
+        export_artifacts(source, dest)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {dest}'))
+        if str(getattr(settings, 'CROP_MODEL_PATH', '')) != dest:
+            self.stdout.write(f'Set CROP_MODEL_PATH = {dest!r} to serve it memory-mapped.')
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from DX_APP import static_pages
+
+
+class Command(BaseCommand):
+    help = 'Prerender the public pages in every language to static HTML with gzip/brotli copies'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help="Directory to write to (default STATIC_PAGES['ROOT'])")
+        parser.add_argument('--lang', action='append', dest='languages',
+                            help="Language to export, repeatable (default PAGE_CACHE['LANGUAGES'])")
+
+    def handle(self, *args, **options):
+        if static_pages.brotli is None:
+            self.stdout.write(self.style.WARNING('brotli is not installed; writing gzip copies only'))
+        manifest = static_pages.export(options['output'], options['languages'])
+        count = sum(len(languages) for languages in manifest['pages'].values())
+        self.stdout.write(self.style.SUCCESS(f"Exported {count} pages (release {manifest['release']})"))
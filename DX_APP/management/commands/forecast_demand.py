@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from DX_APP.forecasting import CHUNK_SIZE, HISTORY_DAYS, HORIZON, run
+from DX_APP.timeseries import SEASON
+
+
+class Command(BaseCommand):
+    help = 'Forecast demand per crop and market from the daily price rollups (run from cron after rollup_prices)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horizon', type=int, default=HORIZON, help='Days ahead to forecast')
+        parser.add_argument('--history', type=int, default=HISTORY_DAYS, help='Days of rollups to fit on')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Worker processes (default: one per CPU; 1 fits in-process)')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Series per worker task')
+
+    def handle(self, *args, **options):
+        if options['history'] < options['horizon'] + 2 * SEASON:
+            raise CommandError(f'--history must be at least --horizon + {2 * SEASON} days')
+        started = time.perf_counter()
+        count = run(options['horizon'], options['history'], options['workers'], options['chunk_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Stored {count} demand forecasts in {elapsed:.1f}s'))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from DX_APP.price_feed import BATCH_SIZE, ingest, iter_feed
+
+
+class Command(BaseCommand):
+    help = 'Upsert daily APMC price feeds (CSV, JSON or JSON Lines) into CropPrice'
+
+    def add_arguments(self, parser):
+        parser.add_argument('feeds', nargs='+', help='Feed files to ingest, in order')
+        parser.add_argument('--format', choices=['csv', 'json', 'jsonl'],
+                            help='Feed format (defaults to the file extension)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help='Rows per transaction')
+        parser.add_argument('--no-alerts', action='store_true',
+                            help='Do not evaluate price alerts against the new prices')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        for path in options['feeds']:
+            try:
+                stats = ingest(iter_feed(path, options['format']), options['batch_size'],
+                               evaluate_alerts=not options['no_alerts'])
+            except (OSError, ValueError) as e:
+                raise CommandError(f'{path}: {e}')
+
+            for error in stats['errors']:
+                self.stderr.write(f'{path}: {error}')
+            self.stdout.write(self.style.SUCCESS(
+                f"{path}: {stats['rows']} rows ({stats['created']} new, {stats['updated']} updated, "
+                f"{stats['rejected']} rejected, {stats['alerts']} alerts triggered) in {stats['seconds']:.1f}s, "
+                f"{stats['rows_per_sec']:.0f} rows/sec"
+            ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from DX_APP.leaderboard import SCOPES, rebuild_boards
+
+
+class Command(BaseCommand):
+    help = 'Reload the top gainers/losers boards from CropPrice (after edits made outside ingest_prices)'
+
+    def handle(self, *args, **options):
+        rebuild_boards()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(SCOPES)} leaderboard scopes'))
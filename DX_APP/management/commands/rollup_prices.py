@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from DX_APP.price_history import ROLLUP_BATCH, rebuild, rollup
+
+
+class Command(BaseCommand):
+    help = 'Fold new price ticks into the hourly, daily and weekly rollups (run from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=ROLLUP_BATCH,
+                            help='Ticks folded per transaction')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Drop all rollups and recompute them from the full tick history')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            rebuild()
+        folded = rollup(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Folded {folded} ticks into the price rollups'))
@@ -0,0 +1,17 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from DX_APP.jobs import Worker
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (leaf diagnoses, large recommendation batches)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once nothing is due instead of polling forever')
+
+    def handle(self, *args, **options):
+        ran = asyncio.run(Worker().run(once=options['once']))
+        self.stdout.write(self.style.SUCCESS(f'Ran {ran} jobs'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from DX_APP import crop_plans, page_cache
+
+
+class Command(BaseCommand):
+    help = 'Pre-render the fixed pages and crop plans into the cache (run on deploy when the cache is shared)'
+
+    def handle(self, *args, **options):
+        pages = page_cache.warm_up()
+        plans = crop_plans.warm_up()
+        self.stdout.write(self.style.SUCCESS(f'Rendered {pages} pages and {plans} crop plans'))
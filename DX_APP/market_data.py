@@ -0,0 +1,137 @@
+# DX_APP/market_data.py
+"""
+Read side of the market insights page.
+
+Every function runs exactly one query: a ``values()`` projection with a
+LIMIT backed by the indexes on the models, or a read of a precomputed
+leaderboard row. Rendering the page costs the same fixed number of queries
+however many rows the tables hold.
+"""
+from django.utils import timezone
+from django.utils.timesince import timesince
+
+from . import leaderboard
+from .notifications import alert_message
+from .models import CropPrice, DemandForecast, MarketNews, PriceAlert
+
+PRICE_ROWS = 20
+MOVER_ROWS = 3
+FORECAST_ROWS = 5
+ALERT_ROWS = 5
+NEWS_ROWS = 5
+
+MARKET_NAMES = dict(CropPrice.MARKETS)
+
+DEMAND_COLORS = {'very high': 'success', 'high': 'success', 'medium': 'warning', 'low': 'danger'}
+NEWS_COLORS = {'policy': 'info', 'weather': 'warning', 'market': 'primary', 'technology': 'secondary', 'export': 'success'}
+ALERT_PRIORITY = {'above': ('High', 'danger'), 'below': ('High', 'danger'), 'change': ('Medium', 'warning')}
+
+
+def _signed(value):
+    return f'{float(value):+.1f}'
+
+
+def _ago(moment):
+    return timesince(moment) + ' ago' if moment else ''
+
+
+PRICE_FIELDS = (
+    'name', 'grade', 'min_price', 'max_price', 'avg_price',
+    'trend_percentage', 'market_name', 'state', 'updated_at',
+)
+
+
+def price_row(row):
+    """Template/stream representation of a CropPrice ``values(*PRICE_FIELDS)`` row."""
+    rising = row['trend_percentage'] >= 0
+    return {
+        'key': '|'.join((row['name'], row['grade'], row['market_name'], row['state'])),
+        'name': row['name'],
+        'grade': row['grade'],
+        'min_price': row['min_price'],
+        'max_price': row['max_price'],
+        'avg_price': row['avg_price'],
+        'trend': _signed(row['trend_percentage']),
+        'trend_icon': 'up' if rising else 'down',
+        'trend_color': 'success' if rising else 'danger',
+        'market': MARKET_NAMES.get(row['market_name'], row['market_name']),
+        'updated': _ago(row['updated_at']),
+    }
+
+
+def latest_prices(crop_type=None, state=None, market=None, limit=PRICE_ROWS):
+    """Most recently updated active prices, optionally filtered.
+
+    Served by the (crop_type, state, market_name, updated_at) index when
+    filtered and by the partial updated_at index otherwise.
+    """
+    query = CropPrice.objects.filter(is_active=True)
+    if crop_type:
+        query = query.filter(crop_type=crop_type)
+    if state:
+        query = query.filter(state=state)
+    if market:
+        query = query.filter(market_name=market)
+    rows = query.order_by('-updated_at').values(*PRICE_FIELDS)[:limit]
+    return [price_row(row) for row in rows]
+
+
+def top_movers(limit=MOVER_ROWS, state=None, market=None):
+    """Biggest gainers and losers, read pre-sorted from the leaderboard (one query)."""
+    gainers, losers = leaderboard.top(leaderboard.scope_for(state, market), limit)
+    return (
+        [{'crop': entry['name'], 'change': _signed(entry['trend'])} for entry in gainers],
+        [{'crop': entry['name'], 'change': _signed(entry['trend'])} for entry in losers],
+    )
+
+
+def upcoming_forecasts(limit=FORECAST_ROWS):
+    """Strongest upcoming demand first, on the (forecast_date, -change_percentage) index."""
+    rows = DemandForecast.objects.filter(
+        forecast_date__gte=timezone.localdate(),
+    ).order_by('forecast_date', '-change_percentage').values(
+        'crop', 'market_name', 'period', 'demand_level', 'change_percentage',
+    )[:limit]
+    return [{
+        'crop': row['crop'],
+        'period': ' · '.join(filter(None, (row['period'], MARKET_NAMES.get(row['market_name'])))),
+        'demand_level': row['demand_level'],
+        'level_color': DEMAND_COLORS.get(row['demand_level'].lower(), 'secondary'),
+        'change': _signed(row['change_percentage']),
+    } for row in rows]
+
+
+def triggered_alerts(user, limit=ALERT_ROWS):
+    """The user's most recently triggered alerts; nothing for anonymous visitors."""
+    if not user.is_authenticated:
+        return []
+    rows = PriceAlert.objects.filter(
+        user=user, triggered_at__isnull=False,
+    ).order_by('-triggered_at').values('crop', 'alert_type', 'target_price', 'triggered_at')[:limit]
+
+    return [alert_row(row) for row in rows]
+
+
+def alert_row(row):
+    """Template/stream representation of a triggered PriceAlert row."""
+    priority, color = ALERT_PRIORITY.get(row['alert_type'], ('Low', 'info'))
+    return {
+        'crop': row['crop'],
+        'message': alert_message(row['alert_type'], row['target_price']),
+        'priority': priority,
+        'priority_color': color,
+        'time': _ago(row['triggered_at']),
+    }
+
+
+def latest_news(limit=NEWS_ROWS):
+    rows = MarketNews.objects.filter(is_active=True).order_by('-published_at').values(
+        'title', 'summary', 'category', 'published_at',
+    )[:limit]
+    return [{
+        'title': row['title'],
+        'summary': row['summary'],
+        'category': row['category'].title(),
+        'category_color': NEWS_COLORS.get(row['category'], 'secondary'),
+        'time': _ago(row['published_at']),
+    } for row in rows]
@@ -0,0 +1,348 @@
+# DX_APP/metrics.py
+"""
+Per-view request metrics, exposed in the Prometheus text format.
+
+``RequestMetricsMiddleware`` measures every request it sees (sync or async
+views). Each request gets a ``RequestStats`` in a context variable; the
+pieces of work fill it in as they happen:
+
+* SQL: an execute wrapper on every database connection counts queries and
+  their time
+* templates: the ``InstrumentedTemplates`` backend (settings.TEMPLATES)
+  times each top-level render
+* model inference: ``timer('inference')`` around the crop model and leaf
+  classifier calls
+* caches: ``count_cache()`` from the prediction and page caches
+
+When the response is ready, the numbers are added to per-view histograms,
+and requests slower than ``SLOW_REQUEST_SECONDS`` are logged with the
+breakdown. For streaming responses (the SSE endpoints) the time measured is
+the time to the first byte. The stream itself is passed through untouched.
+
+The histograms are HDR-style: ``SUB_BUCKETS`` linear buckets per power of
+two, so any value is recorded to within a few percent in constant time and
+memory. The ``le`` buckets exported (``METRICS['BUCKETS']``) can be changed
+without losing precision. The numbers are per process; with several workers
+Prometheus should scrape each one. ``/internal/metrics/`` is open to staff
+users and to requests carrying ``Authorization: Bearer <METRICS['TOKEN']>``
+only. The client address is not trusted: behind a reverse proxy every
+request comes from 127.0.0.1.
+"""
+import hmac
+import logging
+import math
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SLOW_REQUEST_SECONDS': 1.0,
+    'TOKEN': '',  # bearer token for scrapers; empty means staff users only
+    'BUCKETS': [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0],
+    'QUERY_BUCKETS': [0, 1, 2, 5, 10, 20, 50, 100, 200, 500],
+}
+
+LOWEST = 1e-6  # smallest value told apart from zero; query counts up to 32 get a bucket each
+SUB_BUCKETS = 32  # per power of two: about 3% relative error
+POWERS = 40  # up to 1e-6 * 2**40: about 12 days
+
+SECONDS = [
+    ('duration', 'dx_request_duration_seconds', 'Wall time per request, by view'),
+    ('db_time', 'dx_request_db_seconds', 'Time spent in SQL per request, by view'),
+    ('template_time', 'dx_request_template_seconds', 'Template rendering time per request, by view'),
+    ('inference_time', 'dx_request_inference_seconds', 'Model inference time per request, by view'),
+]
+
+current = ContextVar('request_stats', default=None)
+
+
+def load_config():
+    return {**DEFAULTS, **getattr(settings, 'METRICS', {})}
+
+
+class Histogram:
+    """Counts of values in log-linear buckets, HdrHistogram style; not thread-safe (see Registry)."""
+
+    __slots__ = ('counts', 'count', 'sum')
+
+    def __init__(self):
+        self.counts = [0] * (POWERS * SUB_BUCKETS + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    @staticmethod
+    def index(value):
+        if value < LOWEST:
+            return 0
+        mantissa, exponent = math.frexp(value / LOWEST)  # value / LOWEST = mantissa * 2**exponent, 0.5 <= mantissa < 1
+        return min((exponent - 1) * SUB_BUCKETS + int((mantissa * 2 - 1) * SUB_BUCKETS) + 1, POWERS * SUB_BUCKETS)
+
+    @staticmethod
+    def lower_bound(index):
+        if index == 0:
+            return 0.0
+        power, sub = divmod(index - 1, SUB_BUCKETS)
+        return LOWEST * 2 ** power * (1 + sub / SUB_BUCKETS)
+
+    def record(self, value):
+        self.counts[self.index(value) if value else 0] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self, bounds):
+        """Number of values <= each bound, to the precision of the buckets (exact for small integers)."""
+        results, total, index = [], 0, 0
+        for bound in bounds:
+            while index < len(self.counts) and self.lower_bound(index) <= bound:
+                total += self.counts[index]
+                index += 1
+            results.append(total)
+        return results
+
+
+class RequestStats:
+    __slots__ = ('queries', 'db_time', 'template_time', 'template_depth', 'inference_time', 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.inference_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+HISTOGRAMS = ('duration', 'db_time', 'template_time', 'inference_time', 'queries')
+
+
+class ViewMetrics:
+    """The histograms and status counts of one view."""
+
+    __slots__ = (*HISTOGRAMS, 'statuses')
+
+    def __init__(self):
+        for name in HISTOGRAMS:
+            setattr(self, name, Histogram())
+        self.statuses = defaultdict(int)
+
+
+class Registry:
+    def __init__(self):
+        self.views = defaultdict(ViewMetrics)
+        self.cache_lookups = defaultdict(int)  # (cache, result) -> count
+        self._lock = threading.Lock()
+
+    def record_request(self, view, status, duration, stats):
+        with self._lock:
+            metrics = self.views[view]
+            metrics.duration.record(duration)
+            metrics.db_time.record(stats.db_time)
+            metrics.template_time.record(stats.template_time)
+            metrics.inference_time.record(stats.inference_time)
+            metrics.queries.record(stats.queries)
+            metrics.statuses[status] += 1
+
+    def count_cache(self, cache, result, delta):
+        with self._lock:
+            self.cache_lookups[cache, result] += delta
+
+    def _histogram_lines(self, name, help_text, metric, bounds):
+        lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for view, metrics in sorted(self.views.items()):
+            histogram = getattr(metrics, metric)
+            label = f'view="{_escape(view)}"'
+            for bound, count in zip(bounds, histogram.cumulative(bounds)):
+                lines.append(f'{name}_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{{label},le="+Inf"}} {histogram.count}')
+            lines.append(f'{name}_sum{{{label}}} {histogram.sum:.6f}')
+            lines.append(f'{name}_count{{{label}}} {histogram.count}')
+        return lines
+
+    def render(self, config):
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            lines = []
+            for metric, name, help_text in SECONDS:
+                lines += self._histogram_lines(name, help_text, metric, config['BUCKETS'])
+            lines += self._histogram_lines(
+                'dx_request_db_queries', 'SQL queries per request, by view', 'queries', config['QUERY_BUCKETS'],
+            )
+            lines += ['# HELP dx_requests_total Requests, by view and status code', '# TYPE dx_requests_total counter']
+            for view, metrics in sorted(self.views.items()):
+                for status, count in sorted(metrics.statuses.items()):
+                    lines.append(f'dx_requests_total{{view="{_escape(view)}",status="{status}"}} {count}')
+            lines += ['# HELP dx_cache_requests_total Cache lookups, by cache and result',
+                      '# TYPE dx_cache_requests_total counter']
+            for (cache, result), count in sorted(self.cache_lookups.items()):
+                lines.append(f'dx_cache_requests_total{{cache="{_escape(cache)}",result="{result}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = Registry()
+
+
+# ---------- hooks used by the rest of the app ----------
+
+@contextmanager
+def timer(kind):
+    """Add the block's wall time to the current request's ``<kind>_time`` (a no-op outside a request)."""
+    stats = current.get()
+    if stats is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(stats, f'{kind}_time', getattr(stats, f'{kind}_time') + time.perf_counter() - started)
+
+
+def count_cache(cache, hits, misses=0):
+    """Record cache lookups, for the exported counters and the current request's slow-log breakdown."""
+    if hits:
+        registry.count_cache(cache, 'hit', hits)
+    if misses:
+        registry.count_cache(cache, 'miss', misses)
+    stats = current.get()
+    if stats is not None:
+        stats.cache_hits += hits
+        stats.cache_misses += misses
+
+
+def record_query(execute, sql, params, many, context):
+    stats = current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - started
+
+
+def _install_query_recorder(sender=None, connection=None, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedTemplate:
+    """A Django template whose top-level render() time is added to the current request."""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        stats = current.get()
+        if stats is None:
+            return self.template.render(context, request)
+        stats.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            stats.template_depth -= 1
+            if not stats.template_depth:  # a render_to_string inside a render is counted once
+                stats.template_time += time.perf_counter() - started
+
+
+class InstrumentedTemplates(DjangoTemplates):
+    """The Django template backend, with render times reported to the request metrics."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+# ---------- middleware ----------
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.config = load_config()
+        if not self.config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow = self.config['SLOW_REQUEST_SECONDS']
+        connection_created.connect(_install_query_recorder, dispatch_uid='dx_metrics_query_recorder')
+        for connection in connections.all(initialized_only=True):
+            _install_query_recorder(connection=connection)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        self.finish(request, response, time.perf_counter() - started, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        self.finish(request, response, time.perf_counter() - started, stats)
+        return response
+
+    def finish(self, request, response, duration, stats):
+        match = request.resolver_match
+        view = match.view_name if match is not None else 'unresolved'
+        registry.record_request(view, response.status_code, duration, stats)
+        if duration >= self.slow:
+            logger.warning(
+                'Slow request %s %s (%s) %.3fs: %d queries %.3fs, templates %.3fs, inference %.3fs, '
+                'cache %d hits/%d misses%s',
+                request.method, request.path, view, duration, stats.queries, stats.db_time,
+                stats.template_time, stats.inference_time, stats.cache_hits, stats.cache_misses,
+                ' (time to first byte of a stream)' if response.streaming else '',
+            )
+
+
+def authorized(request, config=None):
+    """Whether request may read the metrics: a staff user, or the configured bearer token."""
+    config = config or load_config()
+    if request.user.is_staff:
+        return True
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    return bool(config['TOKEN']) and scheme.lower() == 'bearer' and hmac.compare_digest(
+        token.strip().encode(), config['TOKEN'].encode(),
+    )
+
+
+def render():
+    return registry.render(load_config())
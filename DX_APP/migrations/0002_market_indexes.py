@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DX_APP', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Product',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('price', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='cropprice',
+            index=models.Index(fields=['crop_type', 'state', 'market_name', 'updated_at'], name='cropprice_lookup_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cropprice',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['updated_at'], name='cropprice_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cropprice',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['trend_percentage'], name='cropprice_trend_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='demandforecast',
+            index=models.Index(fields=['forecast_date'], name='demandforecast_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='marketnews',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['published_at'], name='marketnews_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pricealert',
+            index=models.Index(fields=['user', 'triggered_at'], name='pricealert_user_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DX_APP', '0002_market_indexes'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='cropprice',
+            constraint=models.UniqueConstraint(fields=('name', 'grade', 'market_name', 'state'), name='cropprice_unique_listing'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:33
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DX_APP', '0003_cropprice_unique_listing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceRollupCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_tick_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PriceTick',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('grade', models.CharField(max_length=50)),
+                ('state', models.CharField(choices=[('maharashtra', 'Maharashtra'), ('punjab', 'Punjab'), ('uttar_pradesh', 'Uttar Pradesh'), ('madhya_pradesh', 'Madhya Pradesh'), ('karnataka', 'Karnataka'), ('gujarat', 'Gujarat')], max_length=20)),
+                ('market_name', models.CharField(choices=[('mumbai', 'APMC Mumbai'), ('pune', 'APMC Pune'), ('nagpur', 'APMC Nagpur'), ('nashik', 'APMC Nashik'), ('aurangabad', 'APMC Aurangabad')], max_length=20)),
+                ('min_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('max_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('avg_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('recorded_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PriceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hourly'), ('day', 'Daily'), ('week', 'Weekly')], max_length=4)),
+                ('name', models.CharField(max_length=100)),
+                ('market_name', models.CharField(choices=[('mumbai', 'APMC Mumbai'), ('pune', 'APMC Pune'), ('nagpur', 'APMC Nagpur'), ('nashik', 'APMC Nashik'), ('aurangabad', 'APMC Aurangabad')], max_length=20)),
+                ('bucket', models.DateTimeField()),
+                ('open', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('high', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('low', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('close', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('price_sum', models.DecimalField(decimal_places=2, max_digits=18)),
+                ('tick_count', models.PositiveIntegerField()),
+                ('first_at', models.DateTimeField()),
+                ('last_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['bucket'],
+                'constraints': [models.UniqueConstraint(fields=('period', 'name', 'market_name', 'bucket'), name='pricerollup_bucket_unique')],
+            },
+        ),
+    ]
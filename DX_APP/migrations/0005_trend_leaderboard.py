@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DX_APP', '0004_price_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendLeaderboard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=40)),
+                ('direction', models.CharField(choices=[('gainers', 'Top Gainers'), ('losers', 'Top Losers')], max_length=7)),
+                ('entries', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('scope', 'direction'), name='trendleaderboard_unique')],
+            },
+        ),
+    ]
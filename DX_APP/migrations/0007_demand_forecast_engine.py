@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DX_APP', '0006_notification_queue'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='demandforecast',
+            name='demandforecast_date_idx',
+        ),
+        migrations.AddField(
+            model_name='demandforecast',
+            name='market_name',
+            field=models.CharField(blank=True, choices=[('mumbai', 'APMC Mumbai'), ('pune', 'APMC Pune'), ('nagpur', 'APMC Nagpur'), ('nashik', 'APMC Nashik'), ('aurangabad', 'APMC Aurangabad')], max_length=20),
+        ),
+        migrations.AddField(
+            model_name='demandforecast',
+            name='method',
+            field=models.CharField(blank=True, max_length=30),
+        ),
+        migrations.AddIndex(
+            model_name='demandforecast',
+            index=models.Index(fields=['forecast_date', '-change_percentage'], name='demandforecast_date_idx'),
+        ),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# The knowledge base that used to be a dict literal in views.disease_diagnosis
+DISEASES = [
+    ('rice', 'Rice Blast', 85, 'Fungal disease causing spindle-shaped spots on leaves',
+     'High humidity and temperature between 25-30°C',
+     ['yellow leaves'], ['Apply fungicides like Tricyclazole or Azoxystrobin'],
+     ('Spindle-shaped spots on leaves', '🌾', 'danger')),
+    ('rice', 'Brown Spot', 78, 'Circular brown spots with yellow halo',
+     'Poor soil nutrition and warm humid conditions',
+     ['brown spots'], ['Improve soil nutrition, apply Mancozeb'], None),
+    ('wheat', 'Yellow Rust', 92, 'Yellow-orange pustules on leaves',
+     'Cool temperatures (10-15°C) with high humidity',
+     ['yellow rust'], ['Use resistant varieties, apply Propiconazole'],
+     ('Yellow-orange pustules', '🌾', 'warning')),
+    ('wheat', 'Powdery Mildew', 87, 'White powdery growth on leaves and stems',
+     'Moderate temperatures with high humidity',
+     ['powdery mildew'], ['Apply Sulfur-based fungicides, improve air circulation'],
+     ('White powdery growth', '🍃', 'info')),
+    ('tomato', 'Late Blight', 90, 'Water-soaked lesions on leaves and fruits',
+     'Cool wet conditions, Phytophthora infestans fungus',
+     ['late blight'], ['Remove infected plants, apply Copper fungicides'],
+     ('Water-soaked lesions', '🍅', 'danger')),
+    ('tomato', 'Early Blight', 82, 'Target-like spots with concentric rings',
+     'Alternaria fungus, warm humid weather',
+     ['early blight'], ['Apply Chlorothalonil, practice crop rotation'], None),
+]
+
+
+def seed_diseases(apps, schema_editor):
+    Disease = apps.get_model('DX_APP', 'Disease')
+    Symptom = apps.get_model('DX_APP', 'Symptom')
+    Treatment = apps.get_model('DX_APP', 'Treatment')
+    for crop, name, confidence, description, causes, phrases, steps, card in DISEASES:
+        summary, icon, color = card or ('', '', 'warning')
+        disease = Disease.objects.create(
+            crop=crop, name=name, confidence=confidence, description=description, causes=causes,
+            featured=card is not None, summary=summary, icon=icon, color=color,
+        )
+        Symptom.objects.bulk_create(Symptom(disease=disease, phrase=phrase) for phrase in phrases)
+        Treatment.objects.bulk_create(
+            Treatment(disease=disease, step=step, position=position) for position, step in enumerate(steps)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DX_APP', '0007_demand_forecast_engine'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Disease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('crop', models.CharField(choices=[('rice', 'Rice'), ('wheat', 'Wheat'), ('maize', 'Maize'), ('tomato', 'Tomato'), ('potato', 'Potato'), ('cotton', 'Cotton'), ('sugarcane', 'Sugarcane'), ('vegetables', 'Vegetables'), ('fruits', 'Fruits'), ('other', 'Other')], max_length=20)),
+                ('name', models.CharField(max_length=100)),
+                ('description', models.TextField()),
+                ('causes', models.TextField()),
+                ('confidence', models.PositiveSmallIntegerField(help_text='Confidence (%) reported for a symptom match')),
+                ('featured', models.BooleanField(default=False)),
+                ('summary', models.CharField(blank=True, max_length=200)),
+                ('icon', models.CharField(blank=True, max_length=10)),
+                ('color', models.CharField(default='warning', max_length=20)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['crop', 'name'],
+                'constraints': [models.UniqueConstraint(fields=('crop', 'name'), name='disease_unique_name')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Treatment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('step', models.TextField()),
+                ('position', models.PositiveSmallIntegerField(default=0)),
+                ('disease', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='treatments', to='DX_APP.disease')),
+            ],
+            options={
+                'ordering': ['disease', 'position'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Symptom',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phrase', models.CharField(max_length=200)),
+                ('disease', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='symptoms', to='DX_APP.disease')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('disease', 'phrase'), name='symptom_unique_phrase')],
+            },
+        ),
+        migrations.RunPython(seed_diseases, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:04
+
+from django.db import migrations, models
+
+
+# Where the seeded symptoms show; Powdery Mildew and Late Blight stay blank (several parts)
+PLANT_PARTS = {
+    'Rice Blast': 'leaf',
+    'Brown Spot': 'leaf',
+    'Yellow Rust': 'leaf',
+    'Early Blight': 'leaf',
+}
+
+
+def set_plant_parts(apps, schema_editor):
+    Symptom = apps.get_model('DX_APP', 'Symptom')
+    for name, plant_part in PLANT_PARTS.items():
+        Symptom.objects.filter(disease__name=name).update(plant_part=plant_part)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DX_APP', '0008_disease_knowledge_base'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='symptom',
+            name='plant_part',
+            field=models.CharField(blank=True, choices=[('leaf', 'Leaf'), ('stem', 'Stem'), ('fruit', 'Fruit'), ('root', 'Root'), ('flower', 'Flower'), ('whole_plant', 'Whole Plant')], help_text='Part of the plant it shows on; blank for any', max_length=20),
+        ),
+        migrations.RunPython(set_plant_parts, migrations.RunPython.noop),
+    ]
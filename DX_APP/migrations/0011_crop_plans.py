@@ -0,0 +1,94 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# The weekly plans that used to be dict literals in DX_APP/views.py
+PLANS = {
+    ('rice', 'en'): [
+        (1, 'Prepare field and add fertilizer', 'Fungus medicine', 'Keep water', '🌱', 'Use clean water'),
+        (2, 'Transplant seedlings', 'None', 'Do not let field dry', '🌾', 'Plant gently'),
+        (3, 'Add water', 'None', 'Check water level', '💧', 'Water in morning'),
+        (4, 'Look for bugs', 'Bug spray', 'Check leaves', '🐛', 'Use spray only if needed'),
+    ],
+    ('wheat', 'en'): [
+        (1, 'Sow seeds and add fertilizer', 'None', 'Keep soil moist', '🌱', 'Use good seeds'),
+        (2, 'Add water', 'None', 'Do not flood', '💧', 'Water in morning'),
+        (3, 'Remove weeds', 'Weed killer', 'Wear gloves', '🌿', 'Pull weeds by hand'),
+        (4, 'Check for disease', 'Fungus medicine', 'Check leaves', '🍂', 'Yellow spots mean disease'),
+    ],
+    ('maize', 'en'): [
+        (1, 'Plant seeds', 'None', 'Keep soil moist', '🌽', 'Use quality seeds'),
+        (2, 'Water regularly', 'None', 'Avoid overwatering', '💧', 'Morning watering is best'),
+        (3, 'Check for pests', 'Pest control', 'Wear protection', '🐛', 'Early detection helps'),
+        (4, 'Add fertilizer', 'None', 'Follow instructions', '🧪', 'Balance nutrients'),
+    ],
+    ('rice', 'hi'): [
+        (1, 'खेत तैयार करें और खाद डालें', 'फफूंदी दवा', 'पानी रखें', '🌱', 'साफ पानी का उपयोग करें'),
+        (2, 'पौधे लगाएं', 'कोई नहीं', 'खेत सूखने न दें', '🌾', 'धीरे से लगाएं'),
+        (3, 'पानी डालें', 'कोई नहीं', 'पानी स्तर जांचें', '💧', 'सुबह पानी डालें'),
+        (4, 'कीट जांचें', 'कीटनाशक', 'पत्ते जांचें', '🐛', 'आवश्यकता होने पर छिड़कें'),
+    ],
+    ('wheat', 'hi'): [
+        (1, 'बीज बोएं और खाद डालें', 'कोई नहीं', 'मिट्टी नम रखें', '🌱', 'अच्छे बीज उपयोग करें'),
+        (2, 'पानी डालें', 'कोई नहीं', 'अधिक पानी न डालें', '💧', 'सुबह पानी डालें'),
+    ],
+    ('rice', 'mr'): [
+        (1, 'शेती तयार करा आणि खत घाला', 'बुरशी औषध', 'पाणी ठेवा', '🌱', 'स्वच्छ पाणी वापरा'),
+        (2, 'रोपे लावा', 'काही नाही', 'शेत कोरडे होऊ देऊ नका', '🌾', 'सावकाश लावा'),
+    ],
+}
+
+
+def seed_plans(apps, schema_editor):
+    CropPlan = apps.get_model('DX_APP', 'CropPlan')
+    CropPlanWeek = apps.get_model('DX_APP', 'CropPlanWeek')
+    for (crop, lang), weeks in PLANS.items():
+        plan = CropPlan.objects.create(crop=crop, lang=lang)
+        CropPlanWeek.objects.bulk_create(
+            CropPlanWeek(plan=plan, week=week, task=task, medicine=medicine, precaution=precaution, icon=icon, tip=tip)
+            for week, task, medicine, precaution, icon, tip in weeks
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DX_APP', '0010_job_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CropPlan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('crop', models.CharField(max_length=50)),
+                ('lang', models.CharField(choices=[('en', 'English'), ('hi', 'Hindi'), ('mr', 'Marathi')], default='en', max_length=2)),
+                ('version', models.PositiveIntegerField(default=1, editable=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['crop', 'lang'],
+                'constraints': [models.UniqueConstraint(fields=('crop', 'lang'), name='cropplan_unique_lang')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CropPlanWeek',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week', models.PositiveSmallIntegerField()),
+                ('task', models.CharField(max_length=200)),
+                ('medicine', models.CharField(max_length=100)),
+                ('precaution', models.CharField(max_length=200)),
+                ('icon', models.CharField(blank=True, max_length=10)),
+                ('tip', models.CharField(blank=True, max_length=200)),
+                ('plan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weeks', to='DX_APP.cropplan')),
+            ],
+            options={
+                'ordering': ['plan', 'week'],
+                'constraints': [models.UniqueConstraint(fields=('plan', 'week'), name='cropplanweek_unique_week')],
+            },
+        ),
+        migrations.RunPython(seed_plans, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:47
+
+from django.db import migrations, models
+
+
+# The cards as views.disease_diagnosis listed them before the knowledge base moved into models.
+# Powdery Mildew is diagnosed under wheat but its card read "Multiple".
+CARDS = [
+    ('Rice Blast', ''),
+    ('Yellow Rust', ''),
+    ('Late Blight', ''),
+    ('Powdery Mildew', 'Multiple'),
+]
+
+
+def restore_cards(apps, schema_editor):
+    Disease = apps.get_model('DX_APP', 'Disease')
+    for position, (name, card_crop) in enumerate(CARDS, 1):
+        Disease.objects.filter(name=name, featured=True).update(card_position=position, card_crop=card_crop)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DX_APP', '0012_user_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='disease',
+            name='card_crop',
+            field=models.CharField(blank=True, help_text='Crop shown on the card instead of this one, e.g. "Multiple"', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='disease',
+            name='card_position',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Cards are shown in this order'),
+        ),
+        migrations.RunPython(restore_cards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,117 @@
+# DX_APP/model_registry.py
+"""
+Lazy, hot-reloadable access to the crop recommendation model.
+
+Nothing is read at import time: the model file is loaded on the first
+prediction and re-loaded whenever its mtime/size change on disk, so a new
+model can be swapped in (``os.replace`` the file) without restarting the
+workers. ``.joblib`` artifacts are opened with ``mmap_mode`` so their NumPy
+arrays are backed by the page cache and shared between processes. The
+default model is such an export (crop_recommendation_model.joblib, made
+from the .pkl next to it by ``manage.py export_crop_model``); re-export
+after replacing the .pkl. A .pkl path still works but is loaded into each
+process's own memory.
+
+Forests are also exposed as a ``FlatForest`` for low-latency small batches;
+``.joblib`` exports carry a pre-built one, otherwise it is built on load.
+"""
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import namedtuple
+
+import joblib
+from django.conf import settings
+
+from .features import check_feature_columns
+from .forest import FlatForest
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(__file__), 'crop_recommendation_model.joblib')
+# The pickled model the default export is made from
+SOURCE_MODEL_PATH = os.path.join(os.path.dirname(__file__), 'crop_recommendation_model.pkl')
+
+LoadedModel = namedtuple('LoadedModel', ['model', 'flat_model', 'label_encoder', 'feature_columns', 'version'])
+
+
+def load_artifacts(path, mmap_mode='r'):
+    """Read a model file and return ``(model, flat_model, label_encoder, feature_columns)``.
+
+    Understands the artifacts dict written by
+    ``ml/train_model.py:save_model_and_artifacts``, the ``.joblib`` export
+    of it (which adds ``flat_model``) and a bare pickled model.
+    """
+    if path.endswith('.joblib'):
+        artifacts = joblib.load(path, mmap_mode=mmap_mode)
+    else:
+        with open(path, 'rb') as f:
+            artifacts = pickle.load(f)
+    if not isinstance(artifacts, dict):
+        artifacts = {'model': artifacts, 'label_encoder': None, 'feature_columns': None}
+
+    if artifacts['feature_columns'] is not None:
+        check_feature_columns(artifacts['feature_columns'])
+    model = artifacts['model']
+    flat_model = artifacts.get('flat_model')
+    if flat_model is None and hasattr(model, 'estimators_'):
+        flat_model = FlatForest.from_sklearn(model)
+    return model, flat_model, artifacts['label_encoder'], artifacts['feature_columns']
+
+
+class ModelRegistry:
+    """Holds the current model version and reloads it when the file changes."""
+
+    def __init__(self, path, check_interval=2.0, mmap_mode='r'):
+        self.path = str(path)
+        self.check_interval = check_interval
+        self.mmap_mode = mmap_mode
+        self._current = None
+        self._failed_version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _file_version(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return f'{stat.st_mtime_ns:x}-{stat.st_size:x}'
+
+    def get(self):
+        """Return the current ``LoadedModel``, or ``None`` if there is no model file."""
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return self._current
+
+        with self._lock:
+            version = self._file_version()
+            self._checked_at = time.monotonic()
+            if self._current is not None and self._current.version == version:
+                return self._current
+            if version is None:
+                if self._current is None:
+                    logger.warning('Model file not found at %s (run manage.py export_crop_model)', self.path)
+                return self._current
+            if version == self._failed_version:
+                return self._current
+
+            try:
+                artifacts = load_artifacts(self.path, self.mmap_mode)
+            except Exception:
+                # A half-copied or incompatible file: keep serving the old version
+                logger.exception('Could not load model from %s', self.path)
+                self._failed_version = version
+                return self._current
+
+            if self._current is not None:
+                logger.info('Reloaded model %s (version %s)', self.path, version)
+            self._current = LoadedModel(*artifacts, version)
+            return self._current
+
+
+registry = ModelRegistry(
+    getattr(settings, 'CROP_MODEL_PATH', DEFAULT_MODEL_PATH),
+    check_interval=getattr(settings, 'CROP_MODEL_RELOAD_INTERVAL', 2.0),
+)
@@ -1,4 +1,6 @@
 # models.py
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
@@ -50,6 +52,34 @@ class CropPrice(models.Model):
     
     class Meta:
         ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['crop_type', 'state', 'market_name', 'updated_at'], name='cropprice_lookup_idx'),
+            # Partial: SQLite compiles is_active=True to a bare column test, which
+            # can only be matched by an index with the same condition
+            models.Index(fields=['updated_at'], condition=models.Q(is_active=True), name='cropprice_active_idx'),
+            models.Index(fields=['trend_percentage'], condition=models.Q(is_active=True), name='cropprice_trend_idx'),
+        ]
+        constraints = [
+            # One row per listing; daily feeds upsert on it
+            models.UniqueConstraint(fields=['name', 'grade', 'market_name', 'state'], name='cropprice_unique_listing'),
+        ]
+
+class UserProfile(models.Model):
+    """What registration asks for beyond the User fields; the phone number is where SMS alerts go."""
+    USER_TYPES = [
+        ('farmer', 'Farmer'),
+        ('buyer', 'Buyer'),
+        ('expert', 'Agriculture Expert'),
+        ('other', 'Other'),
+    ]
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
+    phone = models.CharField(max_length=15, blank=True)
+    user_type = models.CharField(max_length=10, choices=USER_TYPES, default='farmer')
+    location = models.CharField(max_length=100, blank=True)
+
+    def __str__(self):
+        return f"{self.user.username} ({self.phone})"
 
 class PriceAlert(models.Model):
     ALERT_TYPES = [
@@ -69,6 +99,9 @@ class PriceAlert(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'triggered_at'], name='pricealert_user_idx'),
+        ]
 
 class MarketNews(models.Model):
     CATEGORIES = [
@@ -90,17 +123,298 @@ class MarketNews(models.Model):
     class Meta:
         ordering = ['-published_at']
         verbose_name_plural = 'Market News'
+        indexes = [
+            models.Index(fields=['published_at'], condition=models.Q(is_active=True), name='marketnews_active_idx'),
+        ]
 
 class DemandForecast(models.Model):
     crop = models.CharField(max_length=100)
+    market_name = models.CharField(max_length=20, choices=CropPrice.MARKETS, blank=True)
     period = models.CharField(max_length=50)
     demand_level = models.CharField(max_length=20)
     change_percentage = models.DecimalField(max_digits=5, decimal_places=2)
     forecast_date = models.DateField()
+    method = models.CharField(max_length=30, blank=True)
     
     class Meta:
         ordering = ['forecast_date']
+        indexes = [
+            models.Index(fields=['forecast_date', '-change_percentage'], name='demandforecast_date_idx'),
+        ]
+
+class PriceTick(models.Model):
+    """Append-only log of every price a CropPrice listing has had."""
+    name = models.CharField(max_length=100)
+    grade = models.CharField(max_length=50)
+    state = models.CharField(max_length=20, choices=CropPrice.STATES)
+    market_name = models.CharField(max_length=20, choices=CropPrice.MARKETS)
+    min_price = models.DecimalField(max_digits=10, decimal_places=2)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2)
+    avg_price = models.DecimalField(max_digits=10, decimal_places=2)
+    recorded_at = models.DateTimeField(default=timezone.now)
+
+class PriceRollup(models.Model):
+    """OHLC/average of the ticks of one crop in one market over an hour, day or week."""
+    PERIODS = [
+        ('hour', 'Hourly'),
+        ('day', 'Daily'),
+        ('week', 'Weekly'),
+    ]
+
+    period = models.CharField(max_length=4, choices=PERIODS)
+    name = models.CharField(max_length=100)
+    market_name = models.CharField(max_length=20, choices=CropPrice.MARKETS)
+    bucket = models.DateTimeField()
+    open = models.DecimalField(max_digits=10, decimal_places=2)
+    high = models.DecimalField(max_digits=10, decimal_places=2)
+    low = models.DecimalField(max_digits=10, decimal_places=2)
+    close = models.DecimalField(max_digits=10, decimal_places=2)
+    # Sum and count rather than the mean, so new ticks can be merged in
+    price_sum = models.DecimalField(max_digits=18, decimal_places=2)
+    tick_count = models.PositiveIntegerField()
+    first_at = models.DateTimeField()
+    last_at = models.DateTimeField()
+
+    @property
+    def avg_price(self):
+        return self.price_sum / self.tick_count
+
+    class Meta:
+        ordering = ['bucket']
+        constraints = [
+            # Also the index for "one crop, one market, a range of buckets"
+            models.UniqueConstraint(fields=['period', 'name', 'market_name', 'bucket'], name='pricerollup_bucket_unique'),
+        ]
+
+class PriceRollupCheckpoint(models.Model):
+    """Id of the last PriceTick folded into the rollups (a single row)."""
+    last_tick_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+class Notification(models.Model):
+    """One message to deliver for a triggered PriceAlert; the dispatch worker's queue."""
+    CHANNELS = [
+        ('email', 'Email'),
+        ('sms', 'SMS'),
+        ('app', 'In-app'),
+    ]
+
+    STATUSES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    alert = models.ForeignKey(PriceAlert, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    channel = models.CharField(max_length=5, choices=CHANNELS)
+    triggered_at = models.DateTimeField()  # the trigger this message is for
+    recipient = models.CharField(max_length=254, blank=True)
+    subject = models.CharField(max_length=200)
+    body = models.TextField()
+    status = models.CharField(max_length=7, choices=STATUSES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    leased_until = models.DateTimeField(null=True, blank=True)
+    claim_token = models.CharField(max_length=32, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='notification_queue_idx'),
+            models.Index(fields=['claim_token'], name='notification_claim_idx'),
+        ]
+        constraints = [
+            # A trigger never fans out twice to the same channel
+            models.UniqueConstraint(fields=['alert', 'channel', 'triggered_at'], name='notification_unique_trigger'),
+        ]
+
+class TrendLeaderboard(models.Model):
+    """The best trend_percentage listings of one scope, kept sorted by the price ingester."""
+    DIRECTIONS = [
+        ('gainers', 'Top Gainers'),
+        ('losers', 'Top Losers'),
+    ]
+
+    scope = models.CharField(max_length=40)  # 'all', 'state:<code>' or 'market:<code>'
+    direction = models.CharField(max_length=7, choices=DIRECTIONS)
+    entries = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'direction'], name='trendleaderboard_unique'),
+        ]
         
+class Disease(models.Model):
+    """A crop disease in the diagnosis knowledge base (see DX_APP/diagnosis.py)."""
+    CROPS = [
+        ('rice', 'Rice'),
+        ('wheat', 'Wheat'),
+        ('maize', 'Maize'),
+        ('tomato', 'Tomato'),
+        ('potato', 'Potato'),
+        ('cotton', 'Cotton'),
+        ('sugarcane', 'Sugarcane'),
+        ('vegetables', 'Vegetables'),
+        ('fruits', 'Fruits'),
+        ('other', 'Other'),
+    ]
+
+    crop = models.CharField(max_length=20, choices=CROPS)
+    name = models.CharField(max_length=100)
+    description = models.TextField()
+    causes = models.TextField()
+    confidence = models.PositiveSmallIntegerField(help_text='Confidence (%) reported for a symptom match')
+    # Quick-reference card on the diagnosis page
+    featured = models.BooleanField(default=False)
+    summary = models.CharField(max_length=200, blank=True)
+    card_crop = models.CharField(max_length=50, blank=True,
+                                 help_text='Crop shown on the card instead of this one, e.g. "Multiple"')
+    card_position = models.PositiveSmallIntegerField(default=0, help_text='Cards are shown in this order')
+    icon = models.CharField(max_length=10, blank=True)
+    color = models.CharField(max_length=20, default='warning')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['crop', 'name']
+        constraints = [
+            models.UniqueConstraint(fields=['crop', 'name'], name='disease_unique_name'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.get_crop_display()})"
+
+
+class Symptom(models.Model):
+    """A phrase that, found in a farmer's description, points to the disease."""
+    PLANT_PARTS = [
+        ('leaf', 'Leaf'),
+        ('stem', 'Stem'),
+        ('fruit', 'Fruit'),
+        ('root', 'Root'),
+        ('flower', 'Flower'),
+        ('whole_plant', 'Whole Plant'),
+    ]
+
+    disease = models.ForeignKey(Disease, on_delete=models.CASCADE, related_name='symptoms')
+    phrase = models.CharField(max_length=200)
+    plant_part = models.CharField(max_length=20, choices=PLANT_PARTS, blank=True,
+                                  help_text='Part of the plant it shows on; blank for any')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['disease', 'phrase'], name='symptom_unique_phrase'),
+        ]
+
+    def __str__(self):
+        return self.phrase
+
+
+class Treatment(models.Model):
+    disease = models.ForeignKey(Disease, on_delete=models.CASCADE, related_name='treatments')
+    step = models.TextField()
+    position = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        ordering = ['disease', 'position']
+
+    def __str__(self):
+        return self.step
+
+class Job(models.Model):
+    """Heavy work submitted through the jobs API and run by ``manage.py run_jobs`` (see DX_APP/jobs.py)."""
+    KINDS = [
+        ('leaf_diagnosis', 'Leaf image diagnosis'),
+        ('recommendation_batch', 'Crop recommendation batch'),
+    ]
+
+    STATUSES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=20, choices=KINDS)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    priority = models.PositiveSmallIntegerField(default=5, help_text='Lower runs first')
+    status = models.CharField(max_length=7, choices=STATUSES, default='pending')
+    payload = models.JSONField(default=dict)
+    data = models.BinaryField(null=True, blank=True)  # uploaded file, dropped once the job finishes
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    leased_until = models.DateTimeField(null=True, blank=True)
+    claim_token = models.CharField(max_length=32, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'kind', 'priority', 'next_attempt_at'], name='job_queue_idx'),
+            models.Index(fields=['claim_token'], name='job_claim_idx'),
+            models.Index(fields=['expires_at'], name='job_expiry_idx'),
+        ]
+
+
+class CropPlan(models.Model):
+    """The weekly plan shown with a crop recommendation, in one language (see DX_APP/crop_plans.py)."""
+    LANGUAGES = [
+        ('en', 'English'),
+        ('hi', 'Hindi'),
+        ('mr', 'Marathi'),
+    ]
+
+    crop = models.CharField(max_length=50)
+    lang = models.CharField(max_length=2, choices=LANGUAGES, default='en')
+    # Part of the rendered fragment's cache key; bumped on every save, which the admin
+    # also does when only the inline weeks change
+    version = models.PositiveIntegerField(default=1, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['crop', 'lang']
+        constraints = [
+            models.UniqueConstraint(fields=['crop', 'lang'], name='cropplan_unique_lang'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            self.version += 1
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.crop} ({self.get_lang_display()}) v{self.version}"
+
+
+class CropPlanWeek(models.Model):
+    plan = models.ForeignKey(CropPlan, on_delete=models.CASCADE, related_name='weeks')
+    week = models.PositiveSmallIntegerField()
+    task = models.CharField(max_length=200)
+    medicine = models.CharField(max_length=100)
+    precaution = models.CharField(max_length=200)
+    icon = models.CharField(max_length=10, blank=True)
+    tip = models.CharField(max_length=200, blank=True)
+
+    class Meta:
+        ordering = ['plan', 'week']
+        constraints = [
+            models.UniqueConstraint(fields=['plan', 'week'], name='cropplanweek_unique_week'),
+        ]
+
+    def __str__(self):
+        return f"Week {self.week}: {self.task}"
+
 from django.db import models
 
 class Product(models.Model):
@@ -0,0 +1,262 @@
+# DX_APP/notifications.py
+"""
+Delivery of price alert notifications.
+
+Triggering an alert only inserts Notification rows, one per channel in
+``PriceAlert.notification_method``. The insert happens in the
+transaction that marks the alert. A unique constraint on (alert, channel,
+triggered_at) makes sure one trigger is queued at most once per channel.
+
+``Dispatcher`` (run by ``manage.py dispatch_notifications``) is an
+asyncio worker that drains the table:
+
+* claims due rows with a lease and a claim token, so concurrent workers
+  never pick the same row
+* groups them per channel into provider-sized batches
+* sends up to ``CONCURRENCY[channel]`` batches at once per provider; the
+  blocking SMTP/HTTP calls run in threads so one slow provider does not
+  hold up the others
+* retries transient failures with exponential backoff and jitter, up to
+  ``MAX_ATTEMPTS``; permanent failures are not retried
+
+If a worker dies mid-batch, its lease expires and the rows are claimed
+again. Delivery is therefore at-least-once for that batch only.
+"""
+import asyncio
+import json
+import logging
+import random
+import smtplib
+import urllib.error
+import urllib.request
+import uuid
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import mail
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Notification, PriceAlert
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'SMS_URL': None,
+    'SMS_TIMEOUT': 10,  # seconds
+    'BATCH_SIZE': {'email': 50, 'sms': 100, 'app': 500},
+    'CONCURRENCY': {'email': 2, 'sms': 4, 'app': 1},
+    'CLAIM_SIZE': 1000,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_SECONDS': 30,
+    'MAX_BACKOFF_SECONDS': 3600,
+    'LEASE_SECONDS': 300,
+    'POLL_SECONDS': 5,
+}
+
+CHANNELS = [code for code, label in Notification.CHANNELS]
+ENQUEUE_CHUNK = 5000
+
+
+def alert_message(alert_type, target_price):
+    if alert_type == 'above':
+        return f'Price crossed ₹{target_price:.0f} mark'
+    if alert_type == 'below':
+        return f'Price dropped below ₹{target_price:.0f}'
+    return f'Price moved by {target_price:.1f}%'
+
+
+def _recipient(channel, email, phone):
+    # Rows without an address for their channel fail permanently when sent
+    if channel == 'email':
+        return email or ''
+    if channel == 'sms':
+        return phone or ''
+    return ''
+
+
+def enqueue_notifications(alert_ids, triggered_at):
+    """Queue one Notification per channel of each triggered alert; duplicates are ignored."""
+    alert_ids = [int(alert_id) for alert_id in alert_ids]
+    for start in range(0, len(alert_ids), ENQUEUE_CHUNK):
+        rows = PriceAlert.objects.filter(id__in=alert_ids[start:start + ENQUEUE_CHUNK]).values_list(
+            'id', 'user_id', 'user__email', 'user__profile__phone', 'crop', 'alert_type', 'target_price', 'notification_method',
+        )
+        queued = []
+        for alert_id, user_id, email, phone, crop, alert_type, target, channels in rows:
+            message = alert_message(alert_type, target)
+            for channel in dict.fromkeys(channels or ()):
+                if channel not in CHANNELS:
+                    continue
+                queued.append(Notification(
+                    alert_id=alert_id, user_id=user_id, channel=channel, triggered_at=triggered_at,
+                    recipient=_recipient(channel, email, phone),
+                    subject=f'Price alert: {crop}', body=f'{crop}: {message}',
+                    next_attempt_at=triggered_at,
+                ))
+        Notification.objects.bulk_create(queued, ignore_conflicts=True, batch_size=1000)
+
+
+# ---------- queue operations (sync, called through sync_to_async) ----------
+
+def claim(limit, lease_seconds):
+    """Lease up to limit due notifications to this caller; returns (claim token, notifications)."""
+    now = timezone.now()
+    due = Q(status='pending', next_attempt_at__lte=now) | Q(status='sending', leased_until__lt=now)
+    ids = list(Notification.objects.filter(due).order_by('next_attempt_at').values_list('id', flat=True)[:limit])
+    if not ids:
+        return None, []
+    token = uuid.uuid4().hex
+    # Re-checking `due` makes the UPDATE the arbiter when workers race for the same ids
+    Notification.objects.filter(due, id__in=ids).update(
+        status='sending', claim_token=token, leased_until=now + timedelta(seconds=lease_seconds),
+    )
+    return token, list(Notification.objects.filter(claim_token=token, status='sending').values(
+        'id', 'channel', 'recipient', 'subject', 'body', 'attempts',
+    ))
+
+
+def record(results, config, token):
+    """Write back delivery outcomes: {id: None | ('retry', error) | ('fail', error)}.
+
+    Only rows still leased under token are written: a worker whose lease ran
+    out must not overwrite the outcome of the one that reclaimed the row.
+    """
+    now = timezone.now()
+    leased = Notification.objects.filter(claim_token=token, status='sending')
+    sent = [notification_id for notification_id, outcome in results.items() if outcome is None]
+    if sent:
+        leased.filter(id__in=sent).update(status='sent', sent_at=now, leased_until=None, last_error='')
+
+    problems = {notification_id: outcome for notification_id, outcome in results.items() if outcome is not None}
+    if not problems:
+        return
+    attempts = dict(leased.filter(id__in=list(problems)).values_list('id', 'attempts'))
+    for notification_id, done in attempts.items():
+        kind, error = problems[notification_id]
+        done += 1
+        changes = {'attempts': done, 'last_error': error, 'leased_until': None}
+        if kind == 'fail' or done >= config['MAX_ATTEMPTS']:
+            changes['status'] = 'failed'
+        else:
+            changes.update(status='pending', next_attempt_at=now + timedelta(seconds=backoff(done, config)))
+        leased.filter(id=notification_id).update(**changes)
+
+
+def backoff(attempts, config):
+    """Exponential backoff, capped, with jitter so retries from one outage spread out."""
+    ceiling = min(config['BACKOFF_SECONDS'] * 2 ** (attempts - 1), config['MAX_BACKOFF_SECONDS'])
+    return random.uniform(ceiling / 2, ceiling)
+
+
+# ---------- providers (blocking; run in threads) ----------
+
+def send_email(batch, config):
+    """Send a batch over one SMTP connection; each message gets its own outcome."""
+    results = {}
+    with mail.get_connection(fail_silently=False) as connection:
+        for position, item in enumerate(batch):
+            if not item['recipient']:
+                results[item['id']] = ('fail', 'user has no email address')
+                continue
+            message = mail.EmailMessage(item['subject'], item['body'], to=[item['recipient']], connection=connection)
+            try:
+                message.send()
+            except smtplib.SMTPRecipientsRefused as e:
+                results[item['id']] = ('fail', str(e))
+            except (smtplib.SMTPException, OSError) as e:
+                # The connection is unusable: retry this message and everything after it
+                for rest in batch[position:]:
+                    results[rest['id']] = ('retry', str(e))
+                break
+            else:
+                results[item['id']] = None
+    return results
+
+
+def send_sms(batch, config):
+    """POST a batch to the SMS gateway as {"messages": [{"to", "text"}]}."""
+    results = {item['id']: ('fail', 'user has no phone number') for item in batch if not item['recipient']}
+    batch = [item for item in batch if item['recipient']]
+    if not batch:
+        return results
+    if not config['SMS_URL']:
+        results.update((item['id'], ('fail', 'SMS gateway not configured')) for item in batch)
+        return results
+
+    payload = json.dumps({'messages': [{'to': item['recipient'], 'text': item['body']} for item in batch]})
+    request = urllib.request.Request(
+        config['SMS_URL'], data=payload.encode(), headers={'Content-Type': 'application/json'}, method='POST',
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=config['SMS_TIMEOUT']):
+            outcome = None
+    except urllib.error.HTTPError as e:
+        kind = 'retry' if e.code >= 500 or e.code == 429 else 'fail'
+        outcome = (kind, f'HTTP {e.code}')
+    except (urllib.error.URLError, OSError) as e:
+        outcome = ('retry', str(e))
+    results.update((item['id'], outcome) for item in batch)
+    return results
+
+
+def send_app(batch, config):
+    """In-app notifications are read straight from the table; queuing them was the delivery."""
+    return {item['id']: None for item in batch}
+
+
+PROVIDERS = {'email': send_email, 'sms': send_sms, 'app': send_app}
+
+
+class Dispatcher:
+    def __init__(self, config=None):
+        self.config = config or load_config()
+        self.limits = {
+            channel: asyncio.Semaphore(self.config['CONCURRENCY'].get(channel, 1)) for channel in CHANNELS
+        }
+
+    async def deliver(self, channel, batch):
+        async with self.limits[channel]:
+            try:
+                return await asyncio.to_thread(PROVIDERS[channel], batch, self.config)
+            except Exception as e:  # a provider bug must not kill the worker
+                logger.exception('%s delivery failed', channel)
+                return {item['id']: ('retry', repr(e)) for item in batch}
+
+    async def dispatch_once(self):
+        """Claim one round of due notifications and deliver them; returns how many were claimed."""
+        token, claimed = await sync_to_async(claim)(self.config['CLAIM_SIZE'], self.config['LEASE_SECONDS'])
+        by_channel = {}
+        for item in claimed:
+            by_channel.setdefault(item['channel'], []).append(item)
+
+        tasks = []
+        for channel, items in by_channel.items():
+            size = self.config['BATCH_SIZE'].get(channel, 100)
+            tasks += [self.deliver(channel, items[start:start + size]) for start in range(0, len(items), size)]
+
+        results = {}
+        for outcome in await asyncio.gather(*tasks):
+            results.update(outcome)
+        if results:
+            await sync_to_async(record)(results, self.config, token)
+        return len(claimed)
+
+    async def run(self, once=False):
+        """Dispatch until stopped; with once=True, stop when nothing is due."""
+        total = 0
+        while True:
+            claimed = await self.dispatch_once()
+            total += claimed
+            if not claimed:
+                if once:
+                    return total
+                await asyncio.sleep(self.config['POLL_SECONDS'])
+
+
+def load_config():
+    config = {**DEFAULTS, **getattr(settings, 'NOTIFICATIONS', {})}
+    for name in ('BATCH_SIZE', 'CONCURRENCY'):
+        config[name] = {**DEFAULTS[name], **config[name]}
+    return config
@@ -0,0 +1,215 @@
+# DX_APP/page_cache.py
+"""
+Whole-page cache for the fixed marketing and resource pages (about,
+pricing, documentation, ...), which vary only by ``?lang=``.
+
+Views decorated with ``@cached_page`` are rendered once per (path, lang,
+auth state, release) and stored in ``CACHES[PAGE_CACHE['ALIAS']]`` as the
+finished bytes, with an ETag (hash of the body) and the time it was
+rendered. A hit skips the view and template rendering entirely. A
+conditional request (If-None-Match / If-Modified-Since) that still matches
+gets a bodyless 304.
+
+The release is a hash of the contents of the app's templates, of views.py
+(the pricing and case-study pages render dict literals defined there) and
+of the collectstatic manifest. It is taken once per process, and re-checked
+on every request when DEBUG. A deploy that changes any of them therefore
+starts on fresh keys, even in a cache shared between workers or hosts.
+``manage.py warm_page_cache``, run on deploy, renders every (page, lang)
+pair for anonymous visitors up front with ``warm_up()``. Workers do not
+warm up at start-up; each page is otherwise rendered by its first request.
+Responses that are not plain 200 pages, such as streaming ones, are never
+stored.
+"""
+import functools
+import hashlib
+import logging
+import os
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.http import HttpRequest, HttpResponse, QueryDict
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .metrics import count_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'ALIAS': 'default',
+    'TIMEOUT': 86400,  # seconds a rendered page stays in the cache
+    'MAX_AGE': 300,  # Cache-Control max-age sent to browsers
+    'LANGUAGES': ['en', 'hi', 'mr'],
+}
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), 'templates')
+# Modules whose data, not just their templates, is rendered into the cached pages
+SOURCES = [os.path.join(os.path.dirname(__file__), 'views.py')]
+
+PAGES = {}  # URL name -> decorated view, for warm_up()
+
+
+def load_config():
+    return {**DEFAULTS, **getattr(settings, 'PAGE_CACHE', {})}
+
+
+def _release_files():
+    paths = []
+    for root, dirs, files in os.walk(TEMPLATE_DIR):
+        dirs.sort()
+        paths.extend(os.path.join(root, name) for name in sorted(files))
+    paths.extend(SOURCES)
+    if settings.STATIC_ROOT:
+        # Pages embed the hashed asset names, so a new collectstatic build is a new release too
+        paths.append(os.path.join(settings.STATIC_ROOT, 'staticfiles.json'))
+    return paths
+
+
+def _content_release(paths):
+    # Contents, not mtimes: hosts sharing a cache must agree on the release of identical files
+    digest = hashlib.blake2b(digest_size=8)
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+        except FileNotFoundError:
+            continue
+        digest.update(f'{os.path.relpath(path, settings.BASE_DIR)}:{len(content)};'.encode())
+        digest.update(content)
+    return digest.hexdigest()
+
+
+_debug_release = {'signature': None, 'release': None}
+
+
+def _stat_signature(paths):
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        signature.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+@functools.lru_cache(maxsize=1)
+def _cached_release():
+    return _content_release(_release_files())
+
+
+def release():
+    if not settings.DEBUG:
+        return _cached_release()
+    # While developing, re-read the files only when one of them has changed
+    paths = _release_files()
+    signature = _stat_signature(paths)
+    if signature != _debug_release['signature']:
+        _debug_release.update(signature=signature, release=_content_release(paths))
+    return _debug_release['release']
+
+
+def page_key(path, lang, authenticated):
+    return f"page:{release()}:{path}:{lang}:{'auth' if authenticated else 'anon'}"
+
+
+def _response(entry):
+    response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['last_modified'])
+    return response
+
+
+def _entry(response):
+    content = response.content
+    return {
+        'content': content,
+        'content_type': response['Content-Type'],
+        'etag': f'"{hashlib.blake2b(content, digest_size=16).hexdigest()}"',
+        'last_modified': int(time.time()),
+    }
+
+
+def cached_page(view):
+    """Serve the view's page from the page cache, keyed on path + ?lang= + auth state."""
+    PAGES[view.__name__] = view
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        config = load_config()
+        lang = request.GET.get('lang', 'en')
+        if not config['ENABLED'] or request.method not in ('GET', 'HEAD') or lang not in config['LANGUAGES']:
+            return view(request, *args, **kwargs)
+
+        authenticated = request.user.is_authenticated
+        cache = caches[config['ALIAS']]
+        key = page_key(request.path, lang, authenticated)
+        entry = cache.get(key)
+        if entry is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200 or response.streaming or response.has_header('Set-Cookie'):
+                return response
+            entry = _entry(response)
+            cache.set(key, entry, config['TIMEOUT'])
+            status = 'miss'
+            count_cache('page', hits=0, misses=1)
+        else:
+            status = 'hit'
+            count_cache('page', hits=1)
+
+        response = _response(entry)
+        response['X-Page-Cache'] = status
+        # Pages for signed-in users may one day carry their name; keep them out of shared caches
+        patch_cache_control(response, max_age=config['MAX_AGE'], **{'private' if authenticated else 'public': True})
+        patch_vary_headers(response, ['Cookie'])
+        return get_conditional_response(
+            request, etag=entry['etag'], last_modified=entry['last_modified'], response=response,
+        )
+
+    return wrapper
+
+
+def render_anonymous(view, path, lang):
+    """The view's response to an anonymous GET of path?lang=lang, rendered outside a request cycle."""
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = path
+    request.GET = QueryDict(f'lang={lang}')
+    request.META.update({'SERVER_NAME': 'localhost', 'SERVER_PORT': '80'})
+    request.user = AnonymousUser()
+    return view(request)
+
+
+def public_pages():
+    """{path: view} of every @cached_page view."""
+    import_module(settings.ROOT_URLCONF)  # imports the views, which registers them in PAGES
+    return {reverse(name): view for name, view in PAGES.items()}
+
+
+def warm_up():
+    """Render every (page, lang) pair for anonymous visitors into the cache; returns how many were rendered."""
+    config = load_config()
+    if not config['ENABLED']:
+        return 0
+    cache = caches[config['ALIAS']]
+    rendered = 0
+    for path, view in public_pages().items():
+        for lang in config['LANGUAGES']:
+            key = page_key(path, lang, False)
+            if cache.get(key) is not None:
+                continue
+            try:
+                response = render_anonymous(view, path, lang)
+            except Exception:
+                logger.exception('Could not pre-render %s?lang=%s', path, lang)
+                continue
+            if response.status_code == 200 and not response.streaming:
+                cache.set(key, _entry(response), config['TIMEOUT'])
+                rendered += 1
+    return rendered
@@ -0,0 +1,221 @@
+# DX_APP/prediction_cache.py
+"""
+Cache of crop recommendations keyed on rounded soil/weather inputs.
+
+Inputs are rounded per column (``ROUNDING`` decimals, negative values round
+to tens/hundreds) and the model is run on the rounded values, so every row
+that maps to the same key gets exactly the same answer. Keys include the
+model version from the registry, so a hot-swapped model never serves stale
+entries. Rows with a value too large to count in integer steps have no key;
+they skip the cache and the model sees them as sent. One call stores at
+most ``MAX_INSERT`` new entries, so a single large batch cannot flush the
+entries that other requests keep hitting.
+
+Two backends are available, picked by ``settings.CROP_PREDICTION_CACHE``:
+
+* ``'local'``  - in-process LRU with a TTL (per worker)
+* ``'django'`` - any Django cache alias, shared by all workers
+"""
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+
+from .metrics import count_cache
+from .recommendation import FEATURE_FIELDS, recommend
+
+DEFAULTS = {
+    'ENABLED': True,
+    'BACKEND': 'local',
+    'ALIAS': 'default',
+    'TTL': 3600,
+    'MAX_ENTRIES': 50000,  # more than recommendation.MAX_BATCH_ROWS
+    'MAX_INSERT': 2500,  # new entries stored per call
+    'ROUNDING': {'N': 0, 'P': 0, 'K': 0, 'temperature': 1, 'humidity': 1, 'ph': 2, 'rainfall': 1},
+}
+
+KEY_PREFIX = 'crop-pred'
+MAX_STEPS = 2 ** 53  # integer steps above this are not exact in float64 (and near int64's range)
+
+
+class LocalBackend:
+    """Thread-safe in-process LRU cache with per-entry expiry."""
+
+    name = 'local'
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._version = None
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def get_many(self, keys, version):
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            if version != self._version:
+                # New model: nothing cached for the old one can be hit again
+                self._entries.clear()
+                self._version = version
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry[0] < now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = entry[1]
+            self._hits += len(found)
+            self._misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, values, version):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            if version != self._version:
+                return
+            for key, value in values.items():
+                self._entries[key] = (expires_at, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self._hits, 'misses': self._misses, 'entries': len(self._entries)}
+
+
+class DjangoBackend:
+    """Stores entries in a Django cache alias so all workers share hits.
+
+    Eviction is whatever the cache backend does (LocMemCache, memcached and
+    Redis all evict least-recently-used keys). Hit/miss counters are kept in
+    the same cache with ``incr`` so they add up across workers.
+    """
+
+    name = 'django'
+
+    def __init__(self, alias, ttl):
+        self.cache = caches[alias]
+        self.ttl = ttl
+
+    def _count(self, name, delta):
+        if not delta:
+            return
+        key = f'{KEY_PREFIX}:{name}'
+        self.cache.add(key, 0, timeout=None)
+        try:
+            self.cache.incr(key, delta)
+        except ValueError:  # evicted between add() and incr()
+            self.cache.set(key, delta, timeout=None)
+
+    def get_many(self, keys, version):
+        found = self.cache.get_many(keys, version=version)
+        self._count('hits', len(found))
+        self._count('misses', len(keys) - len(found))
+        return found
+
+    def set_many(self, values, version):
+        self.cache.set_many(values, timeout=self.ttl, version=version)
+
+    def stats(self):
+        counts = self.cache.get_many([f'{KEY_PREFIX}:hits', f'{KEY_PREFIX}:misses'])
+        return {
+            'hits': counts.get(f'{KEY_PREFIX}:hits', 0),
+            'misses': counts.get(f'{KEY_PREFIX}:misses', 0),
+            'entries': None,
+        }
+
+
+class PredictionCache:
+    def __init__(self, backend, rounding, max_insert=DEFAULTS['MAX_INSERT']):
+        self.backend = backend
+        self.max_insert = max_insert
+        decimals = np.array([rounding.get(name, 2) for name in FEATURE_FIELDS])
+        self.scale = 10.0 ** decimals
+
+    def quantize(self, matrix):
+        """Return the rounded inputs as integer steps (used for keys) and as floats, and which rows have a key.
+
+        A row with a value of MAX_STEPS steps or more (or not finite) gets
+        no key; its steps and rounded values are zeros.
+        """
+        scaled = np.round(np.asarray(matrix, dtype=np.float64) * self.scale)
+        cacheable = (np.abs(scaled) < MAX_STEPS).all(axis=1)
+        steps = np.where(cacheable[:, None], scaled, 0).astype(np.int64)
+        return steps, steps / self.scale, cacheable
+
+    def recommend(self, loaded, matrix):
+        """Cached version of ``recommendation.recommend``.
+
+        Looks all rows up with one ``get_many``, runs the model once on the
+        distinct keys that missed and stores up to max_insert of them with
+        one ``set_many``. Rows without a key are scored as they are.
+        """
+        matrix = np.asarray(matrix, dtype=np.float64)
+        steps, rounded, cacheable = self.quantize(matrix)
+        keys = [
+            f'{KEY_PREFIX}:' + ','.join(map(str, row)) if keep else None
+            for row, keep in zip(steps.tolist(), cacheable.tolist())
+        ]
+        version = loaded.version
+        unique = list(dict.fromkeys(key for key in keys if key is not None))
+        found = self.backend.get_many(unique, version) if unique else {}
+        count_cache('crop_prediction', len(found), len(unique) - len(found))
+
+        # First row of each key that missed: rows sharing a key are scored once
+        missing = {}
+        for index, key in enumerate(keys):
+            if key is not None and key not in found:
+                missing.setdefault(key, index)
+        if missing:
+            crops, confidences = recommend(loaded, rounded[list(missing.values())])
+            new = dict(zip(missing, zip(crops.tolist(), confidences.tolist())))
+            self.backend.set_many(dict(islice(new.items(), self.max_insert)), version)
+            found.update(new)
+
+        results = [found.get(key) for key in keys]
+        uncached = np.flatnonzero(~cacheable)
+        if len(uncached):
+            crops, confidences = recommend(loaded, matrix[uncached])
+            for index, result in zip(uncached.tolist(), zip(crops.tolist(), confidences.tolist())):
+                results[index] = result
+
+        crops, confidences = zip(*results)
+        return np.array(crops), np.array(confidences)
+
+    def stats(self):
+        stats = self.backend.stats()
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['backend'] = self.backend.name
+        return stats
+
+
+def _build_cache():
+    config = {**DEFAULTS, **getattr(settings, 'CROP_PREDICTION_CACHE', {})}
+    if not config['ENABLED']:
+        return None
+    if config['BACKEND'] == 'django':
+        backend = DjangoBackend(config['ALIAS'], config['TTL'])
+    else:
+        backend = LocalBackend(config['TTL'], config['MAX_ENTRIES'])
+    return PredictionCache(backend, {**DEFAULTS['ROUNDING'], **config['ROUNDING']}, config['MAX_INSERT'])
+
+
+prediction_cache = _build_cache()
+
+
+def cached_recommend(loaded, matrix):
+    """``recommend`` through the configured cache, or directly if it is disabled."""
+    if prediction_cache is None:
+        return recommend(loaded, matrix)
+    return prediction_cache.recommend(loaded, matrix)
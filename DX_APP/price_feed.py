@@ -0,0 +1,189 @@
+# DX_APP/price_feed.py
+"""
+Bulk ingestion of daily APMC price feeds into CropPrice.
+
+Feeds are CSV, JSON Lines or a JSON array of objects with the columns in
+``FEED_FIELDS``. Rows are read as a stream, validated, and written in
+batches: each batch is one transaction with one query for the previous
+snapshot of its listings, one ``INSERT ... ON CONFLICT DO UPDATE`` on
+(name, grade, market_name, state), one insert into the price history, an
+incremental update of the gainers/losers leaderboards and an evaluation of
+the price alerts.
+"""
+import csv
+import json
+import os
+import time
+from decimal import Decimal, InvalidOperation
+
+import numpy as np
+from django.db import transaction
+
+from .alerts import AlertIndex
+from .leaderboard import update_boards
+from .models import CropPrice
+from .price_history import record_ticks
+
+LISTING_KEY = ('name', 'grade', 'market_name', 'state')
+FEED_FIELDS = ('name', 'crop_type', 'grade', 'min_price', 'max_price', 'avg_price', 'unit', 'state', 'market_name')
+UPDATE_FIELDS = ('crop_type', 'min_price', 'max_price', 'avg_price', 'unit', 'trend_percentage', 'is_active', 'updated_at')
+BATCH_SIZE = 2000
+MAX_ERRORS = 20
+
+# trend_percentage is DecimalField(max_digits=5, decimal_places=2)
+TREND_LIMIT = 999.99
+
+
+def _choice_lookup(choices):
+    """Accept either the stored code or the display label, case-insensitively."""
+    lookup = {}
+    for code, label in choices:
+        lookup[code.lower()] = code
+        lookup[label.lower()] = code
+    return lookup
+
+
+CROP_TYPES = _choice_lookup(CropPrice.CROP_TYPES)
+STATES = _choice_lookup(CropPrice.STATES)
+MARKETS = _choice_lookup(CropPrice.MARKETS)
+
+
+def iter_feed(path, fmt=None):
+    """Yield one dict per feed row; CSV and JSON Lines are streamed."""
+    fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            yield from csv.DictReader(f)
+        elif fmt in ('jsonl', 'ndjson'):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        elif fmt == 'json':
+            data = json.load(f)
+            yield from data['prices'] if isinstance(data, dict) else data
+        else:
+            raise ValueError(f'Unsupported feed format: {fmt!r}')
+
+
+def _decimal(raw, field):
+    try:
+        value = Decimal(str(raw).strip())
+    except (InvalidOperation, TypeError):
+        raise ValueError(f'{field}: not a number ({raw!r})')
+    if not value.is_finite() or value < 0:
+        raise ValueError(f'{field}: must be a non-negative number ({raw!r})')
+    return value.quantize(Decimal('0.01'))
+
+
+def _choice(raw, lookup, field):
+    code = lookup.get(str(raw or '').strip().lower())
+    if code is None:
+        raise ValueError(f'{field}: unknown value {raw!r}')
+    return code
+
+
+def parse_row(raw):
+    """Validate one feed row and return an unsaved CropPrice; raises ValueError."""
+    name = str(raw.get('name') or '').strip()
+    if not name:
+        raise ValueError('name: required')
+    min_price = _decimal(raw.get('min_price'), 'min_price')
+    max_price = _decimal(raw.get('max_price'), 'max_price')
+    avg_price = _decimal(raw.get('avg_price'), 'avg_price')
+    if not min_price <= avg_price <= max_price:
+        raise ValueError('prices: expected min_price <= avg_price <= max_price')
+    return CropPrice(
+        name=name,
+        crop_type=_choice(raw.get('crop_type'), CROP_TYPES, 'crop_type'),
+        grade=str(raw.get('grade') or '').strip() or 'Grade A',
+        min_price=min_price,
+        max_price=max_price,
+        avg_price=avg_price,
+        unit=str(raw.get('unit') or '').strip() or 'quintal',
+        trend_percentage=Decimal('0.00'),
+        state=_choice(raw.get('state'), STATES, 'state'),
+        market_name=_choice(raw.get('market_name'), MARKETS, 'market_name'),
+        is_active=True,
+    )
+
+
+def _listing(price):
+    return (price.name, price.grade, price.market_name, price.state)
+
+
+def previous_prices(batch):
+    """avg_price of the stored snapshot for every listing in the batch, in one query."""
+    keys = {_listing(price) for price in batch}
+    rows = CropPrice.objects.filter(
+        name__in={key[0] for key in keys},
+        grade__in={key[1] for key in keys},
+        market_name__in={key[2] for key in keys},
+        state__in={key[3] for key in keys},
+    ).values_list(*LISTING_KEY, 'avg_price')
+    return {row[:4]: row[4] for row in rows.iterator() if row[:4] in keys}
+
+
+def apply_trends(batch, previous):
+    """Set trend_percentage on the whole batch from the previous avg_price, vectorised."""
+    new = np.array([float(price.avg_price) for price in batch])
+    old = np.array([float(previous.get(_listing(price), 0)) for price in batch])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        trend = np.where(old > 0, (new - old) / old * 100, 0.0)
+    trend = np.clip(np.round(trend, 2), -TREND_LIMIT, TREND_LIMIT)
+    for price, value in zip(batch, trend.tolist()):
+        price.trend_percentage = Decimal(f'{value:.2f}')
+
+
+def write_batch(batch, alert_index=None):
+    """Upsert one batch in a transaction; returns (created, updated, alerts triggered)."""
+    # Last row wins when a feed lists the same market/grade twice
+    batch = list({_listing(price): price for price in batch}.values())
+    with transaction.atomic():
+        previous = previous_prices(batch)
+        apply_trends(batch, previous)
+        CropPrice.objects.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=LISTING_KEY,
+            update_fields=UPDATE_FIELDS,
+        )
+        record_ticks(batch)
+        update_boards(batch)
+        fired = alert_index.evaluate(batch) if alert_index is not None else ()
+    return len(batch) - len(previous), len(previous), len(fired)
+
+
+def _add(stats, counts):
+    for name, count in zip(('created', 'updated', 'alerts'), counts):
+        stats[name] += count
+
+
+def ingest(rows, batch_size=BATCH_SIZE, evaluate_alerts=True):
+    """Validate and upsert an iterable of raw feed rows.
+
+    Returns a dict with rows/created/updated/rejected counts, the number of
+    price alerts triggered, elapsed seconds, rows_per_sec and the first
+    MAX_ERRORS rejection messages.
+    """
+    stats = {'rows': 0, 'created': 0, 'updated': 0, 'rejected': 0, 'alerts': 0, 'errors': []}
+    started = time.perf_counter()
+    alert_index = AlertIndex.load() if evaluate_alerts else None
+    batch = []
+    for line, raw in enumerate(rows, start=1):
+        stats['rows'] += 1
+        try:
+            batch.append(parse_row(raw))
+        except (ValueError, AttributeError) as e:
+            stats['rejected'] += 1
+            if len(stats['errors']) < MAX_ERRORS:
+                stats['errors'].append(f'row {line}: {e}')
+            continue
+        if len(batch) >= batch_size:
+            _add(stats, write_batch(batch, alert_index))
+            batch = []
+    if batch:
+        _add(stats, write_batch(batch, alert_index))
+
+    stats['seconds'] = time.perf_counter() - started
+    stats['rows_per_sec'] = stats['rows'] / stats['seconds'] if stats['seconds'] else 0.0
+    return stats
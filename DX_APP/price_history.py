@@ -0,0 +1,150 @@
+# DX_APP/price_history.py
+"""
+Price history: append-only ticks and their hourly/daily/weekly rollups.
+
+Every price written to CropPrice is also appended to PriceTick.
+``rollup()`` (run on a schedule by ``manage.py rollup_prices``) folds the
+ticks added since its last run into PriceRollup rows per crop name, market
+and bucket. Charts and trends read those rows, so a year of daily points
+for one crop is a ~365-row range scan on the rollup's unique index however
+many raw ticks exist.
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import PriceRollup, PriceRollupCheckpoint, PriceTick
+
+PERIODS = [code for code, label in PriceRollup.PERIODS]
+ROLLUP_BATCH = 50000
+DEFAULT_WINDOW = {'hour': timedelta(days=7), 'day': timedelta(days=365), 'week': timedelta(weeks=156)}
+
+ROLLUP_KEY = ('period', 'name', 'market_name', 'bucket')
+ROLLUP_FIELDS = ('open', 'high', 'low', 'close', 'price_sum', 'tick_count', 'first_at', 'last_at')
+
+
+def record_ticks(prices, recorded_at=None):
+    """Append the current price of each CropPrice in ``prices`` to the history."""
+    recorded_at = recorded_at or timezone.now()
+    PriceTick.objects.bulk_create([
+        PriceTick(
+            name=price.name, grade=price.grade, state=price.state, market_name=price.market_name,
+            min_price=price.min_price, max_price=price.max_price, avg_price=price.avg_price,
+            recorded_at=recorded_at,
+        )
+        for price in prices
+    ])
+
+
+def bucket_start(moment, period):
+    """Start of the hour, day or (Monday-based) week containing ``moment``, in UTC."""
+    moment = moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    if period == 'hour':
+        return moment
+    moment = moment.replace(hour=0)
+    if period == 'day':
+        return moment
+    return moment - timedelta(days=moment.weekday())
+
+
+def _combine(a, b):
+    """Merge two partial aggregates (open, high, low, close, sum, count, first_at, last_at)."""
+    first = a if a[6] <= b[6] else b
+    last = a if a[7] >= b[7] else b
+    return (first[0], max(a[1], b[1]), min(a[2], b[2]), last[3],
+            a[4] + b[4], a[5] + b[5], first[6], last[7])
+
+
+def aggregate(ticks):
+    """Partial aggregates of (name, market_name, avg_price, recorded_at) ticks for every period."""
+    partials = {}
+    for name, market_name, price, recorded_at in ticks:
+        tick = (price, price, price, price, price, 1, recorded_at, recorded_at)
+        for period in PERIODS:
+            key = (period, name, market_name, bucket_start(recorded_at, period))
+            partials[key] = _combine(partials[key], tick) if key in partials else tick
+    return partials
+
+
+def merge(partials):
+    """Fold partial aggregates into the stored rollups: one read per period, one upsert."""
+    stored = {}
+    for period in PERIODS:
+        keys = [key for key in partials if key[0] == period]
+        rows = PriceRollup.objects.filter(
+            period=period,
+            name__in={key[1] for key in keys},
+            market_name__in={key[2] for key in keys},
+            bucket__in={key[3] for key in keys},
+        ).values_list(*ROLLUP_KEY, *ROLLUP_FIELDS)
+        stored.update((row[:4], row[4:]) for row in rows.iterator())
+
+    rollups = []
+    for key, partial in partials.items():
+        if key in stored:
+            partial = _combine(stored[key], partial)
+        rollups.append(PriceRollup(**dict(zip(ROLLUP_KEY, key)), **dict(zip(ROLLUP_FIELDS, partial))))
+    PriceRollup.objects.bulk_create(
+        rollups, update_conflicts=True, unique_fields=ROLLUP_KEY, update_fields=ROLLUP_FIELDS,
+    )
+    return len(rollups)
+
+
+def rollup(batch_size=ROLLUP_BATCH):
+    """Fold every tick added since the last run into the rollups; returns the number of ticks.
+
+    Ticks are read in id order, batch_size at a time. Each batch and the
+    checkpoint that records it are committed together, so an interrupted run
+    picks up at the first batch it did not finish.
+    """
+    PriceRollupCheckpoint.objects.get_or_create(pk=1)
+    folded = 0
+    while True:
+        with transaction.atomic():
+            checkpoint = PriceRollupCheckpoint.objects.select_for_update().get(pk=1)
+            ticks = list(
+                PriceTick.objects.filter(id__gt=checkpoint.last_tick_id).order_by('id')
+                .values_list('id', 'name', 'market_name', 'avg_price', 'recorded_at')[:batch_size]
+            )
+            if not ticks:
+                return folded
+            merge(aggregate(tick[1:] for tick in ticks))
+            checkpoint.last_tick_id = ticks[-1][0]
+            checkpoint.save()
+        folded += len(ticks)
+
+
+def rebuild():
+    """Drop every rollup and reset the checkpoint; the next rollup() starts from the first tick."""
+    with transaction.atomic():
+        PriceRollup.objects.all().delete()
+        PriceRollupCheckpoint.objects.update_or_create(pk=1, defaults={'last_tick_id': 0})
+
+
+def series(name, market_name, period='day', since=None, until=None):
+    """OHLC/average points for one crop in one market, oldest first."""
+    until = until or timezone.now()
+    since = since or until - DEFAULT_WINDOW[period]
+    rows = PriceRollup.objects.filter(
+        period=period, name=name, market_name=market_name,
+        bucket__gte=bucket_start(since, period), bucket__lte=until,
+    ).order_by('bucket').values_list('bucket', 'open', 'high', 'low', 'close', 'price_sum', 'tick_count')
+    return [{
+        'bucket': bucket.isoformat(),
+        'open': float(open_),
+        'high': float(high),
+        'low': float(low),
+        'close': float(close),
+        'avg': round(float(price_sum / tick_count), 2),
+    } for bucket, open_, high, low, close, price_sum, tick_count in rows]
+
+
+def trend(name, market_name, period='day'):
+    """Percentage change between the last two closes, or None with fewer than two buckets."""
+    closes = list(PriceRollup.objects.filter(
+        period=period, name=name, market_name=market_name,
+    ).order_by('-bucket').values_list('close', flat=True)[:2])
+    if len(closes) < 2 or not closes[1]:
+        return None
+    return round(float((closes[0] - closes[1]) / closes[1] * 100), 2)
@@ -0,0 +1,143 @@
+# DX_APP/recommendation.py
+"""
+Batch crop recommendation helpers.
+
+Rows are validated with the same rules as ``CropForm`` and scored with a
+single ``predict_proba`` call over the whole NumPy matrix, instead of one
+form/view/template round trip per row.
+"""
+import csv
+import io
+import itertools
+import json
+
+import numpy as np
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
+
+from .features import FEATURE_COLUMNS, build_features
+from .forest import FLAT_MAX_ROWS
+from .forms import CropForm
+from .metrics import timer
+
+# Column order expected by the model: N, P, K, temperature, humidity, ph, rainfall
+FEATURE_FIELDS = list(CropForm.base_fields)
+
+MAX_BATCH_ROWS = 10000
+JOB_MAX_BATCH_ROWS = 500000  # through the jobs API (run_jobs worker)
+JOB_MAX_BATCH_BYTES = 64 * 1024 * 1024  # body size accepted by the jobs API; read as a stream, not request.body
+
+# Cell types a row may hold (CSV gives str). Exact types: JSON true/false are bools, which NumPy and the form would take as 1/0
+CELL_TYPES = {int, float, str}
+
+
+def rows_from_json(payload):
+    """Turn a decoded JSON body into raw rows.
+
+    Accepts a list of rows or ``{"rows": [...]}``. Each row is either an
+    object keyed by the ``CropForm`` field names or a list of 7 values in
+    ``FEATURE_FIELDS`` order. Returns ``(rows, errors)`` where ``errors``
+    maps row index to form-style error dicts for malformed rows.
+    """
+    if isinstance(payload, dict):
+        payload = payload.get('rows')
+    if not isinstance(payload, list):
+        raise ValidationError('Expected a list of rows or an object with a "rows" list.')
+
+    rows = []
+    errors = {}
+    for index, row in enumerate(payload):
+        if isinstance(row, dict):
+            rows.append([row.get(name) for name in FEATURE_FIELDS])
+        elif isinstance(row, list) and len(row) == len(FEATURE_FIELDS):
+            rows.append(row)
+        else:
+            rows.append([None] * len(FEATURE_FIELDS))
+            errors[index] = {NON_FIELD_ERRORS: [
+                f'Row must be an object or a list of {len(FEATURE_FIELDS)} values.'
+            ]}
+    return rows, errors
+
+
+def rows_from_csv(text):
+    """Turn CSV text with a header row into raw rows (see ``rows_from_json``)."""
+    reader = csv.DictReader(io.StringIO(text))
+    missing = [name for name in FEATURE_FIELDS if name not in (reader.fieldnames or [])]
+    if missing:
+        raise ValidationError(f'CSV header is missing columns: {", ".join(missing)}')
+    return [[record[name] for name in FEATURE_FIELDS] for record in reader], {}
+
+
+def rows_from_body(body, is_csv):
+    """Raw rows and errors of a JSON or CSV batch body given as bytes.
+
+    Raises ``ValueError`` for an unparseable body and ``ValidationError``
+    for one of the wrong shape.
+    """
+    if is_csv:
+        return rows_from_csv(body.decode('utf-8-sig'))
+    return rows_from_json(json.loads(body))
+
+
+def validate_rows(rows, errors=None):
+    """Validate raw rows and return ``(matrix, errors)``.
+
+    The happy path is one type scan, a single NumPy conversion and one
+    ``isfinite`` check. Only rows that fail them are re-checked cell by
+    cell with the ``CropForm`` fields, so error messages match what the
+    form would report; cells that are not numbers or strings (such as
+    JSON booleans) are rejected as the form rejects text.
+    """
+    errors = dict(errors or {})
+    n_rows = len(rows)
+    if set(map(type, itertools.chain.from_iterable(rows))) <= CELL_TYPES:
+        odd_rows = set()
+    else:
+        odd_rows = {index for index, row in enumerate(rows) if not set(map(type, row)) <= CELL_TYPES}
+    try:
+        matrix = np.asarray(rows, dtype=np.float64).reshape(n_rows, len(FEATURE_FIELDS))
+        bad_rows = sorted(odd_rows.union(np.flatnonzero(~np.isfinite(matrix).all(axis=1)).tolist()))
+    except (TypeError, ValueError):
+        matrix = np.zeros((n_rows, len(FEATURE_FIELDS)))
+        bad_rows = range(n_rows)
+
+    for index in bad_rows:
+        if index in errors:
+            continue
+        row_errors = {}
+        for column, name in enumerate(FEATURE_FIELDS):
+            field, value = CropForm.base_fields[name], rows[index][column]
+            try:
+                if value is not None and type(value) not in CELL_TYPES:
+                    raise ValidationError(field.error_messages['invalid'], code='invalid')
+                matrix[index, column] = field.clean(value)
+            except ValidationError as e:
+                row_errors[name] = e.messages
+        if row_errors:
+            errors[index] = row_errors
+    return matrix, errors
+
+
+def recommend(loaded, matrix):
+    """Score every row of an (n, 7) input matrix with one ``predict_proba`` call.
+
+    ``loaded`` is a ``model_registry.LoadedModel``. Small batches (such as
+    the single row from the ``home`` form) go through its flattened forest,
+    larger ones through sklearn. Models trained by ml/train_model.py expect
+    the 15 engineered columns, so the raw inputs go through
+    ``build_features`` first, and their integer classes are decoded with the
+    label encoder. Returns ``(crops, confidences)`` as NumPy arrays. For a
+    RandomForest the argmax of ``predict_proba`` is exactly what ``predict``
+    returns.
+    """
+    model = loaded.model
+    if loaded.flat_model is not None and len(matrix) <= FLAT_MAX_ROWS:
+        model = loaded.flat_model
+    if getattr(model, 'n_features_in_', None) == len(FEATURE_COLUMNS):
+        matrix = build_features(matrix)
+    with timer('inference'):
+        proba = model.predict_proba(matrix)
+    best = proba.argmax(axis=1)
+    crops = model.classes_[best]
+    if loaded.label_encoder is not None:
+        crops = loaded.label_encoder.inverse_transform(crops)
+    return crops, proba[np.arange(len(best)), best]
@@ -0,0 +1,219 @@
+// Initialize AOS
+AOS.init({
+    duration: 800,
+    once: true,
+    offset: 100
+});
+
+// Generate floating particles
+function createParticles() {
+    const particlesContainer = document.getElementById('particles');
+    const particleCount = 20;
+
+    for (let i = 0; i < particleCount; i++) {
+        const particle = document.createElement('div');
+        particle.classList.add('particle');
+
+        // Random size
+        const size = Math.random() * 100 + 20;
+        particle.style.width = `${size}px`;
+        particle.style.height = `${size}px`;
+
+        // Random position
+        particle.style.left = `${Math.random() * 100}%`;
+        particle.style.top = `${Math.random() * 100}%`;
+
+        // Random animation
+        const duration = Math.random() * 30 + 20;
+        const delay = Math.random() * 5;
+        particle.style.animation = `float ${duration}s linear infinite ${delay}s`;
+
+        // Random gradient
+        const colors = [
+            'rgba(46, 204, 113, 0.1)',
+            'rgba(52, 152, 219, 0.1)',
+            'rgba(155, 89, 182, 0.1)'
+        ];
+        particle.style.background = colors[Math.floor(Math.random() * colors.length)];
+
+        particlesContainer.appendChild(particle);
+    }
+}
+
+// Progress bar on scroll
+function updateProgressBar() {
+    const winScroll = document.body.scrollTop || document.documentElement.scrollTop;
+    const height = document.documentElement.scrollHeight - document.documentElement.clientHeight;
+    const scrolled = (winScroll / height) * 100;
+    document.getElementById('progress-bar').style.width = scrolled + '%';
+}
+
+// Back to top button
+function setupBackToTop() {
+    const backToTopButton = document.getElementById('back-to-top');
+
+    window.addEventListener('scroll', () => {
+        if (window.scrollY > 300) {
+            backToTopButton.classList.add('show');
+        } else {
+            backToTopButton.classList.remove('show');
+        }
+    });
+
+    backToTopButton.addEventListener('click', () => {
+        window.scrollTo({
+            top: 0,
+            behavior: 'smooth'
+        });
+    });
+}
+
+// Enhanced loading spinner
+function setupLoadingSpinner() {
+    const forms = document.querySelectorAll('form');
+    forms.forEach(function(form) {
+        form.addEventListener('submit', function() {
+            const spinner = document.getElementById('loading-spinner');
+            spinner.style.display = 'flex';
+
+            // Add processing text
+            const spinnerText = spinner.querySelector('.spinner-text');
+            let dots = 0;
+            const interval = setInterval(() => {
+                dots = (dots + 1) % 4;
+                spinnerText.textContent = 'Processing' + '.'.repeat(dots);
+            }, 500);
+
+            // Clear interval when page loads (in case of error)
+            window.addEventListener('load', () => {
+                clearInterval(interval);
+                spinner.style.display = 'none';
+            });
+        });
+    });
+
+    // Hide spinner on page load
+    window.addEventListener('load', function() {
+        setTimeout(() => {
+            document.getElementById('loading-spinner').style.display = 'none';
+        }, 500);
+    });
+}
+
+// Notification system
+function showNotification(message, type = 'info', duration = 5000) {
+    const container = document.getElementById('notification-container');
+    const notification = document.createElement('div');
+    notification.className = `notification ${type}`;
+
+    // Notification content
+    const icon = {
+        'success': 'bi-check-circle-fill',
+        'info': 'bi-info-circle-fill',
+        'warning': 'bi-exclamation-triangle-fill',
+        'error': 'bi-x-circle-fill'
+    }[type];
+
+    const color = {
+        'success': 'text-success',
+        'info': 'text-primary',
+        'warning': 'text-warning',
+        'error': 'text-danger'
+    }[type];
+
+    notification.innerHTML = `
+        <div class="d-flex align-items-start">
+            <i class="bi ${icon} ${color} fs-5 me-3"></i>
+            <div class="flex-grow-1">
+                <div class="fw-semibold mb-1">${type.charAt(0).toUpperCase() + type.slice(1)}</div>
+                <div class="text-muted small">${message}</div>
+            </div>
+            <button class="btn-close btn-sm" onclick="this.parentElement.parentElement.remove()"></button>
+        </div>
+    `;
+
+    container.appendChild(notification);
+
+    // Auto remove after duration
+    setTimeout(() => {
+        if (notification.parentNode) {
+            notification.style.animation = 'slideInRight 0.5s ease reverse forwards';
+            setTimeout(() => notification.remove(), 500);
+        }
+    }, duration);
+}
+
+// Keyboard shortcuts
+function setupKeyboardShortcuts() {
+    document.addEventListener('keydown', (e) => {
+        // Ctrl + / to focus search
+        if (e.ctrlKey && e.key === '/') {
+            e.preventDefault();
+            const searchInput = document.querySelector('input[type="search"], input[placeholder*="search" i]');
+            if (searchInput) {
+                searchInput.focus();
+            }
+        }
+
+        // Escape to close modals
+        if (e.key === 'Escape') {
+            const modals = document.querySelectorAll('.modal.show');
+            modals.forEach(modal => {
+                const modalInstance = bootstrap.Modal.getInstance(modal);
+                if (modalInstance) modalInstance.hide();
+            });
+        }
+    });
+}
+
+// Performance monitoring
+function monitorPerformance() {
+    if ('performance' in window) {
+        window.addEventListener('load', () => {
+            const timing = performance.getEntriesByType('navigation')[0];
+            if (timing) {
+                const loadTime = timing.loadEventEnd - timing.navigationStart;
+                if (loadTime > 3000) {
+                    console.warn(`Page loaded in ${loadTime}ms - consider optimizing`);
+                }
+            }
+        });
+    }
+}
+
+// Service worker registration (if available)
+function registerServiceWorker() {
+    if ('serviceWorker' in navigator) {
+        window.addEventListener('load', () => {
+            navigator.serviceWorker.register('/static/DX_APP/sw.js')
+                .then(registration => {
+                    console.log('ServiceWorker registered:', registration);
+                })
+                .catch(error => {
+                    console.log('ServiceWorker registration failed:', error);
+                });
+        });
+    }
+}
+
+// Initialize everything when DOM is loaded
+document.addEventListener('DOMContentLoaded', function() {
+    createParticles();
+    setupBackToTop();
+    setupLoadingSpinner();
+    setupKeyboardShortcuts();
+    monitorPerformance();
+    // registerServiceWorker(); // Uncomment if you have a service worker
+
+    // Set up scroll event for progress bar
+    window.addEventListener('scroll', updateProgressBar);
+
+    // Example: Show welcome notification
+    setTimeout(() => {
+        showNotification('Welcome to CropAI! Get personalized crop recommendations based on your field conditions.', 'success', 4000);
+    }, 1000);
+});
+
+// Export functions for use in child templates
+window.showNotification = showNotification;
+window.createParticles = createParticles;
@@ -0,0 +1,28 @@
+// Set current year in copyright
+document.getElementById('currentYear').textContent = new Date().getFullYear();
+
+// Newsletter form submission
+document.querySelector('.newsletter-form').addEventListener('submit', function(e) {
+    e.preventDefault();
+    const email = this.querySelector('.newsletter-input').value;
+
+    // Simple validation
+    if (email && email.includes('@')) {
+        // In a real application, you would send this to your server
+        alert(`Thank you for subscribing with ${email}! You'll receive updates from CropAI soon.`);
+        this.reset();
+    } else {
+        alert('Please enter a valid email address.');
+    }
+});
+
+// Smooth scroll for anchor links in footer
+document.querySelectorAll('.footer-links a').forEach(link => {
+    link.addEventListener('click', function(e) {
+        if (this.getAttribute('href') === '#') {
+            e.preventDefault();
+            // In a real site, this would navigate to the actual page
+            alert('This is a demo. In a real website, this would navigate to the ' + this.textContent + ' page.');
+        }
+    });
+});
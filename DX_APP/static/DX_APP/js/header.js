@@ -0,0 +1,44 @@
+// Navbar scroll effect
+window.addEventListener('scroll', function() {
+    const navbar = document.querySelector('.premium-navbar');
+    if (window.scrollY > 50) {
+        navbar.classList.add('scrolled');
+    } else {
+        navbar.classList.remove('scrolled');
+    }
+});
+
+// Active link highlighting
+document.addEventListener('DOMContentLoaded', function() {
+    const currentPath = window.location.pathname;
+    const navLinks = document.querySelectorAll('.nav-link');
+
+    navLinks.forEach(link => {
+        if (link.getAttribute('href') === currentPath) {
+            link.classList.add('active');
+        }
+    });
+
+    // Simulate login state (replace with actual authentication logic)
+    const isLoggedIn = false; // Change to true to see user dropdown
+    const loginBtn = document.getElementById('loginBtn');
+    const userDropdownContainer = document.getElementById('userDropdownContainer');
+
+    if (isLoggedIn) {
+        loginBtn.parentElement.style.display = 'none';
+        userDropdownContainer.classList.remove('d-none');
+    }
+
+    // Notification bell click
+    document.querySelector('.notification-bell').addEventListener('click', function() {
+        alert('You have 3 new notifications:\n1. New crop recommendation ready\n2. Weather alert for your region\n3. Market prices updated');
+    });
+
+    // Mobile navigation active state
+    const mobileNavItems = document.querySelectorAll('.mobile-nav-item');
+    mobileNavItems.forEach(item => {
+        if (item.getAttribute('href') === currentPath) {
+            item.classList.add('active');
+        }
+    });
+});
@@ -0,0 +1,286 @@
+# DX_APP/static_pages.py
+"""
+Prerendered copies of the public pages, served without Django.
+
+``manage.py export_static_pages`` renders every @cached_page route (see
+page_cache.py) in every language, as an anonymous visitor sees it. The
+pages go to ``STATIC_PAGES['ROOT']`` as ``<path>/<lang>.html``, with
+``.gz`` (and ``.br`` when the brotli package is installed) copies next to
+them. A ``manifest.json`` records the ETags and the template release they
+were rendered from.
+
+Two ways to serve them:
+
+* ``StaticPagesWSGI`` / ``StaticPagesASGI`` wrap the Django application
+  (see DX_PROJECT/wsgi.py and asgi.py). A GET or HEAD of an exported page,
+  without a session cookie, is answered from memory with the best
+  precompressed copy the client accepts. It never reaches the middleware
+  stack, URL resolver or templates. Everything else goes to Django.
+* A front proxy can serve the files itself, e.g. nginx::
+
+      map $arg_lang $page_lang { default en; hi hi; mr mr; }
+      location / {
+          if ($cookie_sessionid) { proxy_pass http://django; }
+          root /srv/dx/prerendered;
+          gzip_static on;  # brotli_static on; with ngx_brotli
+          try_files $uri$page_lang.html @django;
+      }
+
+An export whose release no longer matches the templates on disk (a deploy
+without a re-export) is ignored, so stale pages are never served.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.http.cookie import parse_cookie
+from django.utils.http import http_date
+
+from . import page_cache
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip copies are written without it
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'ROOT': os.path.join(settings.BASE_DIR, 'prerendered'),
+    'RELOAD_INTERVAL': 2,  # seconds between checks of the manifest for a new export
+}
+
+MANIFEST = 'manifest.json'
+SUFFIXES = {'br': '.br', 'gzip': '.gz', 'identity': ''}
+PREFERENCE = ('br', 'gzip', 'identity')
+
+
+def load_config():
+    return {**DEFAULTS, **getattr(settings, 'STATIC_PAGES', {})}
+
+
+def _file_name(path, lang):
+    return f"{path.strip('/') or 'index'}/{lang}.html"
+
+
+def _write(target, content):
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    temporary = f'{target}.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(content)
+    os.replace(temporary, target)
+
+
+def export(root=None, languages=None):
+    """Render every public page in every language into root; returns the manifest."""
+    config = load_config()
+    root = str(root or config['ROOT'])
+    languages = languages or page_cache.load_config()['LANGUAGES']
+    pages = {}
+    for path, view in page_cache.public_pages().items():
+        for lang in languages:
+            response = page_cache.render_anonymous(view, path, lang)
+            if response.status_code != 200 or response.streaming:
+                logger.warning('Not exporting %s?lang=%s (status %s)', path, lang, response.status_code)
+                continue
+            content = response.content
+            name = _file_name(path, lang)
+            _write(os.path.join(root, name), content)
+            # mtime=0 keeps the .gz byte-identical between exports of the same page
+            _write(os.path.join(root, name + SUFFIXES['gzip']), gzip.compress(content, 9, mtime=0))
+            encodings = ['gzip', 'identity']
+            if brotli is not None:
+                _write(os.path.join(root, name + SUFFIXES['br']), brotli.compress(content, quality=11))
+                encodings.insert(0, 'br')
+            pages.setdefault(path, {})[lang] = {
+                'file': name,
+                'etag': hashlib.blake2b(content, digest_size=16).hexdigest(),
+                'content_type': response['Content-Type'],
+                'encodings': encodings,
+            }
+    manifest = {'release': page_cache.release(), 'exported_at': int(time.time()), 'pages': pages}
+    # Written last, so a half-finished export is never picked up
+    _write(os.path.join(root, MANIFEST), json.dumps(manifest, indent=2).encode())
+    return manifest
+
+
+def _accepted(accept_encoding):
+    """Encodings the Accept-Encoding header allows."""
+    accepted = {'identity'}
+    for part in accept_encoding.split(','):
+        coding, *params = part.split(';')
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(coding.strip().lower())
+    if '*' in accepted:
+        accepted.update(SUFFIXES)
+    return accepted
+
+
+def _security_headers():
+    # What SecurityMiddleware and XFrameOptionsMiddleware would have added
+    headers = [('X-Frame-Options', getattr(settings, 'X_FRAME_OPTIONS', 'DENY'))]
+    if getattr(settings, 'SECURE_CONTENT_TYPE_NOSNIFF', True):
+        headers.append(('X-Content-Type-Options', 'nosniff'))
+    if referrer_policy := getattr(settings, 'SECURE_REFERRER_POLICY', 'same-origin'):
+        headers.append(('Referrer-Policy', referrer_policy))
+    if opener_policy := getattr(settings, 'SECURE_CROSS_ORIGIN_OPENER_POLICY', 'same-origin'):
+        headers.append(('Cross-Origin-Opener-Policy', opener_policy))
+    return headers
+
+
+class StaticPages:
+    """The exported pages held in memory, re-read when a new export's manifest appears."""
+
+    def __init__(self, config):
+        self.root = str(config['ROOT'])
+        self.check_interval = config['RELOAD_INTERVAL']
+        self.max_age = page_cache.load_config()['MAX_AGE']
+        self.session_cookie = settings.SESSION_COOKIE_NAME
+        self.security_headers = _security_headers()
+        self._pages = {}
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _manifest_version(self):
+        try:
+            stat = os.stat(os.path.join(self.root, MANIFEST))
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load(self):
+        with open(os.path.join(self.root, MANIFEST)) as f:
+            manifest = json.load(f)
+        if manifest['release'] != page_cache.release():
+            logger.warning('Prerendered pages in %s are from other templates; run export_static_pages', self.root)
+            return {}
+        pages = {}
+        for path, languages in manifest['pages'].items():
+            for lang, page in languages.items():
+                bodies = {}
+                for encoding in page['encodings']:
+                    with open(os.path.join(self.root, page['file'] + SUFFIXES[encoding]), 'rb') as f:
+                        bodies[encoding] = f.read()
+                pages[(path, lang)] = {**page, 'bodies': bodies, 'last_modified': http_date(manifest['exported_at'])}
+        return pages
+
+    def pages(self):
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return self._pages
+        with self._lock:
+            if time.monotonic() - self._checked_at >= self.check_interval:
+                version = self._manifest_version()
+                if version != self._version:
+                    try:
+                        self._pages = self._load() if version is not None else {}
+                    except (OSError, ValueError, KeyError):
+                        logger.exception('Could not load prerendered pages from %s', self.root)
+                        self._pages = {}
+                    self._version = version
+                self._checked_at = time.monotonic()
+            return self._pages
+
+    def respond(self, method, path, query_string, headers):
+        """(status, headers, body) for an exported page, or None to let Django handle the request.
+
+        headers are the request's, keyed by lower-case name.
+        """
+        if method not in ('GET', 'HEAD'):
+            return None
+        pages = self.pages()
+        if not pages or self.session_cookie in parse_cookie(headers.get('cookie', '')):
+            return None
+        lang = parse_qs(query_string).get('lang', ['en'])[-1]
+        page = pages.get((path, lang))
+        if page is None:
+            return None
+
+        accepted = _accepted(headers.get('accept-encoding', ''))
+        encoding = next(encoding for encoding in PREFERENCE if encoding in page['bodies'] and encoding in accepted)
+        etag = f'"{page["etag"]}-{encoding}"'
+        response_headers = [
+            ('Content-Type', page['content_type']),
+            ('ETag', etag),
+            ('Last-Modified', page['last_modified']),
+            ('Cache-Control', f'max-age={self.max_age}, public'),
+            ('Vary', 'Accept-Encoding, Cookie'),
+            ('X-Page-Cache', 'static'),
+            *self.security_headers,
+        ]
+        if etag in (tag.strip() for tag in headers.get('if-none-match', '').split(',')):
+            return 304, response_headers, b''
+        body = page['bodies'][encoding]
+        if encoding != 'identity':
+            response_headers.append(('Content-Encoding', encoding))
+        response_headers.append(('Content-Length', str(len(body))))
+        return 200, response_headers, b'' if method == 'HEAD' else body
+
+
+REASONS = {200: '200 OK', 304: '304 Not Modified'}
+
+
+class StaticPagesWSGI:
+    def __init__(self, application, config=None):
+        self.application = application
+        self.static_pages = StaticPages(config or load_config())
+
+    def __call__(self, environ, start_response):
+        headers = {
+            name[5:].replace('_', '-').lower(): value
+            for name, value in environ.items() if name.startswith('HTTP_')
+        }
+        found = self.static_pages.respond(
+            environ['REQUEST_METHOD'], environ.get('PATH_INFO', ''), environ.get('QUERY_STRING', ''), headers,
+        )
+        if found is None:
+            return self.application(environ, start_response)
+        status, response_headers, body = found
+        start_response(REASONS[status], response_headers)
+        return [body]
+
+
+class StaticPagesASGI:
+    def __init__(self, application, config=None):
+        self.application = application
+        self.static_pages = StaticPages(config or load_config())
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+            found = self.static_pages.respond(
+                scope['method'], scope['path'], scope['query_string'].decode('latin-1'), headers,
+            )
+            if found is not None:
+                status, response_headers, body = found
+                await send({
+                    'type': 'http.response.start',
+                    'status': status,
+                    'headers': [(name.encode('latin-1'), value.encode('latin-1')) for name, value in response_headers],
+                })
+                await send({'type': 'http.response.body', 'body': body})
+                return
+        await self.application(scope, receive, send)
+
+
+def wrap(application, asgi=False):
+    """application behind the static page fast path, or unchanged when STATIC_PAGES['ENABLED'] is off."""
+    config = load_config()
+    if not config['ENABLED']:
+        return application
+    return (StaticPagesASGI if asgi else StaticPagesWSGI)(application, config)
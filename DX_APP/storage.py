@@ -0,0 +1,113 @@
+# DX_APP/storage.py
+"""
+Static files storage for ``collectstatic``: minified, content-hashed and
+precompressed.
+
+* CSS is minified as it is collected. The hash in each file name
+  (``style.3f2a9c1d7b4e.css``) comes from the source file, so any edit to
+  it yields a new name.
+* ``staticfiles.json`` maps every source name to its hashed name. The
+  ``{% static %}`` tag reads it, so templates always point at the current
+  build. A changed file gets a new URL and browsers may cache every URL
+  forever.
+* Each hashed text asset gets a ``.gz`` copy, and a ``.br`` copy when the
+  brotli package is installed, for the web server to send as-is, e.g. nginx::
+
+      location /static/ {
+          alias /srv/dx/staticfiles/;
+          gzip_static on;  # brotli_static on; with ngx_brotli
+          add_header Cache-Control "public, max-age=31536000, immutable";
+      }
+
+JavaScript is compressed but not minified: doing that safely needs a real
+parser.
+"""
+import gzip
+import logging
+import re
+
+from django.contrib.staticfiles.storage import HashedFilesMixin, ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip copies are written without it
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.xml', '.map', '.html')
+MIN_COMPRESS_SIZE = 256  # bytes; smaller files are not worth a second request path
+
+# String literals are kept verbatim; everything between them is minified
+CSS_TOKENS = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*.*?\*/', re.S)
+CSS_SPACE = re.compile(r'\s+')
+CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+
+
+def _minify_css_code(code):
+    code = CSS_SPACE.sub(' ', code)
+    return CSS_PUNCTUATION.sub(r'\1', code).replace(';}', '}')
+
+
+def minify_css(css):
+    """css without comments and redundant whitespace; strings, and the spaces that calc() and selectors need, are kept."""
+    parts, position = [], 0
+    for match in CSS_TOKENS.finditer(css):
+        parts.append(_minify_css_code(css[position:match.start()]))
+        if match.group(1):  # a string; comments are dropped
+            parts.append(match.group(1))
+        position = match.end()
+    parts.append(_minify_css_code(css[position:]))
+    return ''.join(parts).strip()
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    # Names missing from the manifest fall back to hashing the collected file, then to the plain name (see url())
+    manifest_strict = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.uncollected = set()  # names already warned about
+
+    def _save(self, name, content):
+        if name.endswith('.css'):
+            content.seek(0)  # already read once when it was hashed
+            content = ContentFile(minify_css(content.read().decode('utf-8')).encode('utf-8'))
+        return super()._save(name, content)
+
+    def url(self, name, force=False):
+        try:
+            return super().url(name, force)
+        except ValueError:
+            # Not collected yet (collectstatic has not run since the file was added); every page would repeat it
+            if name not in self.uncollected:
+                self.uncollected.add(name)
+                logger.warning('Static file %s is not collected; serving it unhashed', name)
+            return super(HashedFilesMixin, self).url(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed.add(hashed_name)
+            yield name, hashed_name, processed
+        if not dry_run:
+            for hashed_name in sorted(hashed):
+                if hashed_name.endswith(COMPRESSIBLE):
+                    self.compress(hashed_name)
+
+    def compress(self, name):
+        """Write name.gz (and name.br) next to name when that makes it meaningfully smaller."""
+        with self.open(name) as f:
+            content = f.read()
+        if len(content) < MIN_COMPRESS_SIZE:
+            return
+        copies = {'.gz': gzip.compress(content, 9, mtime=0)}
+        if brotli is not None:
+            copies['.br'] = brotli.compress(content, quality=11)
+        for suffix, compressed in copies.items():
+            if len(compressed) < len(content) * 0.95:
+                if self.exists(name + suffix):
+                    self.delete(name + suffix)
+                self._save(name + suffix, ContentFile(compressed))
@@ -0,0 +1,110 @@
+# DX_APP/symptom_search.py
+"""
+Ranked free-text retrieval over disease descriptions.
+
+Each disease is a document (name, description and symptom phrases). It is
+embedded as a TF-IDF vector of word 1-2-grams and character 3-5-grams
+within words. The character n-grams carry typos, plurals and spellings such
+as "yellowing leafs" close to "yellow leaves". Vectors are L2-normalised,
+so the dot product is the cosine similarity.
+
+The document matrix is stored transposed, as an inverted index: scoring a
+query multiplies its few non-zero n-grams into the postings of those
+n-grams only, and the result stays sparse. A query therefore costs the
+length of its n-grams' postings, plus a top-k over the documents sharing
+at least one n-gram with it. Queries are vectorised without going through
+sklearn's transform(), whose fixed validation costs were most of the time.
+``manage.py benchmark_symptom_search`` times it on a synthetic knowledge
+base whose small vocabulary makes every query touch every disease. With
+10k diseases a query takes about 1.7 ms (p99 3.5 ms) there. Kept free of
+Django imports.
+"""
+from collections import Counter
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import normalize as l2_normalize
+
+TOP_K = 5
+MIN_SCORE = 0.1
+
+
+class Scores:
+    """Cosine similarities of a query: the rows (document numbers) with a non-zero score, and those scores."""
+
+    def __init__(self, rows, values):
+        self.rows = rows
+        self.values = values
+
+    def get(self, row):
+        """Score of one document (0.0 when it shares no n-gram with the query)."""
+        found = np.flatnonzero(self.rows == row)
+        return float(self.values[found[0]]) if len(found) else 0.0
+
+    def top(self, candidates=None, k=TOP_K, min_score=MIN_SCORE):
+        """The k best (row, score) pairs with score >= min_score, best first, optionally among candidates only.
+
+        candidates is an array of document rows.
+        """
+        rows, values = self.rows, self.values
+        keep = values >= min_score
+        if candidates is not None:
+            keep &= np.isin(rows, candidates, assume_unique=True)
+        rows, values = rows[keep], values[keep]
+        if not len(values) or k <= 0:
+            return []
+        k = min(k, len(values))
+        best = np.argpartition(-values, k - 1)[:k]
+        best = best[np.lexsort((rows[best], -values[best]))]
+        return [(int(row), float(score)) for row, score in zip(rows[best], values[best])]
+
+
+class SymptomIndex:
+    def __init__(self, documents):
+        """documents: one text per row; search() returns row numbers into this list."""
+        self.words = TfidfVectorizer(analyzer='word', ngram_range=(1, 2), sublinear_tf=True, dtype=np.float32)
+        self.chars = TfidfVectorizer(analyzer='char_wb', ngram_range=(3, 5), sublinear_tf=True, dtype=np.float32)
+        self.size = len(documents)
+        if documents:
+            matrix = self._stack(self.words.fit_transform(documents), self.chars.fit_transform(documents))
+            # features x documents: row f lists the documents containing n-gram f
+            self.postings = matrix.T.tocsr()
+            self.parts = [
+                (vectorizer.build_analyzer(), vectorizer.vocabulary_, vectorizer.idf_, offset)
+                for vectorizer, offset in ((self.words, 0), (self.chars, len(self.words.vocabulary_)))
+            ]
+
+    @staticmethod
+    def _stack(words, chars):
+        return l2_normalize(sparse.hstack([words, chars], format='csr'))
+
+    def vectorize(self, text):
+        """The query's TF-IDF vector as (feature indices, weights); what transform() + _stack() would give."""
+        indices, weights = [], []
+        for analyze, vocabulary, idf, offset in self.parts:
+            counts = Counter(vocabulary[term] for term in analyze(text) if term in vocabulary)
+            if not counts:
+                continue
+            features = np.fromiter(counts, dtype=np.intp, count=len(counts))
+            part = (np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts))) + 1) * idf[features]
+            indices.append(features + offset)
+            weights.append(part / np.sqrt(np.dot(part, part)))
+        if not indices:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.float32)
+        indices, weights = np.concatenate(indices), np.concatenate(weights)
+        return indices, weights / np.sqrt(np.dot(weights, weights))
+
+    def scores(self, text):
+        """Cosine similarity of text to the documents sharing an n-gram with it, as sparse Scores."""
+        if not self.size:
+            return Scores(np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.float32))
+        indices, weights = self.vectorize(text)
+        query = sparse.csr_matrix(
+            (weights, indices, [0, len(indices)]), shape=(1, self.postings.shape[0]),
+        )
+        product = query @ self.postings
+        return Scores(product.indices, product.data)
+
+    def search(self, text, rows=None, k=TOP_K, min_score=MIN_SCORE):
+        return self.scores(text).top(rows, k, min_score)
@@ -1,3 +1,1719 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import importlib.util
+import io
+import itertools
+import json
+import os
+import shutil
+import socketserver
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+import joblib
+import numpy as np
+import pandas as pd
+from PIL import Image
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+
+from ml import data_loader, search
+from ml.pipeline import StageCache
+
+from . import (
+    crop_plans, forecasting, jobs, leaderboard, leaf_classifier, leaf_features, live, market_data, metrics,
+    notifications, page_cache, price_history, recommendation, static_pages, timeseries,
+)
+from .alerts import AlertIndex
+from .diagnosis import KnowledgeBase, PhraseMatcher
+from .features import FEATURE_COLUMNS, INPUT_FEATURES, PH_BINS, PH_CATEGORIES, build_features, check_feature_columns
+from .forest import FlatForest, check_parity, sample_inputs
+from .leaf_classifier import LeafClassifier
+from .model_registry import DEFAULT_MODEL_PATH, SOURCE_MODEL_PATH, ModelRegistry, registry
+from .prediction_cache import DEFAULTS, DjangoBackend, LocalBackend, PredictionCache
+from .storage import minify_css
+from .symptom_search import SymptomIndex
+from .models import (
+    CropPlan, CropPrice, DemandForecast, Job, Notification, PriceAlert, PriceRollup, PriceTick, TrendLeaderboard,
+    UserProfile,
+)
+
+VALID_ROW = {'N': 90, 'P': 42, 'K': 43, 'temperature': 20.9, 'humidity': 82.0, 'ph': 6.5, 'rainfall': 202.9}
+
+# Pages render against the plain storage: the manifest one needs collectstatic (see CollectStaticTests)
+MANIFEST_STORAGES = settings.STORAGES
+plain_static = override_settings(STORAGES={
+    **settings.STORAGES, 'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+
+
+def setUpModule():
+    plain_static.enable()
+
+
+def tearDownModule():
+    plain_static.disable()
+
+
+
+# ======================================================
+# BATCH CROP RECOMMENDATION
+# ======================================================
+class ValidateRowsTests(TestCase):
+    def test_valid_rows_become_one_matrix(self):
+        rows, errors = recommendation.rows_from_json({'rows': [VALID_ROW, list(VALID_ROW.values())]})
+        matrix, errors = recommendation.validate_rows(rows, errors)
+        self.assertEqual(errors, {})
+        np.testing.assert_array_equal(matrix, [list(VALID_ROW.values())] * 2)
+
+    def test_bad_cells_are_reported_with_the_form_messages(self):
+        rows, errors = recommendation.rows_from_json([VALID_ROW, {**VALID_ROW, 'ph': 'acid', 'N': None}, [1, 2]])
+        matrix, errors = recommendation.validate_rows(rows, errors)
+        self.assertEqual(sorted(errors), [1, 2])
+        self.assertEqual(sorted(errors[1]), ['N', 'ph'])
+        self.assertEqual(errors[1]['ph'], ['Enter a number.'])
+        self.assertIn('__all__', errors[2])
+
+    def test_booleans_and_other_non_numbers_are_rejected(self):
+        rows, errors = recommendation.rows_from_json([
+            VALID_ROW, {**VALID_ROW, 'N': True, 'ph': False}, {**VALID_ROW, 'K': [43]}, {**VALID_ROW, 'P': '42'},
+        ])
+        matrix, errors = recommendation.validate_rows(rows, errors)
+        self.assertEqual(sorted(errors), [1, 2])
+        self.assertEqual(errors[1], {'N': ['Enter a number.'], 'ph': ['Enter a number.']})
+        self.assertEqual(errors[2], {'K': ['Enter a number.']})
+        self.assertEqual(matrix[3].tolist(), list(VALID_ROW.values()))  # numeric strings pass, as in the form
+
+    def test_csv_needs_every_column(self):
+        rows, errors = recommendation.rows_from_csv('N,P,K,temperature,humidity,ph,rainfall\n90,42,43,20.9,82,6.5,202.9\n')
+        self.assertEqual(recommendation.validate_rows(rows, errors)[0].tolist(), [list(VALID_ROW.values())])
+        with self.assertRaises(ValidationError):
+            recommendation.rows_from_csv('N,P,K\n1,2,3\n')
+
+
+class BatchRecommendationTests(TestCase):
+    def post(self, body, content_type='application/json'):
+        return self.client.post(reverse('crop_recommendation_batch'), body, content_type=content_type)
+
+    def test_json_batch_matches_the_model_row_by_row(self):
+        rows = [VALID_ROW, {**VALID_ROW, 'rainfall': 40.0, 'humidity': 20.0}]
+        response = self.post(json.dumps(rows))
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['count'], 2)
+        loaded = registry.get()
+        for row, result in zip(rows, body['results']):
+            crops, confidences = recommendation.recommend(loaded, np.array([list(row.values())]))
+            self.assertEqual(result, {'crop': crops[0], 'confidence': round(float(confidences[0]), 4)})
+
+    def test_csv_body(self):
+        response = self.post('N,P,K,temperature,humidity,ph,rainfall\n90,42,43,20.9,82,6.5,202.9\n', 'text/csv')
+        self.assertEqual(response.json()['count'], 1)
+
+    def test_invalid_rows_are_listed(self):
+        response = self.post(json.dumps([VALID_ROW, {**VALID_ROW, 'ph': 'acid'}]))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([row['row'] for row in response.json()['rows']], [1])
+
+    def test_rejects_bad_bodies_and_too_many_rows(self):
+        self.assertEqual(self.post('[{').status_code, 400)
+        self.assertEqual(self.post('[]').json(), {'error': 'No rows supplied'})
+        with mock.patch.object(recommendation, 'MAX_BATCH_ROWS', 2):
+            response = self.post(json.dumps([VALID_ROW] * 3))
+        self.assertEqual(response.json(), {'error': 'At most 2 rows per request'})
+
+
+# ======================================================
+# FEATURE ENGINEERING
+# ======================================================
+class BuildFeaturesTests(TestCase):
+    def pandas_features(self, inputs):
+        """The columns ml/train_model.py built with pd.cut/pd.get_dummies before build_features."""
+        df = pd.DataFrame(inputs, columns=INPUT_FEATURES)
+        df['N_P_ratio'] = df['N'] / (df['P'] + 1)
+        df['N_K_ratio'] = df['N'] / (df['K'] + 1)
+        df['temp_humidity'] = df['temperature'] * df['humidity'] / 100
+        df['nutrient_sum'] = df['N'] + df['P'] + df['K']
+        df['ph_category'] = pd.cut(df['ph'], bins=PH_BINS, labels=PH_CATEGORIES)
+        return pd.get_dummies(df, columns=['ph_category'], drop_first=True).astype(float)
+
+    def test_matches_the_pandas_transform(self):
+        rng = np.random.default_rng(0)
+        inputs = rng.uniform(0, 150, size=(200, 7))
+        inputs[:, 5] = np.concatenate([[0, 5.5, 6.5, 7.5, 8.5, 14, 14.5, -1], rng.uniform(3, 10, 192)])
+        expected = self.pandas_features(inputs)
+        self.assertEqual(list(expected.columns), FEATURE_COLUMNS)
+        np.testing.assert_array_equal(build_features(inputs), expected.to_numpy())
+
+    def test_rejects_other_shapes_and_columns(self):
+        with self.assertRaises(ValueError):
+            build_features(np.zeros((2, 6)))
+        with self.assertRaises(ValueError):
+            check_feature_columns(FEATURE_COLUMNS[::-1])
+        check_feature_columns(list(FEATURE_COLUMNS))
+
+
+# ======================================================
+# PREDICTION CACHE
+# ======================================================
+class FakeModel:
+    def __init__(self, version):
+        self.version = version
+
+
+class PredictionCacheTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        patcher = mock.patch('DX_APP.prediction_cache.recommend', side_effect=self.recommend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def recommend(self, loaded, matrix):
+        self.calls.append(np.array(matrix))
+        return np.array([f'{loaded.version}:{row[5]:.2f}' for row in matrix]), np.full(len(matrix), 0.5)
+
+    def cache(self, backend=None):
+        return PredictionCache(backend or LocalBackend(ttl=60, max_entries=100), DEFAULTS['ROUNDING'])
+
+    def test_rows_rounding_to_the_same_key_run_the_model_once_on_rounded_inputs(self):
+        cache = self.cache()
+        row = list(VALID_ROW.values())
+        nearby = [90.4, 42, 43, 20.94, 82.01, 6.504, 202.9]
+        crops, _ = cache.recommend(FakeModel('v1'), [row, nearby])
+        self.assertEqual(crops.tolist(), ['v1:6.50', 'v1:6.50'])
+        [called] = self.calls
+        np.testing.assert_array_equal(called, [row])
+
+        cache.recommend(FakeModel('v1'), [nearby])
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(cache.stats()['hits'], 1)
+
+    def test_new_model_version_misses(self):
+        for backend in [LocalBackend(ttl=60, max_entries=100), DjangoBackend('default', ttl=60)]:
+            with self.subTest(backend=backend.name):
+                cache = self.cache(backend)
+                cache.recommend(FakeModel('v1'), [list(VALID_ROW.values())])
+                crops, _ = cache.recommend(FakeModel('v2'), [list(VALID_ROW.values())])
+                self.assertEqual(crops.tolist(), ['v2:6.50'])
+                crops, _ = cache.recommend(FakeModel('v2'), [list(VALID_ROW.values())])
+                self.assertEqual(crops.tolist(), ['v2:6.50'])
+        self.assertEqual(len(self.calls), 4)
+
+    def test_values_too_large_for_a_key_skip_the_cache(self):
+        cache = self.cache()
+        huge = [1e20, 42, 43, 20.9, 82.0, 6.5, 202.9]
+        other = [3e20, 42, 43, 20.9, 82.0, 7.25, 202.9]
+        crops, _ = cache.recommend(FakeModel('v1'), [huge, list(VALID_ROW.values()), other])
+        self.assertEqual(crops.tolist(), ['v1:6.50', 'v1:6.50', 'v1:7.25'])
+        cached, raw = self.calls
+        np.testing.assert_array_equal(raw, [huge, other])  # as sent, not wrapped around int64
+        self.assertEqual(cache.backend.stats()['entries'], 1)
+
+        cache.recommend(FakeModel('v1'), [huge])
+        self.assertEqual(len(self.calls), 3)
+
+    def test_one_call_stores_at_most_max_insert_entries(self):
+        backend = LocalBackend(ttl=60, max_entries=100)
+        backend.get_many([], 'v1')
+        backend.set_many({'kept': 1}, 'v1')
+        cache = PredictionCache(backend, DEFAULTS['ROUNDING'], max_insert=10)
+        rows = [[n, 42, 43, 20.9, 82.0, 6.5, 202.9] for n in range(200)]
+        self.assertEqual(len(cache.recommend(FakeModel('v1'), rows)[0]), 200)
+        self.assertEqual(backend.stats()['entries'], 11)
+        self.assertEqual(backend.get_many(['kept'], 'v1'), {'kept': 1})
+        self.assertGreater(DEFAULTS['MAX_ENTRIES'], recommendation.MAX_BATCH_ROWS)
+
+    def test_local_backend_evicts_least_recently_used_and_expired(self):
+        backend = LocalBackend(ttl=60, max_entries=2)
+        backend.set_many({'a': 1, 'b': 2}, None)
+        backend.get_many(['a'], None)
+        backend.set_many({'c': 3}, None)
+        self.assertEqual(backend.get_many(['a', 'b', 'c'], None), {'a': 1, 'c': 3})
+        with mock.patch('DX_APP.prediction_cache.time.monotonic', return_value=time.monotonic() + 61):
+            self.assertEqual(backend.get_many(['a', 'c'], None), {})
+
+
+# ======================================================
+# CROP PLANS
+# ======================================================
+class CropPlanTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def render(self, crop, lang):
+        plan = crop_plans.PlanIndex(check_interval=0).get().get((crop, lang))
+        return render_to_string('DX_APP/crop_plan.html', {'plan': plan})
+
+    def test_fragment_is_rendered_once_per_version(self):
+        html = self.render('wheat', 'en')
+        self.assertIn('Remove weeds', html)
+        with self.assertNumQueries(1):  # the index; the weeks come from the fragment cache
+            self.assertEqual(self.render('wheat', 'en'), html)
+
+        plan = CropPlan.objects.get(crop='wheat', lang='en')
+        plan.weeks.filter(week=3).update(task='Hoe between the rows')
+        self.assertEqual(self.render('wheat', 'en'), html)  # not saved yet: same version
+        plan.save()
+        self.assertEqual(plan.version, 2)
+        self.assertIn('Hoe between the rows', self.render('wheat', 'en'))
+
+    def test_a_new_release_renders_the_fragment_again(self):
+        self.render('wheat', 'en')
+        with mock.patch.object(page_cache, 'release', return_value='next-release'), self.assertNumQueries(2):
+            self.render('wheat', 'en')  # the index and the weeks
+
+    def test_index_is_reread_only_after_its_interval(self):
+        index = crop_plans.PlanIndex(check_interval=3600)
+        self.assertEqual(index.get()['rice', 'mr'].version, 1)
+        CropPlan.objects.get(crop='rice', lang='mr').save()
+        with self.assertNumQueries(0):
+            self.assertEqual(index.get()['rice', 'mr'].version, 1)
+        index.check_interval = 0
+        self.assertEqual(index.get()['rice', 'mr'].version, 2)
+
+    def test_recommendation_shows_the_plan_in_the_chosen_language(self):
+        with mock.patch('DX_APP.views.cached_recommend', return_value=(np.array(['Rice']), np.array([0.9]))):
+            response = self.client.post(reverse('crop_recommendation') + '?lang=hi', VALID_ROW)
+        self.assertEqual(response.context['result'], 'Recommended Crop: Rice')
+        self.assertContains(response, 'पौधे लगाएं')
+        self.assertIsNone(crop_plans.crop_plan('Cotton', 'en'))
+
+
+# ======================================================
+# FLAT FOREST
+# ======================================================
+class FlatForestParityTests(TestCase):
+    def fit(self, seed, **params):
+        rng = np.random.default_rng(seed)
+        X = rng.normal(size=(400, 7))
+        y = rng.choice(['rice', 'wheat', 'maize', 'cotton'], size=400)
+        forest = RandomForestClassifier(n_estimators=20, random_state=seed, **params).fit(X, y)
+        return forest, FlatForest.from_sklearn(forest)
+
+    def test_matches_sklearn_exactly(self):
+        for seed, params in enumerate([{}, {'max_depth': 4}, {'min_samples_leaf': 5, 'class_weight': 'balanced'}]):
+            with self.subTest(params=params):
+                forest, flat = self.fit(seed, **params)
+                X = np.vstack([np.random.default_rng(seed).normal(size=(300, 7)), sample_inputs(flat, 300, seed)])
+                np.testing.assert_array_equal(flat.predict_proba(X), forest.predict_proba(X))
+                np.testing.assert_array_equal(flat.predict(X), forest.predict(X))
+
+    def test_single_row_and_values_on_a_threshold(self):
+        forest, flat = self.fit(0)
+        # A row sitting exactly on split thresholds must take the same (left) branch as sklearn
+        X = flat.threshold[~flat.is_leaf][:7].reshape(1, 7)
+        np.testing.assert_array_equal(flat.predict_proba(X), forest.predict_proba(X))
+        np.testing.assert_array_equal(flat.predict(X), forest.predict(X))
+
+    def test_check_parity_rejects_a_different_forest(self):
+        forest, flat = self.fit(0)
+        other, _ = self.fit(1)
+        check_parity(forest, flat, sample_inputs(flat, 200))
+        with self.assertRaises(ValueError):
+            check_parity(other, flat, sample_inputs(flat, 200))
+
+
+# ======================================================
+# MODEL REGISTRY
+# ======================================================
+class ModelRegistryTests(TestCase):
+    def test_shipped_model_is_memory_mapped(self):
+        self.assertTrue(os.path.exists(DEFAULT_MODEL_PATH))
+        loaded = ModelRegistry(DEFAULT_MODEL_PATH).get()
+        self.assertIsInstance(loaded.flat_model.value, np.memmap)
+        self.assertIsInstance(loaded.flat_model.children, np.memmap)
+
+    def test_shipped_export_matches_its_source_model(self):
+        exported = ModelRegistry(DEFAULT_MODEL_PATH).get()
+        source = ModelRegistry(SOURCE_MODEL_PATH).get()
+        X = sample_inputs(exported.flat_model, 500)
+        np.testing.assert_array_equal(exported.model.predict_proba(X), source.model.predict_proba(X))
+        np.testing.assert_array_equal(exported.flat_model.predict_proba(X), source.model.predict_proba(X))
+
+    def test_nothing_is_loaded_until_asked_and_a_replaced_file_is_reloaded(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'model.joblib')
+            registry = ModelRegistry(path, check_interval=0)
+            self.assertIsNone(registry.get())
+            shutil.copy(DEFAULT_MODEL_PATH, path)
+            first = registry.get()
+            self.assertIs(registry.get(), first)
+            os.utime(path, ns=(0, 0))
+            self.assertIsNot(registry.get(), first)
+
+    def test_unreadable_replacement_keeps_the_current_model(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'model.joblib')
+            shutil.copy(DEFAULT_MODEL_PATH, path)
+            registry = ModelRegistry(path, check_interval=0)
+            first = registry.get()
+            with open(path, 'wb') as f:
+                f.write(b'half a file')
+            with self.assertLogs('DX_APP.model_registry', 'ERROR'):
+                self.assertIs(registry.get(), first)
+
+
+# ======================================================
+# LEAF IMAGE CLASSIFIER
+# ======================================================
+LEAF_COLOURS = {'Tomato___healthy': (40, 150, 40), 'Wheat___Yellow_Rust': (200, 180, 30),
+                'Wheat___Powdery_Mildew': (235, 235, 225)}
+
+
+def leaf_image(colour, seed=0, size=(300, 200), fmt='JPEG'):
+    noise = np.random.default_rng(seed).integers(-25, 25, size=(size[1], size[0], 3))
+    pixels = np.clip(np.array(colour) + noise, 0, 255).astype(np.uint8)
+    data = io.BytesIO()
+    Image.fromarray(pixels).save(data, fmt)
+    return data.getvalue()
+
+
+class LeafClassifierTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp = tempfile.mkdtemp()
+        X, y = [], []
+        for label, colour in LEAF_COLOURS.items():
+            for seed in range(8):
+                X.append(leaf_features.extract(io.BytesIO(leaf_image(colour, seed)), 64))
+                y.append(label)
+        model = LogisticRegression(max_iter=1000).fit(X, y)
+        cls.model_path = os.path.join(cls.tmp, 'leaf_model.joblib')
+        joblib.dump({'model': model, 'labels': [str(label) for label in model.classes_], 'image_size': 64,
+                     'feature_version': leaf_features.FEATURE_VERSION}, cls.model_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp)
+        super().tearDownClass()
+
+    def classifier(self, path=None, **config):
+        return LeafClassifier(path or self.model_path, {**leaf_classifier.DEFAULTS, **config})
+
+    def upload(self, data):
+        return SimpleUploadedFile('leaf.jpg', data, content_type='image/jpeg')
+
+    def test_features_have_a_fixed_length_whatever_the_image(self):
+        for size, fmt in [((300, 200), 'JPEG'), ((20, 40), 'PNG')]:
+            features = leaf_features.extract(io.BytesIO(leaf_image((40, 150, 40), size=size, fmt=fmt)))
+            self.assertEqual((features.shape, features.dtype), ((leaf_features.FEATURE_COUNT,), np.float32))
+        with mock.patch.object(leaf_features, 'MAX_PIXELS', 1000), self.assertRaises(ValueError):
+            leaf_features.extract(io.BytesIO(leaf_image((40, 150, 40))))
+
+    def test_classifies_an_upload(self):
+        [best, *rest] = leaf_classifier.describe(
+            self.classifier(TOP_K=2).classify(self.upload(leaf_image(LEAF_COLOURS['Wheat___Yellow_Rust'], 99)))
+        )
+        self.assertEqual((best['crop'], best['disease'], best['healthy']), ('Wheat', 'Yellow Rust', False))
+        self.assertEqual(len(rest), 1)
+        self.assertEqual(leaf_classifier.parse_label('Tomato___healthy'), ('Tomato', None))
+
+    def test_skips_images_it_cannot_classify(self):
+        classifier = self.classifier(MAX_PENDING=1)
+        with self.assertLogs('DX_APP.leaf_classifier', 'INFO'):
+            self.assertIsNone(classifier.classify(self.upload(b'not an image')))
+        classifier.slots.acquire()
+        with self.assertLogs('DX_APP.leaf_classifier', 'WARNING'):
+            self.assertIsNone(classifier.classify(self.upload(leaf_image((40, 150, 40)))))
+        self.assertIsNone(self.classifier(os.path.join(self.tmp, 'missing.joblib')).classify(self.upload(b'')))
+
+    def test_rejects_a_model_trained_on_other_features(self):
+        path = os.path.join(self.tmp, 'old_model.joblib')
+        joblib.dump({**joblib.load(self.model_path), 'feature_version': 0}, path)
+        with self.assertLogs('DX_APP.leaf_classifier', 'ERROR'):
+            self.assertIsNone(self.classifier(path).artifacts())
+
+
+# ======================================================
+# JOBS
+# ======================================================
+class RecommendationJobTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('asha', password='pw')
+        self.client.force_login(self.user)
+
+    def submit(self, rows, client=None):
+        return (client or self.client).post(
+            reverse('submit_recommendation_job'), json.dumps(rows), content_type='application/json',
+        )
+
+    def test_anonymous_users_are_refused(self):
+        self.client.logout()
+        self.assertEqual(self.submit([VALID_ROW]).status_code, 401)
+        self.assertFalse(Job.objects.exists())
+
+    def test_csrf_token_is_required(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        self.assertEqual(self.submit([VALID_ROW], client).status_code, 403)
+
+    @override_settings(JOBS={'MAX_PENDING_PER_USER': 2})
+    def test_pending_jobs_per_user_are_capped(self):
+        self.assertEqual([self.submit([VALID_ROW]).status_code for _ in range(3)], [202, 202, 429])
+        Job.objects.update(status='done')
+        self.assertEqual(self.submit([VALID_ROW]).status_code, 202)
+
+    @override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=1024)
+    def test_body_larger_than_upload_limit_is_queued(self):
+        response = self.submit([VALID_ROW] * 100)
+        self.assertEqual(response.status_code, 202)
+        job = Job.objects.get(id=response.json()['id'])
+        self.assertEqual(job.payload, {'format': 'json'})
+        self.assertGreater(len(job.data), 1024)
+
+    def test_body_over_job_limit_is_rejected(self):
+        with mock.patch.object(recommendation, 'JOB_MAX_BATCH_BYTES', 100):
+            response = self.submit([VALID_ROW] * 10)
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(Job.objects.exists())
+
+    def test_invalid_rows_fail_the_job_with_row_errors(self):
+        job = jobs.submit('recommendation_batch', {'format': 'json'}, data=json.dumps(
+            [VALID_ROW, {**VALID_ROW, 'ph': 'acid'}],
+        ).encode())
+        [claimed] = jobs.claim('recommendation_batch', 1, jobs.load_config())
+        jobs.record(claimed, *jobs.perform(claimed), jobs.load_config())
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.error, 'Invalid rows')
+        self.assertEqual([row['row'] for row in job.result['rows']], [1])
+        self.assertIn('ph', job.result['rows'][0]['errors'])
+
+    def test_unparseable_body_fails_without_retry(self):
+        job = jobs.submit('recommendation_batch', {'format': 'json'}, data=b'[{')
+        [claimed] = jobs.claim('recommendation_batch', 1, jobs.load_config())
+        jobs.record(claimed, *jobs.perform(claimed), jobs.load_config())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ('failed', 'Could not parse request body'))
+
+
+class JobWorkerTests(TransactionTestCase):
+    # The worker runs handlers in threads, which cannot see a TestCase's open transaction
+    serialized_rollback = True
+    def test_valid_batch_is_recommended_by_the_worker(self):
+        job = jobs.submit('recommendation_batch', {'format': 'json'}, data=json.dumps([VALID_ROW] * 3).encode())
+        self.assertEqual(asyncio.run(jobs.Worker().run(once=True)), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done', job.error)
+        self.assertEqual(job.result['count'], 3)
+        self.assertEqual(job.attempts, 1)
+
+    def run_slow_job(self, seconds, **config):
+        """Run one job whose handler sleeps for seconds; returns the job and whether its lease held throughout."""
+        lease_held = []
+
+        def slow(payload, data):
+            time.sleep(seconds)
+            lease_held.append(Job.objects.filter(leased_until__gt=timezone.now()).exists())
+            return {'slept': seconds}
+
+        job = jobs.submit('recommendation_batch', {'format': 'json'}, data=b'[]')
+        with mock.patch.dict(jobs.HANDLERS, {'recommendation_batch': slow}):
+            asyncio.run(jobs.Worker({**jobs.load_config(), **config}).run(once=True))
+        job.refresh_from_db()
+        return job, lease_held[0]
+
+    def test_lease_is_renewed_while_the_job_runs(self):
+        job, lease_held = self.run_slow_job(1, LEASE_SECONDS=0.3)
+        self.assertTrue(lease_held)
+        self.assertEqual((job.status, job.result), ('done', {'slept': 1}))
+
+    def test_job_running_past_its_timeout_is_retried(self):
+        with self.assertLogs('DX_APP.jobs', 'ERROR'):
+            job, _ = self.run_slow_job(0.5, TIMEOUT={'recommendation_batch': 0.1})
+        self.assertEqual((job.status, job.error, job.attempts), ('pending', 'Timed out after 0.1 seconds', 1))
+        self.assertIsNone(job.result)  # the late result was not recorded
+
+
+class JobAttemptTests(TestCase):
+    def expire_lease(self, job):
+        Job.objects.filter(id=job.id).update(leased_until=timezone.now() - timedelta(seconds=1))
+
+    def test_claim_counts_an_attempt(self):
+        jobs.submit('recommendation_batch', {'format': 'json'}, data=b'[]')
+        [claimed] = jobs.claim('recommendation_batch', 1, jobs.load_config())
+        self.assertEqual(claimed.attempts, 1)
+
+    def test_job_abandoned_by_dead_workers_fails_after_max_attempts(self):
+        config = {**jobs.load_config(), 'MAX_ATTEMPTS': 3}
+        job = jobs.submit('recommendation_batch', {'format': 'json'}, data=b'[]')
+        for attempt in range(1, 4):
+            [claimed] = jobs.claim('recommendation_batch', 1, config)
+            self.assertEqual(claimed.attempts, attempt)
+            self.expire_lease(job)  # the worker died without recording anything
+        self.assertEqual(jobs.claim('recommendation_batch', 1, config), [])
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.attempts, 3)
+        self.assertIsNotNone(job.expires_at)
+
+    def test_unexpected_errors_retry_until_max_attempts(self):
+        config = {**jobs.load_config(), 'MAX_ATTEMPTS': 2, 'BACKOFF_SECONDS': 0}
+        job = jobs.submit('recommendation_batch', {'format': 'json'}, data=b'[]')
+        for status in ('pending', 'failed'):
+            [claimed] = jobs.claim('recommendation_batch', 1, config)
+            jobs.record(claimed, None, 'RuntimeError()', True, config)
+            job.refresh_from_db()
+            self.assertEqual(job.status, status)
+        self.assertEqual(job.attempts, 2)
+
+
+# ======================================================
+# NOTIFICATIONS
+# ======================================================
+class SMSGateway:
+    """A local HTTP server standing in for SMS_URL; answers every POST with .status and keeps the bodies."""
+
+    def __init__(self):
+        self.status = 200
+        self.requests = []
+        gateway = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                gateway.requests.append(json.loads(self.rfile.read(int(self.headers['Content-Length']))))
+                self.send_response(gateway.status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/send'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class SMTPServer:
+    """A local SMTP server standing in for EMAIL_HOST; refuses RCPT TO for .refused and keeps the messages."""
+
+    def __init__(self):
+        self.refused = set()
+        self.messages = []
+        smtp = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write(line.encode() + b'\r\n')
+
+            def handle(self):
+                self.reply('220 localhost ready')
+                recipients = []
+                for line in self.rfile:
+                    command = line.decode().strip()
+                    verb = command.split(' ', 1)[0].upper()
+                    if verb in ('EHLO', 'HELO'):
+                        self.reply('250 localhost')
+                    elif verb == 'MAIL':
+                        recipients = []
+                        self.reply('250 OK')
+                    elif verb == 'RCPT':
+                        address = command.split(':', 1)[1].strip().strip('<>')
+                        if address in smtp.refused:
+                            self.reply('550 no such user')
+                        else:
+                            recipients.append(address)
+                            self.reply('250 OK')
+                    elif verb == 'DATA':
+                        self.reply('354 end with .')
+                        data = []
+                        for body_line in self.rfile:
+                            if body_line.rstrip(b'\r\n') == b'.':
+                                break
+                            data.append(body_line)
+                        smtp.messages.append((recipients, b''.join(data).decode()))
+                        self.reply('250 OK')
+                    elif verb == 'QUIT':
+                        self.reply('221 bye')
+                        return
+                    else:  # RSET, NOOP
+                        self.reply('250 OK')
+
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def create_alert(username, methods, phone='+919800000000'):
+    user = User.objects.create_user(username, f'{username}@example.com', 'secret')
+    UserProfile.objects.create(user=user, phone=phone)
+    return PriceAlert.objects.create(
+        user=user, crop='Wheat', target_price=Decimal('2500'), alert_type='above', notification_method=methods,
+    )
+
+
+class RegistrationTests(TestCase):
+    def test_phone_number_is_kept_on_the_profile(self):
+        self.client.post(reverse('register'), {
+            'username': 'asha', 'email': 'asha@example.com', 'first_name': 'Asha', 'last_name': 'Patil',
+            'phone': '+919800000000', 'user_type': 'farmer', 'location': 'Pune',
+            'password1': 'a-long-Passw0rd', 'password2': 'a-long-Passw0rd',
+        })
+        profile = UserProfile.objects.get(user__username='asha')
+        self.assertEqual((profile.phone, profile.location), ('+919800000000', 'Pune'))
+
+    def test_a_failed_profile_leaves_no_user_behind(self):
+        with mock.patch.object(UserProfile.objects, 'create', side_effect=RuntimeError('disk full')):
+            response = self.client.post(reverse('register'), {
+                'username': 'asha', 'email': 'asha@example.com', 'first_name': 'Asha', 'last_name': 'Patil',
+                'phone': '', 'user_type': 'farmer', 'location': '',
+                'password1': 'a-long-Passw0rd', 'password2': 'a-long-Passw0rd',
+            })
+        self.assertEqual(response.status_code, 200)  # the form is shown again
+        self.assertFalse(User.objects.filter(username='asha').exists())
+
+
+class EnqueueNotificationTests(TestCase):
+    def test_recipients_come_from_the_user_and_profile(self):
+        alert = create_alert('asha', ['email', 'sms', 'app'])
+        notifications.enqueue_notifications([alert.id], timezone.now())
+        recipients = dict(Notification.objects.values_list('channel', 'recipient'))
+        self.assertEqual(recipients, {'email': 'asha@example.com', 'sms': '+919800000000', 'app': ''})
+
+    def test_a_trigger_is_queued_once_per_channel(self):
+        alert = create_alert('asha', ['email', 'sms', 'sms'])
+        triggered_at = timezone.now()
+        notifications.enqueue_notifications([alert.id], triggered_at)
+        notifications.enqueue_notifications([alert.id, alert.id], triggered_at)
+        self.assertEqual(Notification.objects.count(), 2)
+        notifications.enqueue_notifications([alert.id], triggered_at + timedelta(minutes=1))
+        self.assertEqual(Notification.objects.count(), 4)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class DispatcherTests(TransactionTestCase):
+    # Providers run in threads, which cannot see a TestCase's open transaction
+    serialized_rollback = True
+
+    def setUp(self):
+        self.gateway = SMSGateway()
+        self.addCleanup(self.gateway.close)
+        self.config = {
+            **notifications.load_config(),
+            'SMS_URL': self.gateway.url, 'SMS_TIMEOUT': 5, 'MAX_ATTEMPTS': 3, 'BACKOFF_SECONDS': 30,
+            'BATCH_SIZE': {'email': 2, 'sms': 2, 'app': 500},
+        }
+
+    def dispatch(self):
+        return asyncio.run(notifications.Dispatcher(self.config).dispatch_once())
+
+    def make_due(self):
+        Notification.objects.filter(status='pending').update(next_attempt_at=timezone.now())
+
+    def test_messages_are_sent_in_provider_sized_batches(self):
+        alerts = [create_alert(f'user{index}', ['email', 'sms']) for index in range(5)]
+        notifications.enqueue_notifications([alert.id for alert in alerts], timezone.now())
+        self.assertEqual(self.dispatch(), 10)
+
+        self.assertEqual(sorted(len(body['messages']) for body in self.gateway.requests), [1, 2, 2])
+        self.assertEqual({message['to'] for body in self.gateway.requests for message in body['messages']},
+                         {'+919800000000'})
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox),
+                         [f'user{index}@example.com' for index in range(5)])
+        self.assertEqual(Notification.objects.filter(status='sent').count(), 10)
+
+    def test_gateway_errors_are_retried_with_backoff_then_failed(self):
+        alert = create_alert('asha', ['sms'])
+        notifications.enqueue_notifications([alert.id], timezone.now())
+        self.gateway.status = 503
+
+        started = timezone.now()
+        self.dispatch()
+        row = Notification.objects.get()
+        self.assertEqual((row.status, row.attempts, row.last_error), ('pending', 1, 'HTTP 503'))
+        self.assertGreaterEqual(row.next_attempt_at, started + timedelta(seconds=15))
+        self.assertEqual(self.dispatch(), 0)  # not due until the backoff has passed
+
+        for _ in range(2):
+            self.make_due()
+            self.dispatch()
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts), ('failed', 3))
+        self.assertEqual(len(self.gateway.requests), 3)
+
+    def test_a_retry_that_succeeds_is_sent_once(self):
+        alert = create_alert('asha', ['sms'])
+        notifications.enqueue_notifications([alert.id], timezone.now())
+        self.gateway.status = 429
+        self.dispatch()
+        self.gateway.status = 200
+        self.make_due()
+        self.dispatch()
+        self.make_due()
+        self.assertEqual(self.dispatch(), 0)
+        self.assertEqual(Notification.objects.get().status, 'sent')
+        self.assertEqual(len(self.gateway.requests), 2)
+
+    def test_rejected_messages_and_missing_numbers_fail_without_retry(self):
+        alerts = [create_alert('asha', ['sms']), create_alert('ravi', ['sms'], phone='')]
+        notifications.enqueue_notifications([alert.id for alert in alerts], timezone.now())
+        self.gateway.status = 400
+        self.dispatch()
+        errors = dict(Notification.objects.values_list('user__username', 'last_error'))
+        self.assertEqual(errors, {'asha': 'HTTP 400', 'ravi': 'user has no phone number'})
+        self.assertEqual(set(Notification.objects.values_list('status', flat=True)), {'failed'})
+        self.assertEqual(len(self.gateway.requests), 1)
+
+
+    def test_an_expired_lease_does_not_overwrite_the_new_claim(self):
+        alert = create_alert('asha', ['sms'])
+        notifications.enqueue_notifications([alert.id], timezone.now())
+        stale, _ = notifications.claim(10, lease_seconds=-1)  # lease already over
+        token, claimed = notifications.claim(10, lease_seconds=60)
+        self.assertEqual(len(claimed), 1)
+
+        notifications.record({claimed[0]['id']: ('fail', 'HTTP 400')}, self.config, stale)
+        row = Notification.objects.get()
+        self.assertEqual((row.status, row.claim_token, row.attempts), ('sending', token, 0))
+        notifications.record({row.id: None}, self.config, token)
+        self.assertEqual(Notification.objects.get().status, 'sent')
+
+
+class SMTPDispatchTests(TransactionTestCase):
+    serialized_rollback = True
+
+    def setUp(self):
+        self.smtp = SMTPServer()
+        self.addCleanup(self.smtp.close)
+        self.config = {**notifications.load_config(), 'MAX_ATTEMPTS': 3}
+
+    def test_messages_go_through_a_real_smtp_connection(self):
+        alerts = [create_alert(name, ['email']) for name in ('asha', 'ravi', 'meera')]
+        notifications.enqueue_notifications([alert.id for alert in alerts], timezone.now())
+        self.smtp.refused.add('ravi@example.com')
+
+        with override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                               EMAIL_HOST='127.0.0.1', EMAIL_PORT=self.smtp.port, EMAIL_USE_TLS=False,
+                               EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD=''):
+            asyncio.run(notifications.Dispatcher(self.config).dispatch_once())
+
+        self.assertEqual(sorted(to for recipients, _ in self.smtp.messages for to in recipients),
+                         ['asha@example.com', 'meera@example.com'])
+        self.assertIn('Wheat', self.smtp.messages[0][1])
+        statuses = dict(Notification.objects.values_list('user__username', 'status'))
+        self.assertEqual(statuses, {'asha': 'sent', 'ravi': 'failed', 'meera': 'sent'})
+        self.assertIn('no such user', Notification.objects.get(user__username='ravi').last_error)
+
+# ======================================================
+# STATIC ASSETS
+# ======================================================
+class MinifyCssTests(TestCase):
+    def test_drops_comments_and_whitespace(self):
+        css = """
+        /* layout */
+        .nav  > li ,
+        .nav a:hover {
+            margin : 0 auto ;
+            width: calc(100% - 2rem);
+        }
+        """
+        self.assertEqual(minify_css(css), '.nav>li,.nav a:hover{margin : 0 auto;width: calc(100% - 2rem)}')
+
+    def test_keeps_strings_verbatim(self):
+        css = '.a::before { content: "/* not a comment */  {x}"; } .b{font-family:\'Noto  Sans\' , serif}'
+        self.assertEqual(minify_css(css),
+                         '.a::before{content: "/* not a comment */  {x}"}.b{font-family:\'Noto  Sans\',serif}')
+
+
+@override_settings(STORAGES=MANIFEST_STORAGES)
+class CollectStaticTests(TestCase):
+    def test_assets_are_minified_hashed_and_compressed(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(STATIC_ROOT=root):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            url = staticfiles_storage.url('DX_APP/css/base.css')
+            name = os.path.relpath(url, settings.STATIC_URL)
+            self.assertRegex(name, r'^DX_APP/css/base\.[0-9a-f]{12}\.css$')
+            with open(os.path.join(root, name), 'rb') as f:
+                collected = f.read()
+            with open(os.path.join(root, name + '.gz'), 'rb') as f:
+                self.assertEqual(gzip.decompress(f.read()), collected)
+            with open(finders.find('DX_APP/css/base.css'), encoding='utf-8') as f:
+                self.assertEqual(collected.decode('utf-8'), minify_css(f.read()))
+
+    def test_uncollected_files_are_served_unhashed_with_one_warning(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(STATIC_ROOT=root):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            with self.assertLogs('DX_APP.storage', 'WARNING') as logs:
+                for _ in range(3):
+                    self.assertEqual(staticfiles_storage.url('DX_APP/new.css'), settings.STATIC_URL + 'DX_APP/new.css')
+            self.assertEqual(len(logs.records), 1)
+
+
+# ======================================================
+# METRICS
+# ======================================================
+@override_settings(METRICS={'TOKEN': 'scrape-token'})
+class MetricsEndpointTests(TestCase):
+    def test_local_address_alone_is_not_enough(self):
+        # Behind the reverse proxy every request comes from 127.0.0.1
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='127.0.0.1')
+        self.assertEqual(response.status_code, 404)
+
+    def test_wrong_token_is_refused(self):
+        response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer guess'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_bearer_token_reads_per_view_metrics(self):
+        self.client.get(reverse('about'))
+        response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer scrape-token'})
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('dx_requests_total{view="about",status="200"}', body)
+        self.assertIn('dx_request_duration_seconds_bucket{view="about",le="+Inf"}', body)
+
+    def test_staff_users_can_read_metrics(self):
+        self.client.force_login(User.objects.create_user('ops', is_staff=True))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+    @override_settings(METRICS={'TOKEN': ''})
+    def test_empty_token_never_matches(self):
+        response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer '})
+        self.assertEqual(response.status_code, 404)
+
+
+class HistogramTests(TestCase):
+    def test_small_integers_are_exact_and_durations_within_the_bucket_error(self):
+        histogram = metrics.Histogram()
+        for value in [0, 1, 1, 2, 5, 31, 32]:
+            histogram.record(value)
+        self.assertEqual(histogram.cumulative([0, 1, 2, 5, 10, 31, 32]), [1, 3, 4, 5, 5, 6, 7])
+
+        for value in np.geomspace(1e-5, 100, 500):
+            lower = metrics.Histogram.lower_bound(metrics.Histogram.index(value))
+            self.assertLessEqual(lower, value)
+            self.assertLess(value - lower, value / metrics.SUB_BUCKETS)
+
+
+@override_settings(METRICS={'SLOW_REQUEST_SECONDS': 0})
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(metrics, 'registry', metrics.Registry())
+        self.registry = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_records_queries_templates_and_slow_requests_per_view(self):
+        create_price('Wheat', 4)
+        with self.assertLogs('DX_APP.metrics', 'WARNING') as logs:
+            self.client.get(reverse('market_insights'))
+        self.assertIn('Slow request GET /market-insights/ (market_insights)', logs.output[0])
+
+        view = self.registry.views['market_insights']
+        self.assertEqual((view.duration.count, dict(view.statuses)), (1, {200: 1}))
+        self.assertGreater(view.queries.sum, 0)
+        self.assertGreater(view.template_time.sum, 0)
+        self.assertIn('dx_requests_total{view="market_insights",status="200"} 1',
+                      self.registry.render(metrics.load_config()))
+
+        with self.assertLogs('DX_APP.metrics', 'WARNING'):
+            self.client.get('/no-such-page/')
+        self.assertEqual(dict(self.registry.views['unresolved'].statuses), {404: 1})
+
+
+# ======================================================
+# PAGE CACHE
+# ======================================================
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'}})
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_second_request_is_a_hit_and_revalidation_is_a_304(self):
+        first = self.client.get(reverse('pricing'), {'lang': 'hi'})
+        second = self.client.get(reverse('pricing'), {'lang': 'hi'})
+        self.assertEqual((first['X-Page-Cache'], second['X-Page-Cache']), ('miss', 'hit'))
+        self.assertEqual(first.content, second.content)
+        revalidated = self.client.get(reverse('pricing'), {'lang': 'hi'}, headers={'If-None-Match': first['ETag']})
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_signed_in_users_get_their_own_private_copy(self):
+        self.client.get(reverse('about'))
+        self.client.force_login(User.objects.create_user('asha'))
+        response = self.client.get(reverse('about'))
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_release_follows_the_contents_of_views_py(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'views.py')
+            with open(source, 'w') as f:
+                f.write("PLANS = {'basic': 0}\n")
+            with mock.patch.object(page_cache, 'SOURCES', [source]):
+                before = page_cache._content_release(page_cache._release_files())
+                with open(source, 'w') as f:
+                    f.write("PLANS = {'basic': 99}\n")
+                after = page_cache._content_release(page_cache._release_files())
+                os.utime(source, (0, 0))  # a touched but unchanged file is the same release
+                self.assertEqual(after, page_cache._content_release(page_cache._release_files()))
+        self.assertNotEqual(before, after)
+        self.assertIn(os.path.join(os.path.dirname(page_cache.__file__), 'views.py'), page_cache.SOURCES)
+
+
+# ======================================================
+# PRERENDERED PAGES
+# ======================================================
+class StaticPagesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.manifest = static_pages.export(self.root, ['en', 'mr'])
+        self.app = static_pages.StaticPagesWSGI(self.django, {**static_pages.DEFAULTS, 'ROOT': self.root})
+
+    @staticmethod
+    def django(environ, start_response):
+        start_response('200 OK', [('X-Served-By', 'django')])
+        return [b'django']
+
+    def get(self, path, query='', method='GET', **headers):
+        environ = {'REQUEST_METHOD': method, 'PATH_INFO': path, 'QUERY_STRING': query}
+        environ.update({'HTTP_' + name.upper(): value for name, value in headers.items()})
+        started = {}
+        body = b''.join(self.app(environ, lambda status, headers: started.update(status=status, headers=dict(headers))))
+        return started['status'], started['headers'], body
+
+    def test_export_writes_every_public_page_and_language(self):
+        self.assertEqual(set(self.manifest['pages']), set(page_cache.public_pages()))
+        page = self.manifest['pages']['/pricing/']['mr']
+        with open(os.path.join(self.root, page['file']), 'rb') as f:
+            html = f.read()
+        with open(os.path.join(self.root, page['file'] + '.gz'), 'rb') as f:
+            self.assertEqual(gzip.decompress(f.read()), html)
+        self.assertEqual(html, self.client.get(reverse('pricing'), {'lang': 'mr'}).content)
+
+    def test_serves_the_best_accepted_encoding_without_django(self):
+        status, headers, body = self.get('/pricing/', 'lang=mr', accept_encoding='gzip;q=0.5, deflate')
+        self.assertEqual((status, headers['Content-Encoding'], headers['X-Page-Cache']), ('200 OK', 'gzip', 'static'))
+        self.assertIn('nosniff', headers['X-Content-Type-Options'])
+        status, headers, plain = self.get('/pricing/', 'lang=mr', accept_encoding='gzip;q=0')
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertEqual(gzip.decompress(body), plain)
+
+        status, _, body = self.get('/pricing/', 'lang=mr', if_none_match=headers['ETag'])
+        self.assertEqual((status, body), ('304 Not Modified', b''))
+        self.assertEqual(self.get('/pricing/', method='HEAD')[2], b'')
+
+    def test_everything_else_goes_to_django(self):
+        for request in [
+            self.get('/pricing/', cookie=f'{settings.SESSION_COOKIE_NAME}=abc'),
+            self.get('/pricing/', method='POST'),
+            self.get('/pricing/', 'lang=hi'),  # not exported
+            self.get('/market-insights/'),
+        ]:
+            self.assertEqual(request[2], b'django')
+
+    def test_an_export_from_other_templates_is_ignored(self):
+        with mock.patch.object(page_cache, 'release', return_value='other'), \
+                self.assertLogs('DX_APP.static_pages', 'WARNING'):
+            self.assertEqual(self.get('/pricing/')[2], b'django')
+
+    def test_asgi_wrapper(self):
+        app = static_pages.StaticPagesASGI(None, {**static_pages.DEFAULTS, 'ROOT': self.root})
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {'type': 'http', 'method': 'GET', 'path': '/about/', 'query_string': b'', 'headers': []}
+        asyncio.run(app(scope, None, send))
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn(b'<html', sent[1]['body'].lower())
+
+
+# ======================================================
+# SYMPTOM SEARCH
+# ======================================================
+class SymptomIndexTests(TestCase):
+    DOCUMENTS = [
+        'Leaf blast. Diamond shaped grey lesions with brown margins on the leaves',
+        'Late blight. Dark water soaked patches on leaves and stems, white mould underneath',
+        'Powdery mildew. White powdery coating on the upper surface of leaves',
+        'Bacterial wilt. Sudden wilting of the whole plant while leaves stay green',
+    ]
+
+    def setUp(self):
+        self.index = SymptomIndex(self.DOCUMENTS)
+
+    def test_query_vector_matches_sklearn_transform(self):
+        for text in ['white powdery leafs', 'brown lesions on leaves', 'qqq', '']:
+            with self.subTest(text=text):
+                expected = self.index._stack(self.index.words.transform([text]), self.index.chars.transform([text]))
+                indices, weights = self.index.vectorize(text)
+                actual = np.zeros(expected.shape[1], dtype=np.float32)
+                actual[indices] = weights
+                np.testing.assert_allclose(actual, expected.toarray().ravel(), atol=1e-6)
+
+    def test_scores_are_sparse_and_equal_to_the_dense_cosine(self):
+        scores = self.index.scores('wilting plant')
+        dense = (self.index._stack(self.index.words.transform(['wilting plant']),
+                                   self.index.chars.transform(['wilting plant'])) @ self.index.postings).toarray().ravel()
+        self.assertEqual(sorted(scores.rows.tolist()), np.flatnonzero(dense).tolist())
+        for row in range(len(self.DOCUMENTS)):
+            self.assertAlmostEqual(scores.get(row), float(dense[row]), places=5)
+
+    def test_misspelt_description_finds_the_disease(self):
+        [(row, score), *rest] = self.index.search('white powdry coating on leafs')
+        self.assertEqual(row, 2)
+        self.assertTrue(all(score > other for _, other in rest))
+
+    def test_search_among_candidates_and_below_min_score(self):
+        self.assertNotIn(2, [row for row, _ in self.index.search('white powdery coating', rows=np.array([0, 1, 3]))])
+        self.assertEqual(self.index.search('zzzz qqqq'), [])
+        self.assertEqual(SymptomIndex([]).search('leaf'), [])
+
+
+# ======================================================
+# TRAINING DATA LOADER
+# ======================================================
+class ScanCsvTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        rng = np.random.default_rng(0)
+        self.df = pd.DataFrame({
+            'N': rng.integers(0, 140, 50), 'P': rng.integers(5, 145, 50), 'K': rng.integers(5, 205, 50),
+            'temperature': rng.uniform(8, 44, 50), 'humidity': rng.uniform(14, 100, 50),
+            'ph': rng.uniform(3.5, 9.9, 50), 'rainfall': rng.uniform(20, 300, 50),
+            'label': rng.choice(['rice', 'maize', 'chickpea'], 50),
+        }).astype({'N': float})
+        self.df.loc[[3, 17], 'N'] = np.nan
+        self.df.loc[20:27, 'ph'] = np.nan  # a whole chunk without pH
+        self.path = os.path.join(self.tmp, 'crops.csv')
+        self.df.to_csv(self.path, index=False)
+
+    def scan(self):
+        return data_loader.scan_csv(self.path, cache_root=os.path.join(self.tmp, 'cache'), chunksize=8)
+
+    def test_chunked_statistics_match_pandas(self):
+        stats, _ = self.scan()
+        expected = self.df[list(data_loader.DTYPES)].astype(np.float32).astype(np.float64).describe()
+        expected = expected.loc[['count', 'mean', 'std', 'min', 'max']]
+        np.testing.assert_allclose(stats.describe().to_numpy(), expected.to_numpy(), rtol=1e-9)
+        self.assertEqual(stats.missing.tolist(), [2, 0, 0, 0, 0, 8, 0])
+        self.assertEqual(stats.label_counts, self.df['label'].value_counts().to_dict())
+
+    def test_cache_round_trips_and_is_reused(self):
+        stats, cache_dir = self.scan()
+        df = data_loader.load_dataframe(cache_dir)
+        self.assertEqual(df['P'].dtype, np.int16)
+        self.assertEqual(df['N'].dtype, np.float32)  # has gaps
+        np.testing.assert_array_equal(df['label'].astype(str), self.df['label'])
+        np.testing.assert_allclose(df['ph'], self.df['ph'].astype(np.float32))
+
+        with mock.patch.object(data_loader, 'iter_chunks', side_effect=AssertionError('parsed the CSV again')):
+            cached, same_dir = self.scan()
+        self.assertEqual((cached.to_dict(), same_dir), (stats.to_dict(), cache_dir))
+
+
+# ======================================================
+# HYPERPARAMETER SEARCH
+# ======================================================
+class SuccessiveHalvingTests(TestCase):
+    GRID = {'n_estimators': [5, 10], 'max_depth': [2, 4, None], 'min_samples_leaf': [1, 3]}
+
+    def setUp(self):
+        self.checkpoint_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.checkpoint_dir)
+        rng = np.random.default_rng(0)
+        self.X = rng.normal(size=(270, 4))
+        self.y = np.where(self.X[:, 0] + self.X[:, 1] > 0, 'rice', 'maize')
+
+    def search(self, **options):
+        return search.successive_halving_search(
+            self.X, self.y, self.GRID, n_candidates=9, cv=3, checkpoint_dir=self.checkpoint_dir,
+            n_jobs=1, verbose=0, **options,
+        )
+
+    def test_rungs_grow_to_the_full_set(self):
+        self.assertEqual(search.plan_resources(270, 30, 3), [30, 90, 270])
+        self.assertEqual(search.plan_resources(20, 30, 3), [20])
+        self.assertEqual(len(search.sample_candidates(self.GRID, 5, 0)), 5)
+        self.assertEqual(len(search.sample_candidates(self.GRID, None, 0)), 12)
+
+    def test_halves_candidates_per_rung_and_resumes_from_the_trial_log(self):
+        best_params, best_score, history = self.search()
+        self.assertEqual([(rung['resource'], rung['candidates']) for rung in history], [(30, 9), (90, 3), (270, 1)])
+        self.assertEqual(best_score, history[-1]['best_score'])
+
+        with mock.patch.object(search, '_fit_fold', side_effect=AssertionError('refitted a logged trial')):
+            self.assertEqual(self.search(), (best_params, best_score, history))
+
+    def test_interrupted_run_only_fits_missing_trials(self):
+        self.search()
+        trials_path = os.path.join(self.checkpoint_dir, 'trials.jsonl')
+        with open(trials_path) as f:
+            lines = f.readlines()
+        with open(trials_path, 'w') as f:
+            f.writelines(lines[:-1] + ['{"key": "trunca'])
+
+        fits = []
+        real_fit = search._fit_fold
+        with mock.patch.object(search, '_fit_fold', side_effect=lambda *args: fits.append(args) or real_fit(*args)):
+            self.search()
+        self.assertEqual(len(fits), 3)  # one candidate x cv folds
+
+        # The trial refitted above was logged on a line of its own, after the partial one
+        with mock.patch.object(search, '_fit_fold', side_effect=AssertionError('refitted a logged trial')):
+            self.search()
+
+    def test_stops_at_the_time_budget(self):
+        with mock.patch.object(search.time, 'monotonic', side_effect=itertools.count(0, 10)):
+            best_params, best_score, history = self.search(time_budget=5)
+        self.assertEqual(history, [])
+        self.assertIsNone(best_params)
+
+
+# ======================================================
+# TRAINING PIPELINE STAGE CACHE
+# ======================================================
+STAGE_MODULE = """
+CALLS = []
+
+def scale(value):
+    return value * {factor}
+
+def stage(value):
+    CALLS.append(value)
+    return scale(value)
+"""
+
+
+class StageCacheTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.module_path = os.path.join(self.directory, 'stages.py')
+
+    def load_module(self, factor):
+        with open(self.module_path, 'w') as f:
+            f.write(STAGE_MODULE.format(factor=factor))
+        spec = importlib.util.spec_from_file_location('stages', self.module_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+    def run_stage(self, module, value=3):
+        cache = StageCache(os.path.join(self.directory, 'cache'))
+        with mock.patch('builtins.print'):
+            return cache.run('scale', module.stage, value)
+
+    def test_unchanged_stage_is_loaded_from_the_cache(self):
+        module = self.load_module(2)
+        first = self.run_stage(module)
+        second = self.run_stage(module)
+        self.assertEqual((first.value, second.value), (6, 6))
+        self.assertEqual(first.key, second.key)
+        self.assertEqual(module.CALLS, [3])
+
+    def test_changed_helper_in_the_stage_module_reruns_the_stage(self):
+        first = self.run_stage(self.load_module(2))
+        module = self.load_module(10)  # only scale(), not stage(), changed
+        second = self.run_stage(module)
+        self.assertNotEqual(first.key, second.key)
+        self.assertEqual((second.value, module.CALLS), (30, [3]))
+
+    def test_each_source_file_is_hashed_once_per_run(self):
+        module = self.load_module(2)
+        cache = StageCache(os.path.join(self.directory, 'cache'))
+        with mock.patch('builtins.print'), mock.patch('builtins.open', wraps=open) as opened:
+            cache.run('first', module.stage, 1)
+            cache.run('second', module.stage, 2, sources=[self.module_path])
+        paths = [call.args[0] for call in opened.call_args_list]
+        self.assertEqual(paths.count(os.path.abspath(self.module_path)), 1)
+
+
+# ======================================================
+# LEADERBOARDS
+# ======================================================
+def board_entry(name, trend, market='pune', state='maharashtra'):
+    return {'name': name, 'grade': 'Grade A', 'market': market, 'state': state, 'trend': trend}
+
+
+def create_price(name, trend, market='pune', state='maharashtra', **fields):
+    return CropPrice.objects.create(
+        name=name, crop_type='wheat', min_price=1000, max_price=1200, avg_price=1100,
+        trend_percentage=Decimal(str(trend)), market_name=market, state=state, **fields,
+    )
+
+
+class MergeBoardTests(TestCase):
+    def test_board_that_is_not_full_merges_exactly(self):
+        entries = [board_entry('a', 5.0), board_entry('b', 2.0)]
+        merged = leaderboard.merge_board(entries, [board_entry('c', 3.0), board_entry('a', 1.0)], 'gainers', size=5)
+        self.assertEqual([entry['name'] for entry in merged], ['c', 'b', 'a'])
+
+    def test_listing_that_stops_qualifying_drops_off(self):
+        entries = [board_entry('a', 5.0), board_entry('b', 2.0)]
+        merged = leaderboard.merge_board(entries, [board_entry('a', -1.0)], 'gainers', size=5)
+        self.assertEqual([entry['name'] for entry in merged], ['b'])
+
+    def test_full_board_keeps_only_entries_known_to_be_top(self):
+        entries = [board_entry('a', 5.0), board_entry('b', 4.0), board_entry('c', 3.0)]
+        merged = leaderboard.merge_board(entries, [board_entry('d', 9.0)], 'gainers', size=3)
+        self.assertEqual([entry['name'] for entry in merged], ['d', 'a', 'b'])
+
+    def test_full_board_needs_a_reload_when_its_cutoff_is_unknown(self):
+        entries = [board_entry('a', 5.0), board_entry('b', 4.0), board_entry('c', 3.0)]
+        # 'a' falls below the old last entry; something off the board may now rank above it
+        self.assertIsNone(leaderboard.merge_board(entries, [board_entry('a', 1.0)], 'gainers', size=3))
+
+    def test_losers_rank_most_negative_first(self):
+        merged = leaderboard.merge_board([], [board_entry('a', -1.0), board_entry('b', -4.0), board_entry('c', 2.0)],
+                                         'losers', size=5)
+        self.assertEqual([entry['name'] for entry in merged], ['b', 'a'])
+
+
+class LeaderboardTests(TestCase):
+    def test_top_of_a_scope_without_a_board_reads_without_writing(self):
+        create_price('Wheat', 4)
+        create_price('Onion', -6)
+        create_price('Rice', 2)
+        gainers, losers = leaderboard.top('market:pune', 1)
+        self.assertEqual(([entry['name'] for entry in gainers], [entry['name'] for entry in losers]), (['Wheat'], ['Onion']))
+        self.assertFalse(TrendLeaderboard.objects.exists())
+
+    def test_update_boards_keeps_stored_boards_in_step_with_prices(self):
+        wheat = create_price('Wheat', 4)
+        create_price('Rice', 2, market='mumbai')
+        leaderboard.rebuild_boards()
+        wheat.trend_percentage = Decimal('-3')
+        wheat.save()
+        leaderboard.update_boards([wheat])
+
+        with self.assertNumQueries(1):
+            gainers, losers = leaderboard.top('all', 10)
+        self.assertEqual([entry['name'] for entry in gainers], ['Rice'])
+        self.assertEqual([entry['name'] for entry in losers], ['Wheat'])
+        gainers, losers = leaderboard.top('market:pune', 10)
+        self.assertEqual((gainers, [entry['name'] for entry in losers]), ([], ['Wheat']))
+
+
+# ======================================================
+# PRICE FEED INGESTION
+# ======================================================
+FEED_HEADER = 'name,crop_type,grade,min_price,max_price,avg_price,state,market_name\n'
+
+
+class IngestPricesTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def ingest(self, name, text, *args):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        out, err = io.StringIO(), io.StringIO()
+        call_command('ingest_prices', path, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_upserts_listings_and_computes_trends(self):
+        out, err = self.ingest('day1.csv', FEED_HEADER + (
+            'Wheat,wheat,,2000,2400,2200,maharashtra,pune\n'
+            'Onion,Vegetables,Grade B,1000,1400,1200,Maharashtra,APMC Nashik\n'
+        ))
+        self.assertIn('2 rows (2 new, 0 updated, 0 rejected', out)
+        self.assertEqual(err, '')
+        onion = CropPrice.objects.get(name='Onion')
+        self.assertEqual((onion.crop_type, onion.market_name, onion.trend_percentage), ('vegetables', 'nashik', 0))
+
+        out, _ = self.ingest('day2.jsonl', '\n'.join(json.dumps(row) for row in [
+            {'name': 'Wheat', 'crop_type': 'wheat', 'min_price': 2000, 'max_price': 2700, 'avg_price': 2000,
+             'state': 'maharashtra', 'market_name': 'pune'},
+            {'name': 'Wheat', 'crop_type': 'wheat', 'min_price': 2000, 'max_price': 2700, 'avg_price': 2530,
+             'state': 'maharashtra', 'market_name': 'pune'},
+        ]), '--batch-size', '1')
+        self.assertIn('2 rows (0 new, 2 updated', out)
+        wheat = CropPrice.objects.get(name='Wheat')
+        self.assertEqual((wheat.avg_price, wheat.trend_percentage), (Decimal('2530.00'), Decimal('26.50')))
+        self.assertEqual(CropPrice.objects.count(), 2)
+
+    def test_duplicate_listing_in_a_batch_keeps_the_last_row(self):
+        self.ingest('day1.csv', FEED_HEADER + (
+            'Wheat,wheat,,2000,2400,2200,maharashtra,pune\n'
+            'Wheat,wheat,,2000,2400,2300,maharashtra,pune\n'
+        ))
+        self.assertEqual(CropPrice.objects.get().avg_price, Decimal('2300.00'))
+
+    def test_rejected_rows_are_reported(self):
+        out, err = self.ingest('day1.csv', FEED_HEADER + (
+            ',wheat,,2000,2400,2200,maharashtra,pune\n'
+            'Wheat,wheat,,2000,2400,2500,maharashtra,pune\n'
+            'Wheat,barley,,2000,2400,2200,maharashtra,pune\n'
+            'Wheat,wheat,,-1,2400,2200,maharashtra,pune\n'
+        ))
+        self.assertIn('4 rows (0 new, 0 updated, 4 rejected', out)
+        self.assertEqual(err.splitlines(), [
+            f'{os.path.join(self.tmp, "day1.csv")}: row {line}: {message}' for line, message in [
+                (1, 'name: required'),
+                (2, 'prices: expected min_price <= avg_price <= max_price'),
+                (3, "crop_type: unknown value 'barley'"),
+                (4, "min_price: must be a non-negative number ('-1')"),
+            ]
+        ])
+        self.assertFalse(CropPrice.objects.exists())
+
+    def test_unknown_format_is_a_command_error(self):
+        with self.assertRaisesMessage(CommandError, 'Unsupported feed format'):
+            self.ingest('day1.xml', '<prices/>')
+
+
+# ======================================================
+# PRICE HISTORY
+# ======================================================
+class PriceHistoryTests(TestCase):
+    START = datetime(2026, 3, 2, 9, 30, tzinfo=dt_timezone.utc)  # a Monday
+
+    def tick(self, price, hours, name='Wheat', market='pune'):
+        PriceTick.objects.create(
+            name=name, grade='Grade A', state='maharashtra', market_name=market,
+            min_price=price, max_price=price, avg_price=price, recorded_at=self.START + timedelta(hours=hours),
+        )
+
+    def rollups(self):
+        return list(PriceRollup.objects.order_by(*price_history.ROLLUP_KEY)
+                    .values_list(*price_history.ROLLUP_KEY, *price_history.ROLLUP_FIELDS))
+
+    def test_incremental_rollups_equal_a_rebuild(self):
+        for hours, price in enumerate([100, 120, 90, 110, 130, 105, 95, 140]):
+            self.tick(price, hours * 7)
+        self.tick(500, 1, market='nashik')
+        self.assertEqual(price_history.rollup(batch_size=2), 9)
+        self.tick(150, 60)
+        self.assertEqual(price_history.rollup(batch_size=2), 1)
+        self.assertEqual(price_history.rollup(), 0)
+        incremental = self.rollups()
+
+        price_history.rebuild()
+        self.assertEqual(price_history.rollup(), 10)
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_series_and_trend_read_the_daily_buckets(self):
+        for hours, price in [(0, 100), (5, 120), (2, 80), (24, 90), (30, 99)]:
+            self.tick(price, hours)
+        price_history.rollup()
+        points = price_history.series('Wheat', 'pune', 'day', since=self.START, until=self.START + timedelta(days=2))
+        self.assertEqual(points, [
+            {'bucket': '2026-03-02T00:00:00+00:00', 'open': 100.0, 'high': 120.0, 'low': 80.0, 'close': 120.0,
+             'avg': 100.0},
+            {'bucket': '2026-03-03T00:00:00+00:00', 'open': 90.0, 'high': 99.0, 'low': 90.0, 'close': 99.0,
+             'avg': 94.5},
+        ])
+        self.assertEqual(price_history.trend('Wheat', 'pune'), -17.5)
+        self.assertIsNone(price_history.trend('Wheat', 'pune', 'week'))
+        [week] = price_history.series('Wheat', 'pune', 'week', since=self.START, until=self.START + timedelta(days=2))
+        self.assertEqual((week['open'], week['close']), (100.0, 99.0))
+
+    def test_api_validates_its_parameters(self):
+        url = reverse('price_history_api')
+        self.assertEqual(self.client.get(url, {'crop': 'Wheat'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'crop': 'Wheat', 'market': 'pune', 'period': 'year'}).status_code, 400)
+        self.tick(100, 0)
+        price_history.rollup()
+        response = self.client.get(url, {'crop': 'Wheat', 'market': 'pune', 'period': 'hour'})
+        self.assertEqual(response.status_code, 200)
+
+
+# ======================================================
+# PRICE ALERTS
+# ======================================================
+class AlertIndexTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('farmer', password='pw')
+
+    def alert(self, crop, alert_type, target, **fields):
+        return PriceAlert.objects.create(user=self.user, crop=crop, alert_type=alert_type,
+                                         target_price=Decimal(str(target)), **fields).id
+
+    def test_matches_a_brute_force_evaluation(self):
+        rng = np.random.default_rng(0)
+        crops = ['Wheat', 'Onion', 'Rice']
+        alerts = {}
+        for _ in range(300):
+            crop, alert_type = rng.choice(crops), rng.choice(['above', 'below', 'change'])
+            target = round(float(rng.uniform(0, 40) if alert_type == 'change' else rng.uniform(500, 3000)), 2)
+            alerts[self.alert(crop, alert_type, target)] = (crop, alert_type, target)
+        prices = [CropPrice(name=crop, avg_price=Decimal(str(round(float(rng.uniform(500, 3000)), 2))),
+                            trend_percentage=Decimal(str(round(float(rng.uniform(-30, 30)), 2))))
+                  for crop in rng.choice(crops[:2], 10)]
+
+        expected = set()
+        for alert_id, (crop, alert_type, target) in alerts.items():
+            values = [p for p in prices if p.name == crop]
+            if alert_type == 'above' and any(float(p.avg_price) >= target for p in values) \
+                    or alert_type == 'below' and any(float(p.avg_price) <= target for p in values) \
+                    or alert_type == 'change' and any(abs(float(p.trend_percentage)) >= target for p in values):
+                expected.add(alert_id)
+
+        index = AlertIndex.load()
+        self.assertEqual(set(index.match(prices).tolist()), expected)
+        self.assertEqual(len(index), len(alerts) - len(expected))
+        self.assertEqual(len(index.match(prices)), 0)  # fired alerts left the index
+
+    def test_evaluate_marks_once_and_skips_inactive_or_triggered_alerts(self):
+        wheat = self.alert('  wheat ', 'above', 2000)
+        self.alert('Wheat', 'above', 2000, is_active=False)
+        self.alert('Wheat', 'above', 2000, triggered_at=timezone.now() - timedelta(days=1))
+        self.alert('Wheat', 'below', 1000)
+        price = CropPrice(name='Wheat', avg_price=Decimal('2000'), trend_percentage=Decimal('0'))
+
+        self.assertEqual(AlertIndex.load().evaluate([price]).tolist(), [wheat])
+        self.assertIsNotNone(PriceAlert.objects.get(id=wheat).triggered_at)
+        self.assertEqual(AlertIndex.load().evaluate([price]).tolist(), [])
+
+        self.alert('Wheat', 'above', 1500)
+        price.is_active = False
+        self.assertEqual(AlertIndex.load().evaluate([price]).tolist(), [])
+
+    def test_overlapping_runs_notify_once(self):
+        UserProfile.objects.create(user=self.user)
+        wheat = self.alert('Wheat', 'above', 2000, notification_method=['app'])
+        price = CropPrice(name='Wheat', avg_price=Decimal('2100'), trend_percentage=Decimal('0'))
+        first, second = AlertIndex.load(), AlertIndex.load()  # both loaded before either run marks the alert
+
+        now = timezone.now()
+        self.assertEqual(first.evaluate([price], now).tolist(), [wheat])
+        self.assertEqual(second.evaluate([price], now + timedelta(seconds=1)).tolist(), [])
+        self.assertEqual(Notification.objects.count(), 1)
+        self.assertEqual(PriceAlert.objects.get(id=wheat).triggered_at, now)
+
+
+# ======================================================
+# DEMAND FORECASTING
+# ======================================================
+class TimeseriesTests(TestCase):
+    def test_fill_gaps_forward_fills_and_backfills_the_start(self):
+        filled = timeseries.fill_gaps([[np.nan, 2, np.nan, np.nan, 5], [1, np.nan, 3, np.nan, np.nan]])
+        np.testing.assert_array_equal(filled, [[2, 2, 2, 2, 5], [1, 1, 3, 3, 3]])
+
+    def test_vectorised_holt_matches_the_textbook_recursion(self):
+        values = np.random.default_rng(0).uniform(900, 1100, size=(4, 30))
+        forecasts = timeseries.holt(values, 5, 0.5, 0.2)
+        for row, series in zip(forecasts, values):
+            level, trend = series[0], series[1] - series[0]
+            for value in series[1:]:
+                level, previous = 0.5 * value + 0.5 * (level + trend), level
+                trend = 0.2 * (level - previous) + 0.8 * trend
+            np.testing.assert_allclose(row, level + trend * np.arange(1, 6))
+
+    def test_picks_the_method_that_fits_each_series(self):
+        weekly = np.tile([100, 120, 90, 110, 130, 95, 105], 6).astype(float)
+        rising = 1000 + 10 * np.arange(42, dtype=float)
+        best, forecasts = timeseries.forecast(np.vstack([weekly, rising]), 7)
+        self.assertEqual(timeseries.METHODS[best[0]], 'seasonal_naive')
+        self.assertTrue(timeseries.METHODS[best[1]].startswith('holt'))
+        np.testing.assert_allclose(forecasts[0], weekly[:7])
+        np.testing.assert_allclose(forecasts[1], rising[-1] + 10 * np.arange(1, 8), rtol=1e-3)
+
+
+class DemandForecastTests(TestCase):
+    def rollups(self, name, prices, market='pune'):
+        today = price_history.bucket_start(timezone.now(), 'day')
+        PriceRollup.objects.bulk_create([
+            PriceRollup(period='day', name=name, market_name=market, bucket=today - timedelta(days=days_ago),
+                        open=price, high=price, low=price, close=price, price_sum=price * 2, tick_count=2,
+                        first_at=today, last_at=today)
+            for days_ago, price in enumerate(reversed(prices)) if price is not None
+        ])
+
+    def test_run_replaces_upcoming_forecasts(self):
+        self.rollups('Onion', [1000 + 40 * day for day in range(30)])
+        self.rollups('Wheat', [2000 - 5 * day if day % 3 else None for day in range(30)], market='nashik')
+        self.rollups('Rice', [1500] * (forecasting.MIN_OBSERVED - 1))
+        DemandForecast.objects.create(crop='Stale', period='', demand_level='Low', change_percentage=0,
+                                      forecast_date=timezone.localdate() + timedelta(days=1))
+        past = DemandForecast.objects.create(crop='Past', period='', demand_level='Low', change_percentage=0,
+                                             forecast_date=timezone.localdate() - timedelta(days=1))
+
+        self.assertEqual(forecasting.run(workers=1), 2)
+        forecasts = {row.crop: row for row in DemandForecast.objects.exclude(id=past.id)}
+        self.assertEqual(sorted(forecasts), ['Onion', 'Wheat'])
+        self.assertEqual((forecasts['Onion'].demand_level, forecasts['Wheat'].demand_level), ('Very High', 'Medium'))
+        self.assertEqual(forecasts['Wheat'].market_name, 'nashik')
+        self.assertGreater(forecasts['Onion'].change_percentage, 10)
+
+    def test_process_pool_gives_the_same_fits(self):
+        matrix = np.random.default_rng(0).uniform(900, 1100, size=(5, 30))
+        matrix[1, 3:9] = np.nan
+        for serial, pooled in zip(forecasting.fit_all(matrix, workers=1, chunk_size=2),
+                                  forecasting.fit_all(matrix, workers=2, chunk_size=2)):
+            np.testing.assert_array_equal(serial, pooled)
+        self.assertEqual(forecasting.demand_level(-3), 'Medium')
+        self.assertEqual(forecasting.demand_level(-3.01), 'Low')
+
+
+# ======================================================
+# MARKET INSIGHTS
+# ======================================================
+class MarketDataTests(TestCase):
+    def test_latest_prices_filters_and_orders_newest_first(self):
+        create_price('Wheat', 4)
+        create_price('Onion', -6, market='nashik')
+        create_price('Rice', 2, is_active=False)
+        create_price('Jowar', 1)
+        self.assertEqual([row['name'] for row in market_data.latest_prices()], ['Jowar', 'Onion', 'Wheat'])
+        [onion] = market_data.latest_prices(market='nashik')
+        self.assertEqual((onion['trend'], onion['trend_color'], onion['market']), ('-6.0', 'danger', 'APMC Nashik'))
+        self.assertEqual(market_data.latest_prices(limit=1)[0]['name'], 'Jowar')
+
+    def test_page_costs_the_same_queries_however_many_prices(self):
+        user = User.objects.create_user('farmer', password='pw')
+        self.client.force_login(user)
+        counts = []
+        for total in (3, 60):
+            for i in range(CropPrice.objects.count(), total):
+                create_price(f'Crop {i}', i - 30)
+            PriceAlert.objects.create(user=user, crop='Wheat', alert_type='above', target_price=100,
+                                      triggered_at=timezone.now())
+            leaderboard.rebuild_boards()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('market_insights'))
+            self.assertEqual(len(response.context['crop_prices']), min(total, market_data.PRICE_ROWS))
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual([row['crop'] for row in response.context['top_gainers']], ['Crop 59', 'Crop 58', 'Crop 57'])
+
+
+# ======================================================
+# LIVE PRICE STREAM
+# ======================================================
+class BroadcasterTests(TestCase):
+    def setUp(self):
+        self.broadcaster = live.Broadcaster()
+        self.broadcaster._start_cursors()
+
+    def test_sends_each_changed_price_once(self):
+        wheat = create_price('Wheat', 4)
+        create_price('Onion', -6)
+        prices, alerts = self.broadcaster.changes()
+        self.assertEqual([data['name'] for name, data in prices], ['Wheat', 'Onion'])
+        self.assertEqual(alerts, {})
+        self.assertEqual(self.broadcaster.changes(), ([], {}))
+
+        wheat.avg_price = 1150
+        wheat.save()
+        [(name, data)] = self.broadcaster.changes()[0]
+        self.assertEqual((name, data['name'], data['avg_price']), ('price', 'Wheat', Decimal('1150')))
+
+    def test_a_flood_of_changes_becomes_one_resync(self):
+        with mock.patch.object(live, 'MAX_PRICE_EVENTS', 2):
+            for name in ['Wheat', 'Onion', 'Rice']:
+                create_price(name, 1)
+            self.assertEqual(self.broadcaster.changes()[0], [live.RESYNC])
+            self.assertEqual(self.broadcaster.changes()[0], [])
+
+    def test_resync_cursor_ignores_inactive_prices(self):
+        retired = create_price('Barley', 1, is_active=False)
+        CropPrice.objects.filter(id=retired.id).update(updated_at=timezone.now() + timedelta(hours=1))
+        with mock.patch.object(live, 'MAX_PRICE_EVENTS', 2):
+            for name in ['Wheat', 'Onion', 'Rice']:
+                create_price(name, 1)
+            self.assertEqual(self.broadcaster.changes()[0], [live.RESYNC])
+        create_price('Maize', 2)
+        self.assertEqual([data['name'] for name, data in self.broadcaster.changes()[0]], ['Maize'])
+
+    def test_in_app_alerts_go_to_their_user_only(self):
+        alert = create_alert('asha', ['app', 'email'])
+        notifications.enqueue_notifications([alert.id], timezone.now())
+        prices, alerts = self.broadcaster.changes()
+        self.assertEqual(list(alerts), [alert.user_id])
+        [(name, data)] = alerts[alert.user_id]
+        self.assertEqual((name, data['crop'], data['priority']), ('alert', 'Wheat', 'High'))
+        self.assertEqual(self.broadcaster.changes(), ([], {}))
+
+
+class EventStreamTests(TestCase):
+    def test_overflowing_client_gets_a_single_resync(self):
+        async def fill():
+            subscriber = live.Subscriber(None)
+            for i in range(live.QUEUE_SIZE + 1):
+                subscriber.push(('price', {'i': i}))
+            return subscriber.queue.qsize(), subscriber.queue.get_nowait()
+
+        self.assertEqual(asyncio.run(fill()), (1, live.RESYNC))
+
+    def test_stream_yields_pushed_events_and_unsubscribes(self):
+        async def consume():
+            stream = live.event_stream(user_id=7)
+            chunks = [await stream.__anext__()]
+            broadcaster = live.get_broadcaster()
+            [subscriber] = broadcaster.subscribers
+            subscriber.push(('price', {'name': 'Wheat', 'avg_price': Decimal('2200.50')}))
+            chunks.append(await stream.__anext__())
+            await stream.aclose()
+            return chunks, broadcaster.subscribers
+
+        async def idle(self):
+            pass
+
+        with mock.patch.object(live.Broadcaster, 'run', idle):
+            chunks, subscribers = asyncio.run(consume())
+        self.assertEqual(chunks, [
+            f'retry: {live.RETRY_MS}\n\n',
+            'event: price\ndata: {"name": "Wheat", "avg_price": "2200.50"}\n\n',
+        ])
+        self.assertEqual(subscribers, set())
+
+
+# ======================================================
+# DISEASE DIAGNOSIS
+# ======================================================
+class PhraseMatcherTests(TestCase):
+    def setUp(self):
+        self.matcher = PhraseMatcher([('yellow leaves', 'blast'), ('brown spots', 'spot'), ('leaves', 'any')])
+
+    def test_matches_whole_words_only(self):
+        self.assertEqual(sorted(self.matcher.find('Yellow   leaves!')), ['any', 'blast'])
+        self.assertEqual(self.matcher.find('yellowish leavesx'), [])
+
+    def test_finds_every_occurrence_in_one_pass(self):
+        self.assertEqual(sorted(self.matcher.find('brown spots, then yellow leaves and more brown-spots')),
+                         ['any', 'blast', 'spot', 'spot'])
+
+
+class KnowledgeBaseTests(TestCase):
+    def setUp(self):
+        self.kb = KnowledgeBase.load()
+
+    def test_phrase_match_ranks_first(self):
+        results = self.kb.diagnose('rice', 'I see brown spots on the leaves')
+        self.assertEqual(results[0]['disease'], 'Brown Spot')
+        self.assertEqual(self.kb.diagnose('cotton', 'brown spots'), [])
+
+    def test_featured_cards_keep_their_original_order_and_crops(self):
+        self.assertEqual(
+            [(card['name'], card['crop']) for card in self.kb.featured],
+            [('Rice Blast', 'Rice'), ('Yellow Rust', 'Wheat'), ('Late Blight', 'Tomato'),
+             ('Powdery Mildew', 'Multiple')],
+        )
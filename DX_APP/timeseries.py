@@ -0,0 +1,78 @@
+# DX_APP/timeseries.py
+"""
+Vectorised forecasting for many short daily series at once.
+
+Every function takes a 2-D array with one series per row and one day per
+column, so a few thousand crop x market series are fitted with a handful
+of NumPy operations per day of history instead of a Python loop per
+series. Kept free of Django imports so process-pool workers start cheaply.
+"""
+import numpy as np
+
+SEASON = 7  # weekly market cycle
+HOLT_PARAMS = [(alpha, beta) for alpha in (0.2, 0.5, 0.8) for beta in (0.05, 0.2)]
+METHODS = ['naive', 'seasonal_naive'] + [f'holt({alpha},{beta})' for alpha, beta in HOLT_PARAMS]
+
+
+def fill_gaps(values):
+    """Forward-fill NaNs along each row; leading NaNs take the first observed value."""
+    values = np.array(values, dtype=np.float64)
+    observed = ~np.isnan(values)
+    index = np.where(observed, np.arange(values.shape[1]), 0)
+    np.maximum.accumulate(index, axis=1, out=index)
+    filled = values[np.arange(len(values))[:, None], index]
+    first = np.argmax(observed, axis=1)
+    leading = np.arange(values.shape[1]) < first[:, None]
+    return np.where(leading, values[np.arange(len(values)), first][:, None], filled)
+
+
+def naive(values, horizon):
+    return np.repeat(values[:, -1:], horizon, axis=1)
+
+
+def seasonal_naive(values, horizon, season=SEASON):
+    last_season = values[:, -season:]
+    return last_season[:, np.arange(horizon) % season]
+
+
+def holt(values, horizon, alpha, beta):
+    """Holt's linear exponential smoothing, one pass over the days for all series."""
+    level = values[:, 0].copy()
+    trend = values[:, 1] - values[:, 0]
+    for day in range(1, values.shape[1]):
+        previous = level
+        level = alpha * values[:, day] + (1 - alpha) * (level + trend)
+        trend = beta * (level - previous) + (1 - beta) * trend
+    return level[:, None] + trend[:, None] * np.arange(1, horizon + 1)
+
+
+def all_forecasts(values, horizon):
+    """Forecasts of every method in METHODS, shape (methods, series, horizon)."""
+    return np.stack(
+        [naive(values, horizon), seasonal_naive(values, horizon)]
+        + [holt(values, horizon, alpha, beta) for alpha, beta in HOLT_PARAMS]
+    )
+
+
+def forecast(values, horizon):
+    """Pick the best method per series on a holdout of the last horizon days, then refit.
+
+    values must be gap-free (see fill_gaps) with at least horizon + SEASON
+    columns. Returns (method index per series, forecasts of shape
+    (series, horizon)).
+    """
+    history, holdout = values[:, :-horizon], values[:, -horizon:]
+    errors = np.abs(all_forecasts(history, horizon) - holdout).mean(axis=2)
+    best = np.argmin(errors, axis=0)
+    refit = all_forecasts(values, horizon)
+    return best, refit[best, np.arange(len(values))]
+
+
+def fit(values, horizon):
+    """Fill gaps and forecast; returns (method index, mean forecast, mean of the last season) per series.
+
+    The entry point for process-pool workers.
+    """
+    values = fill_gaps(values)
+    best, forecasts = forecast(values, horizon)
+    return best, forecasts.mean(axis=1), values[:, -SEASON:].mean(axis=1)
@@ -27,6 +27,17 @@ urlpatterns = [
 
     # Features
     path('market-insights/', views.market_insights, name='market_insights'),
+    path('market-insights/stream/', views.market_stream, name='market_stream'),
     path('disease-diagnosis/', views.disease_diagnosis, name='disease_diagnosis'),
 
+    # API
+    path('api/crop-recommendation/batch/', views.crop_recommendation_batch, name='crop_recommendation_batch'),
+    path('api/crop-recommendation/cache-stats/', views.crop_prediction_cache_stats, name='crop_prediction_cache_stats'),
+    path('internal/metrics/', views.metrics_endpoint, name='metrics'),
+    path('api/price-history/', views.price_history_api, name='price_history_api'),
+    path('api/jobs/recommendation-batch/', views.submit_recommendation_job, name='submit_recommendation_job'),
+    path('api/jobs/leaf-diagnosis/', views.submit_leaf_diagnosis_job, name='submit_leaf_diagnosis_job'),
+    path('api/jobs/<uuid:job_id>/', views.job_status, name='job_status'),
+    path('api/jobs/<uuid:job_id>/stream/', views.job_stream, name='job_stream'),
+
 ]
\ No newline at end of file
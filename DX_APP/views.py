@@ -1,100 +1,52 @@
 # DX_APP/views.py
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect
-from django.http import JsonResponse
+from django.urls import reverse
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import ValidationError
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib import messages
 from django.contrib.auth.models import User
+from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta
 import json
-import pickle
-import os
 
 # Import your forms
 from .forms import CropForm, UserRegistrationForm
+from . import crop_plans
+from . import recommendation
+from .diagnosis import diagnose, featured_diseases, with_image_evidence
+from .leaf_classifier import classify_leaf
+from . import jobs
+from . import live
+from . import market_data
+from . import metrics
+from . import price_history
+from .model_registry import registry as model_registry
+from .models import UserProfile
+from .page_cache import cached_page
+from .prediction_cache import cached_recommend, prediction_cache
 
-# Note: If you don't have these models, comment them out or create them
-# from .models import CropPrice, MarketNews, PriceAlert, DemandForecast
 from .forms import CropForm
 
-# ======================================================
-# LOAD ML MODEL
-# ======================================================
-MODEL_PATH = os.path.join(os.path.dirname(__file__), 'crop_recommendation_model.pkl')
-try:
-    with open(MODEL_PATH, 'rb') as f:
-        model = pickle.load(f)
-except FileNotFoundError:
-    model = None
-    print(f"Warning: Model file not found at {MODEL_PATH}")
-
-# ======================================================
-# CROP PLANS (EN / HI / MR)
-# ======================================================
-crop_plans_en = {
-    'rice': [
-        {'week': 1, 'task': 'Prepare field and add fertilizer', 'medicine': 'Fungus medicine', 'precaution': 'Keep water', 'icon': '🌱', 'tip': 'Use clean water'},
-        {'week': 2, 'task': 'Transplant seedlings', 'medicine': 'None', 'precaution': 'Do not let field dry', 'icon': '🌾', 'tip': 'Plant gently'},
-        {'week': 3, 'task': 'Add water', 'medicine': 'None', 'precaution': 'Check water level', 'icon': '💧', 'tip': 'Water in morning'},
-        {'week': 4, 'task': 'Look for bugs', 'medicine': 'Bug spray', 'precaution': 'Check leaves', 'icon': '🐛', 'tip': 'Use spray only if needed'},
-    ],
-    'wheat': [
-        {'week': 1, 'task': 'Sow seeds and add fertilizer', 'medicine': 'None', 'precaution': 'Keep soil moist', 'icon': '🌱', 'tip': 'Use good seeds'},
-        {'week': 2, 'task': 'Add water', 'medicine': 'None', 'precaution': 'Do not flood', 'icon': '💧', 'tip': 'Water in morning'},
-        {'week': 3, 'task': 'Remove weeds', 'medicine': 'Weed killer', 'precaution': 'Wear gloves', 'icon': '🌿', 'tip': 'Pull weeds by hand'},
-        {'week': 4, 'task': 'Check for disease', 'medicine': 'Fungus medicine', 'precaution': 'Check leaves', 'icon': '🍂', 'tip': 'Yellow spots mean disease'},
-    ],
-    'maize': [
-        {'week': 1, 'task': 'Plant seeds', 'medicine': 'None', 'precaution': 'Keep soil moist', 'icon': '🌽', 'tip': 'Use quality seeds'},
-        {'week': 2, 'task': 'Water regularly', 'medicine': 'None', 'precaution': 'Avoid overwatering', 'icon': '💧', 'tip': 'Morning watering is best'},
-        {'week': 3, 'task': 'Check for pests', 'medicine': 'Pest control', 'precaution': 'Wear protection', 'icon': '🐛', 'tip': 'Early detection helps'},
-        {'week': 4, 'task': 'Add fertilizer', 'medicine': 'None', 'precaution': 'Follow instructions', 'icon': '🧪', 'tip': 'Balance nutrients'},
-    ],
-}
-
-crop_plans_hi = {
-    'rice': [
-        {'week': 1, 'task': 'खेत तैयार करें और खाद डालें', 'medicine': 'फफूंदी दवा', 'precaution': 'पानी रखें', 'icon': '🌱', 'tip': 'साफ पानी का उपयोग करें'},
-        {'week': 2, 'task': 'पौधे लगाएं', 'medicine': 'कोई नहीं', 'precaution': 'खेत सूखने न दें', 'icon': '🌾', 'tip': 'धीरे से लगाएं'},
-        {'week': 3, 'task': 'पानी डालें', 'medicine': 'कोई नहीं', 'precaution': 'पानी स्तर जांचें', 'icon': '💧', 'tip': 'सुबह पानी डालें'},
-        {'week': 4, 'task': 'कीट जांचें', 'medicine': 'कीटनाशक', 'precaution': 'पत्ते जांचें', 'icon': '🐛', 'tip': 'आवश्यकता होने पर छिड़कें'},
-    ],
-    'wheat': [
-        {'week': 1, 'task': 'बीज बोएं और खाद डालें', 'medicine': 'कोई नहीं', 'precaution': 'मिट्टी नम रखें', 'icon': '🌱', 'tip': 'अच्छे बीज उपयोग करें'},
-        {'week': 2, 'task': 'पानी डालें', 'medicine': 'कोई नहीं', 'precaution': 'अधिक पानी न डालें', 'icon': '💧', 'tip': 'सुबह पानी डालें'},
-    ],
-}
-
-crop_plans_mr = {
-    'rice': [
-        {'week': 1, 'task': 'शेती तयार करा आणि खत घाला', 'medicine': 'बुरशी औषध', 'precaution': 'पाणी ठेवा', 'icon': '🌱', 'tip': 'स्वच्छ पाणी वापरा'},
-        {'week': 2, 'task': 'रोपे लावा', 'medicine': 'काही नाही', 'precaution': 'शेत कोरडे होऊ देऊ नका', 'icon': '🌾', 'tip': 'सावकाश लावा'},
-    ],
-}
-
 # ======================================================
 # HOME (CROP RECOMMENDATION) - MAIN VIEW
 # ======================================================
 def home(request):
     lang = request.GET.get('lang', 'en')
     
-    # Select crop plans based on language
-    if lang == 'en':
-        crop_plans = crop_plans_en
-    elif lang == 'hi':
-        crop_plans = crop_plans_hi
-    elif lang == 'mr':
-        crop_plans = crop_plans_mr
-    else:
-        crop_plans = crop_plans_en
-    
     form = CropForm(request.POST if request.method == 'POST' else None)
     result = None
     plan = None
     
     if request.method == 'POST' and form.is_valid():
-        if model:  # Check if model is loaded
+        loaded = model_registry.get()  # Loads lazily, reloads if the file changed
+        if loaded:
             data = [
                 form.cleaned_data['N'],
                 form.cleaned_data['P'],
@@ -105,9 +57,11 @@ def home(request):
                 form.cleaned_data['rainfall'],
             ]
             try:
-                prediction = model.predict([data])[0]
+                crops, _ = cached_recommend(loaded, [data])
+                prediction = crops[0]
                 result = f"Recommended Crop: {prediction}"
-                plan = crop_plans.get(prediction.lower())
+                # Only the (crop, lang) index is looked up here; the plan HTML comes from the fragment cache
+                plan = crop_plans.crop_plan(prediction, lang if lang in crop_plans.LANGUAGES else 'en')
             except:
                 result = "Error: Could not make prediction"
         else:
@@ -120,13 +74,199 @@ def home(request):
         'lang': lang
     })
 
+# ======================================================
+# CROP RECOMMENDATION BATCH API
+# ======================================================
+def _recommendation_rows(request, max_rows):
+    """Validated (n, 7) matrix of a JSON or CSV batch request, or an error JsonResponse."""
+    try:
+        if 'file' in request.FILES:
+            rows, errors = recommendation.rows_from_body(request.FILES['file'].read(), is_csv=True)
+        else:
+            rows, errors = recommendation.rows_from_body(request.body, request.content_type == 'text/csv')
+    except ValueError:
+        return JsonResponse({'error': 'Could not parse request body'}, status=400)
+    except ValidationError as e:
+        return JsonResponse({'error': e.messages[0]}, status=400)
+
+    if not rows:
+        return JsonResponse({'error': 'No rows supplied'}, status=400)
+    if len(rows) > max_rows:
+        return JsonResponse({'error': f'At most {max_rows} rows per request'}, status=400)
+
+    matrix, errors = recommendation.validate_rows(rows, errors)
+    if errors:
+        return JsonResponse({
+            'error': 'Invalid rows',
+            'rows': [{'row': index, 'errors': errors[index]} for index in sorted(errors)],
+        }, status=400)
+    return matrix
+
+@csrf_exempt
+@require_POST
+def crop_recommendation_batch(request):
+    """Recommend crops for a JSON or CSV batch of soil-test rows.
+
+    JSON bodies are a list of rows (or ``{"rows": [...]}``); CSV is accepted
+    as a ``text/csv`` body or as an uploaded ``file`` with a header row.
+    Batches above MAX_BATCH_ROWS go through the jobs API instead.
+    """
+    loaded = model_registry.get()
+    if not loaded:
+        return JsonResponse({'error': 'Model not loaded'}, status=503)
+
+    matrix = _recommendation_rows(request, recommendation.MAX_BATCH_ROWS)
+    if isinstance(matrix, JsonResponse):
+        return matrix
+
+    crops, confidences = cached_recommend(loaded, matrix)
+    return JsonResponse({
+        'count': len(matrix),
+        'results': [
+            {'crop': crop, 'confidence': round(confidence, 4)}
+            for crop, confidence in zip(crops.tolist(), confidences.tolist())
+        ],
+    })
+
+@staff_member_required
+def crop_prediction_cache_stats(request):
+    """Hit/miss counters of the prediction cache, for checking it offloads the model."""
+    if prediction_cache is None:
+        return JsonResponse({'enabled': False})
+    return JsonResponse({'enabled': True, **prediction_cache.stats()})
+
+# ======================================================
+# METRICS
+# ======================================================
+def metrics_endpoint(request):
+    """Request metrics in the Prometheus text format, for staff and scrapers with the METRICS bearer token."""
+    if not metrics.authorized(request):
+        raise Http404
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+# ======================================================
+# JOBS API
+# ======================================================
+def _job_accepted(job):
+    return JsonResponse({
+        'id': str(job.id),
+        'status': job.status,
+        'url': reverse('job_status', args=[job.id]),
+        'stream': reverse('job_stream', args=[job.id]),
+    }, status=202)
+
+def _job_refused(request):
+    """An error JsonResponse if request may not queue a job, else None.
+
+    Jobs take session users only (so CSRF applies), and each may have at
+    most JOBS['MAX_PENDING_PER_USER'] queued or running. Checked before the
+    body is read.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Log in to submit jobs'}, status=401)
+    limit = jobs.load_config()['MAX_PENDING_PER_USER']
+    if jobs.pending_count(request.user) >= limit:
+        return JsonResponse({'error': f'At most {limit} jobs may be queued at once'}, status=429)
+    return None
+
+def _batch_body(request, max_bytes):
+    """(body bytes, is_csv) of a batch job request, read as a stream rather than through request.body.
+
+    request.body is capped at DATA_UPLOAD_MAX_MEMORY_SIZE, far below what a
+    JOB_MAX_BATCH_ROWS batch takes. Returns an error JsonResponse instead
+    when the body is missing or larger than max_bytes.
+    """
+    too_large = JsonResponse({'error': f'At most {max_bytes} bytes per request'}, status=413)
+    if request.content_type == 'multipart/form-data':
+        upload = request.FILES.get('file')
+        if upload is None:
+            return JsonResponse({'error': 'No rows supplied'}, status=400)
+        if upload.size > max_bytes:
+            return too_large
+        return upload.read(), True
+    try:
+        if int(request.META.get('CONTENT_LENGTH') or 0) > max_bytes:
+            return too_large
+    except ValueError:
+        return JsonResponse({'error': 'Invalid Content-Length'}, status=400)
+    chunks, size = [], 0
+    while chunk := request.read(1024 * 1024):
+        size += len(chunk)
+        if size > max_bytes:
+            return too_large
+        chunks.append(chunk)
+    body = b''.join(chunks)
+    if not body.strip():
+        return JsonResponse({'error': 'No rows supplied'}, status=400)
+    return body, request.content_type == 'text/csv'
+
+@require_POST
+def submit_recommendation_job(request):
+    """Queue a crop recommendation batch of up to JOB_MAX_BATCH_ROWS rows (same body as the batch API).
+
+    The body is stored as sent; the worker parses and validates it, and an
+    invalid batch ends as a failed job whose result lists the bad rows.
+    """
+    refused = _job_refused(request)
+    if refused:
+        return refused
+    body = _batch_body(request, recommendation.JOB_MAX_BATCH_BYTES)
+    if isinstance(body, JsonResponse):
+        return body
+    data, is_csv = body
+    job = jobs.submit('recommendation_batch', {'format': 'csv' if is_csv else 'json'}, data=data, user=request.user)
+    return _job_accepted(job)
+
+@require_POST
+def submit_leaf_diagnosis_job(request):
+    """Queue a leaf image diagnosis; takes the disease diagnosis form fields with a required leaf_image."""
+    from .forms import DiseaseDiagnosisForm
+
+    refused = _job_refused(request)
+    if refused:
+        return refused
+
+    form = DiseaseDiagnosisForm(request.POST, request.FILES)
+    if not form.is_valid():
+        return JsonResponse({'error': 'Invalid form', 'fields': form.errors}, status=400)
+    leaf_image = form.cleaned_data.get('leaf_image')
+    if not leaf_image:
+        return JsonResponse({'error': 'leaf_image is required'}, status=400)
+    leaf_image.seek(0)
+    job = jobs.submit('leaf_diagnosis', {
+        'crop_type': form.cleaned_data['crop_type'],
+        'symptoms': form.cleaned_data['symptoms'],
+        'plant_part': form.cleaned_data['plant_part'],
+    }, data=leaf_image.read(), user=request.user)
+    return _job_accepted(job)
+
+def job_status(request, job_id):
+    """Status, and once finished the result or error, of a job."""
+    job = jobs.visible_job(job_id, request.user)
+    if job is None:
+        return JsonResponse({'error': 'Job not found or expired'}, status=404)
+    return JsonResponse(jobs.describe(job))
+
+async def job_stream(request, job_id):
+    """Server-sent events: a ``status`` event on every change, ending with the finished job."""
+    user = await request.auser()
+    job = await sync_to_async(jobs.visible_job)(job_id, user)
+    if job is None:
+        return JsonResponse({'error': 'Job not found or expired'}, status=404)
+    response = StreamingHttpResponse(live.job_events(job_id, user), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # let nginx pass events through unbuffered
+    return response
+
 # ======================================================
 # QUICK LINKS PAGES
 # ======================================================
+@cached_page
 def about(request):
     lang = request.GET.get('lang', 'en')
     return render(request, 'DX_APP/about.html', {'lang': lang})
 
+@cached_page
 def solutions(request):
     lang = request.GET.get('lang', 'en')
     return render(request, 'DX_APP/solutions.html', {'lang': lang})
@@ -142,22 +282,27 @@ def case_studies(request):
 # ======================================================
 # RESOURCES PAGES
 # ======================================================
+@cached_page
 def documentation(request):
     lang = request.GET.get('lang', 'en')
     return render(request, 'DX_APP/documentation.html', {'lang': lang})
 
+@cached_page
 def api_reference(request):
     lang = request.GET.get('lang', 'en')
     return render(request, 'DX_APP/api_reference.html', {'lang': lang})
 
+@cached_page
 def blog(request):
     lang = request.GET.get('lang', 'en')
     return render(request, 'DX_APP/blog.html', {'lang': lang})
 
+@cached_page
 def help_center(request):
     lang = request.GET.get('lang', 'en')
     return render(request, 'DX_APP/help_center.html', {'lang': lang})
 
+@cached_page
 def community(request):
     lang = request.GET.get('lang', 'en')
     return render(request, 'DX_APP/community.html', {'lang': lang})
@@ -203,53 +348,47 @@ def password_reset_view(request):
 def market_insights(request):
     lang = request.GET.get('lang', 'en')
     
-    # Sample data for market insights
-    crop_prices = [
-        {'name': 'Rice', 'grade': 'Grade A', 'min_price': 2200, 'max_price': 2800, 'avg_price': 2500, 
-         'trend': '+3.5', 'trend_icon': 'up', 'trend_color': 'success', 'market': 'APMC Mumbai', 'updated': '2 hours ago'},
-        {'name': 'Wheat', 'grade': 'Sharbati', 'min_price': 2400, 'max_price': 2600, 'avg_price': 2500, 
-         'trend': '-1.2', 'trend_icon': 'down', 'trend_color': 'danger', 'market': 'APMC Pune', 'updated': '1 hour ago'},
-        {'name': 'Maize', 'grade': 'Feed Grade', 'min_price': 1800, 'max_price': 2200, 'avg_price': 2000, 
-         'trend': '+2.8', 'trend_icon': 'up', 'trend_color': 'success', 'market': 'APMC Nagpur', 'updated': '3 hours ago'},
-    ]
-    
-    demand_forecast = [
-        {'crop': 'Rice', 'period': 'Next 30 days', 'demand_level': 'High', 'level_color': 'success', 'change': '+12'},
-        {'crop': 'Wheat', 'period': 'Next 45 days', 'demand_level': 'Medium', 'level_color': 'warning', 'change': '+5'},
-        {'crop': 'Vegetables', 'period': 'Next 15 days', 'demand_level': 'Very High', 'level_color': 'success', 'change': '+25'},
-    ]
-    
-    price_alerts = [
-        {'crop': 'Rice', 'message': 'Price crossed ₹2600 mark', 'priority': 'High', 'priority_color': 'danger', 'time': '10 min ago'},
-        {'crop': 'Cotton', 'message': 'Price drop alert triggered', 'priority': 'Medium', 'priority_color': 'warning', 'time': '1 hour ago'},
-    ]
-    
-    top_gainers = [
-        {'crop': 'Tomato', 'change': '+12.5'},
-        {'crop': 'Onion', 'change': '+8.3'},
-        {'crop': 'Potato', 'change': '+6.7'},
-    ]
-    
-    top_losers = [
-        {'crop': 'Wheat', 'change': '-3.2'},
-        {'crop': 'Maize', 'change': '-2.8'},
-        {'crop': 'Sugarcane', 'change': '-1.5'},
-    ]
-    
-    market_news = [
-        {'title': 'Government increases MSP for Kharif crops', 'summary': 'Minimum support price increased by 5-7%', 'category': 'Policy', 'category_color': 'info', 'time': '2 hours ago'},
-        {'title': 'Heavy rainfall affects vegetable supply', 'summary': 'Prices expected to rise due to supply chain', 'category': 'Weather', 'category_color': 'warning', 'time': '4 hours ago'},
-        {'title': 'Export demand increases for basmati rice', 'summary': 'International demand pushes prices up', 'category': 'Export', 'category_color': 'success', 'time': '6 hours ago'},
-    ]
+    # One projected, LIMITed query per section (see market_data.py)
+    state = request.GET.get('state')
+    market = request.GET.get('market')
+    crop_prices = market_data.latest_prices(crop_type=request.GET.get('crop'), state=state, market=market)
+    top_gainers, top_losers = market_data.top_movers(state=state, market=market)
     
     return render(request, 'DX_APP/market_insights.html', {
         'lang': lang,
         'crop_prices': crop_prices,
-        'demand_forecast': demand_forecast,
-        'price_alerts': price_alerts,
+        'demand_forecast': market_data.upcoming_forecasts(),
+        'price_alerts': market_data.triggered_alerts(request.user),
         'top_gainers': top_gainers,
         'top_losers': top_losers,
-        'market_news': market_news,
+        'market_news': market_data.latest_news(),
+    })
+
+async def market_stream(request):
+    """Server-sent events with changed prices and the user's new alerts (see live.py)."""
+    user = await request.auser()
+    stream = live.event_stream(user.id if user.is_authenticated else None)
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # let nginx pass events through unbuffered
+    return response
+
+def price_history_api(request):
+    """OHLC series for one crop in one market, read from the pre-aggregated rollups."""
+    name = request.GET.get('crop')
+    market = request.GET.get('market')
+    period = request.GET.get('period', 'day')
+    if not name or not market:
+        return JsonResponse({'error': 'crop and market are required'}, status=400)
+    if period not in price_history.PERIODS:
+        return JsonResponse({'error': f'period must be one of {", ".join(price_history.PERIODS)}'}, status=400)
+
+    return JsonResponse({
+        'crop': name,
+        'market': market,
+        'period': period,
+        'trend': price_history.trend(name, market, period),
+        'points': price_history.series(name, market, period),
     })
 
 # ======================================================
@@ -265,6 +404,7 @@ def footer(request):
     return render(request, 'DX_APP/footer.html')
 
 # In DX_APP/views.py
+@cached_page
 def pricing(request):
     lang = request.GET.get('lang', 'en')
     
@@ -483,6 +623,7 @@ def pricing(request):
     })
     
 # In DX_APP/views.py
+@cached_page
 def case_studies(request):
     lang = request.GET.get('lang', 'en')
     
@@ -721,12 +862,19 @@ def register_view(request):
         form = UserRegistrationForm(request.POST)
         if form.is_valid():
             try:
-                # Create user
-                user = form.save(commit=False)
-                user.email = form.cleaned_data['email']
-                user.first_name = form.cleaned_data['first_name']
-                user.last_name = form.cleaned_data['last_name']
-                user.save()
+                # Create user; alerts and notifications expect every user to have a profile
+                with transaction.atomic():
+                    user = form.save(commit=False)
+                    user.email = form.cleaned_data['email']
+                    user.first_name = form.cleaned_data['first_name']
+                    user.last_name = form.cleaned_data['last_name']
+                    user.save()
+                    UserProfile.objects.create(
+                        user=user,
+                        phone=form.cleaned_data['phone'],
+                        user_type=form.cleaned_data['user_type'],
+                        location=form.cleaned_data['location'],
+                    )
                 
                 # Store additional info in session
                 request.session['user_phone'] = form.cleaned_data['phone']
@@ -764,6 +912,8 @@ def disease_diagnosis(request):
     from .forms import DiseaseDiagnosisForm
     
     diagnosis_result = None
+    other_candidates = []
+    image_predictions = None
     treatment_plan = None
     
     if request.method == 'POST':
@@ -776,70 +926,18 @@ def disease_diagnosis(request):
             severity = form.cleaned_data['severity']
             weather = form.cleaned_data['weather_conditions']
             
-            # Sample disease database (in real app, use ML model)
-            disease_database = {
-                'rice': {
-                    'yellow_leaves': {
-                        'disease': 'Rice Blast',
-                        'confidence': 85,
-                        'description': 'Fungal disease causing spindle-shaped spots on leaves',
-                        'causes': 'High humidity and temperature between 25-30°C',
-                        'treatment': 'Apply fungicides like Tricyclazole or Azoxystrobin'
-                    },
-                    'brown_spots': {
-                        'disease': 'Brown Spot',
-                        'confidence': 78,
-                        'description': 'Circular brown spots with yellow halo',
-                        'causes': 'Poor soil nutrition and warm humid conditions',
-                        'treatment': 'Improve soil nutrition, apply Mancozeb'
-                    }
-                },
-                'wheat': {
-                    'yellow_rust': {
-                        'disease': 'Yellow Rust',
-                        'confidence': 92,
-                        'description': 'Yellow-orange pustules on leaves',
-                        'causes': 'Cool temperatures (10-15°C) with high humidity',
-                        'treatment': 'Use resistant varieties, apply Propiconazole'
-                    },
-                    'powdery_mildew': {
-                        'disease': 'Powdery Mildew',
-                        'confidence': 87,
-                        'description': 'White powdery growth on leaves and stems',
-                        'causes': 'Moderate temperatures with high humidity',
-                        'treatment': 'Apply Sulfur-based fungicides, improve air circulation'
-                    }
-                },
-                'tomato': {
-                    'late_blight': {
-                        'disease': 'Late Blight',
-                        'confidence': 90,
-                        'description': 'Water-soaked lesions on leaves and fruits',
-                        'causes': 'Cool wet conditions, Phytophthora infestans fungus',
-                        'treatment': 'Remove infected plants, apply Copper fungicides'
-                    },
-                    'early_blight': {
-                        'disease': 'Early Blight',
-                        'confidence': 82,
-                        'description': 'Target-like spots with concentric rings',
-                        'causes': 'Alternaria fungus, warm humid weather',
-                        'treatment': 'Apply Chlorothalonil, practice crop rotation'
-                    }
-                }
-            }
-            
-            # Simple symptom matching (in real app, use NLP/ML)
-            symptoms_lower = symptoms.lower()
-            possible_diseases = []
-            
-            # Check crop type in database
-            if crop_type in disease_database:
-                for symptom_key, disease_info in disease_database[crop_type].items():
-                    if symptom_key in symptoms_lower:
-                        possible_diseases.append(disease_info)
+            # Rank candidates from the indexed knowledge base (see diagnosis.py)
+            candidates = diagnose(crop_type, symptoms, plant_part)
+            leaf_image = form.cleaned_data.get('leaf_image')
+            if leaf_image:
+                image_predictions = classify_leaf(leaf_image)
+                if image_predictions:
+                    candidates = with_image_evidence(candidates, crop_type, image_predictions)
+            if candidates:
+                diagnosis_result, other_candidates = candidates[0], candidates[1:]
             
             # If no match found, provide general diagnosis
-            if not possible_diseases:
+            if diagnosis_result is None:
                 diagnosis_result = {
                     'disease': 'General Plant Stress',
                     'confidence': 65,
@@ -847,9 +945,6 @@ def disease_diagnosis(request):
                     'causes': f'Could be due to {weather if weather else "environmental factors"}, nutrient deficiency, or improper care.',
                     'treatment': 'Improve plant care, ensure proper watering, and monitor for changes.'
                 }
-            else:
-                # Get the most likely disease (highest confidence)
-                diagnosis_result = max(possible_diseases, key=lambda x: x['confidence'])
             
             # Generate treatment plan based on severity
             treatment_plan = generate_treatment_plan(diagnosis_result, severity, crop_type, lang)
@@ -858,44 +953,14 @@ def disease_diagnosis(request):
     else:
         form = DiseaseDiagnosisForm()
     
-    # Common diseases for quick selection
-    common_diseases = [
-        {
-            'name': 'Rice Blast',
-            'crop': 'Rice',
-            'symptoms': 'Spindle-shaped spots on leaves',
-            'icon': '🌾',
-            'color': 'danger'
-        },
-        {
-            'name': 'Yellow Rust',
-            'crop': 'Wheat',
-            'symptoms': 'Yellow-orange pustules',
-            'icon': '🌾',
-            'color': 'warning'
-        },
-        {
-            'name': 'Late Blight',
-            'crop': 'Tomato',
-            'symptoms': 'Water-soaked lesions',
-            'icon': '🍅',
-            'color': 'danger'
-        },
-        {
-            'name': 'Powdery Mildew',
-            'crop': 'Multiple',
-            'symptoms': 'White powdery growth',
-            'icon': '🍃',
-            'color': 'info'
-        }
-    ]
-    
     return render(request, 'DX_APP/disease_diagnosis.html', {
         'form': form,
         'lang': lang,
         'diagnosis_result': diagnosis_result,
         'treatment_plan': treatment_plan,
-        'common_diseases': common_diseases
+        'other_candidates': other_candidates,
+        'image_predictions': image_predictions,
+        'common_diseases': featured_diseases()
     })
 
 
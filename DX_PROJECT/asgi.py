@@ -3,6 +3,10 @@ ASGI config for DX_PROJECT project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server (e.g. ``uvicorn DX_PROJECT.asgi:application``)
+so the /market-insights/stream/ event streams wait on the event loop
+instead of holding a worker thread each.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
@@ -14,3 +18,13 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'DX_PROJECT.settings')
 
 application = get_asgi_application()
+
+# Build the disease symptom indexes and render the crop plans before the first request instead of during it.
+# The fixed pages are pre-rendered once per deploy by manage.py warm_page_cache, not by every worker.
+from DX_APP import crop_plans, diagnosis, static_pages  # noqa: E402
+
+diagnosis.warm_up()
+crop_plans.warm_up()
+
+# Anonymous requests for exported pages are answered before Django's middleware (manage.py export_static_pages)
+application = static_pages.wrap(application, asgi=True)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'DX_APP.metrics.RequestMetricsMiddleware',  # first, so it times the whole stack
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -54,7 +56,8 @@ ROOT_URLCONF = 'DX_PROJECT.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that reports render times to the request metrics (DX_APP/metrics.py)
+        'BACKEND': 'DX_APP.metrics.InstrumentedTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -116,6 +119,22 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'  # `manage.py collectstatic` builds here; serve it from the proxy
+
+# collectstatic minifies CSS, names every file by its content hash, writes
+# .gz/.br copies and a manifest that {% static %} reads (DX_APP/storage.py),
+# so browsers can cache assets forever.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'DX_APP.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
 
 # ========== AUTHENTICATION SETTINGS ==========
 
@@ -141,6 +160,110 @@ MESSAGE_TAGS = {
     messages.ERROR: 'danger',
 }
 
+# ========== PAGE CACHE SETTINGS ==========
+
+# Whole-page cache for the fixed pages (DX_APP/page_cache.py), keyed on
+# path + ?lang= + auth state. Point ALIAS at a shared cache (e.g. Redis) and
+# run `manage.py warm_page_cache` on deploy to pre-render them for all workers.
+PAGE_CACHE = {
+    'ENABLED': True,
+    'ALIAS': 'default',
+    'TIMEOUT': 86400,  # seconds
+    'MAX_AGE': 300,  # seconds browsers may reuse a page without revalidating
+    'LANGUAGES': ['en', 'hi', 'mr'],
+}
+
+# Prerendered copies of the same pages (DX_APP/static_pages.py), written by
+# `manage.py export_static_pages` and served ahead of the middleware stack to
+# visitors without a session cookie (or straight from ROOT by the proxy).
+STATIC_PAGES = {
+    'ENABLED': True,
+    'ROOT': BASE_DIR / 'prerendered',
+    'RELOAD_INTERVAL': 2,  # seconds between checks for a new export
+}
+
+# ========== ML MODEL SETTINGS ==========
+
+# Crop recommendation model, loaded lazily and reloaded when the file changes.
+# The .joblib export (manage.py export_crop_model, re-run whenever the .pkl
+# changes) is memory-mapped, so every worker shares one copy of the trees.
+CROP_MODEL_PATH = BASE_DIR / 'DX_APP' / 'crop_recommendation_model.joblib'
+CROP_MODEL_RELOAD_INTERVAL = 2  # seconds between checks of the model file
+
+# Cache of predictions keyed on rounded inputs (decimals per field).
+# Use 'BACKEND': 'django' to share hits between workers through CACHES[ALIAS].
+CROP_PREDICTION_CACHE = {
+    'ENABLED': True,
+    'BACKEND': 'local',
+    'ALIAS': 'default',
+    'TTL': 3600,  # seconds
+    'MAX_ENTRIES': 50000,  # above the batch API's 10000 rows
+    'MAX_INSERT': 2500,  # new entries one request may store
+    'ROUNDING': {'N': 0, 'P': 0, 'K': 0, 'temperature': 1, 'humidity': 1, 'ph': 2, 'rainfall': 1},
+}
+
+# Leaf image classifier (ml/train_leaf_model.py). Images are decoded and
+# classified in a pool of WORKERS threads; requests that cannot get one of
+# MAX_PENDING slots, or wait longer than TIMEOUT seconds, skip the image.
+LEAF_MODEL_PATH = BASE_DIR / 'DX_APP' / 'model_artifacts' / 'leaf_model.joblib'
+LEAF_CLASSIFIER = {
+    'WORKERS': 2,
+    'MAX_PENDING': 8,
+    'TIMEOUT': 2.0,  # seconds
+}
+
+# Disease knowledge base (DX_APP/diagnosis.py): seconds between checks of the
+# Disease/Symptom/Treatment tables for edits before the symptom index is rebuilt.
+DISEASE_KB_RELOAD_INTERVAL = 30
+
+# Weekly crop plans (DX_APP/crop_plans.py): seconds between re-reads of the plan
+# versions, and how long a rendered plan fragment stays in the cache.
+CROP_PLAN_RELOAD_INTERVAL = 30
+CROP_PLAN_CACHE_TIMEOUT = 86400
+
+# ========== NOTIFICATION SETTINGS ==========
+
+# Price alert delivery (manage.py dispatch_notifications). Email goes through
+# the EMAIL_* settings; SMS is POSTed as JSON to SMS_URL. Anything left out
+# falls back to DX_APP.notifications.DEFAULTS.
+NOTIFICATIONS = {
+    'SMS_URL': None,
+    'BATCH_SIZE': {'email': 50, 'sms': 100, 'app': 500},  # messages per provider call
+    'CONCURRENCY': {'email': 2, 'sms': 4, 'app': 1},  # provider calls in flight
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_SECONDS': 30,  # doubled after every failed attempt
+}
+
+# ========== METRICS SETTINGS ==========
+
+# Per-view request metrics (DX_APP/metrics.py): wall, SQL, template and
+# inference time, query counts and cache hits, served in the Prometheus
+# format at /internal/metrics/ to staff users and to scrapers sending
+# "Authorization: Bearer <TOKEN>". Requests slower than SLOW_REQUEST_SECONDS
+# are logged with that breakdown.
+METRICS = {
+    'ENABLED': True,
+    'SLOW_REQUEST_SECONDS': 1.0,
+    'TOKEN': os.environ.get('METRICS_TOKEN', ''),  # empty: staff only
+    'BUCKETS': [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0],  # seconds
+}
+
+# ========== BACKGROUND JOB SETTINGS ==========
+
+# Leaf diagnoses and large recommendation batches submitted through
+# /api/jobs/ run in `manage.py run_jobs` workers. CONCURRENCY caps running
+# jobs per kind and worker process; lower PRIORITY values run first. An
+# attempt still running after TIMEOUT seconds is given up on.
+# Anything left out falls back to DX_APP.jobs.DEFAULTS.
+JOBS = {
+    'CONCURRENCY': {'leaf_diagnosis': 4, 'recommendation_batch': 1},
+    'PRIORITY': {'leaf_diagnosis': 1, 'recommendation_batch': 5},
+    'TIMEOUT': {'leaf_diagnosis': 120, 'recommendation_batch': 1800},
+    'RESULT_TTL': 3600,  # seconds a finished job's result stays readable
+    'MAX_ATTEMPTS': 3,
+    'MAX_PENDING_PER_USER': 5,  # queued or running jobs per user
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/6.0/ref/settings/#default-auto-field
 
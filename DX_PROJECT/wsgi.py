@@ -14,3 +14,13 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'DX_PROJECT.settings')
 
 application = get_wsgi_application()
+
+# Build the disease symptom indexes and render the crop plans before the first request instead of during it.
+# The fixed pages are pre-rendered once per deploy by manage.py warm_page_cache, not by every worker.
+from DX_APP import crop_plans, diagnosis, static_pages  # noqa: E402
+
+diagnosis.warm_up()
+crop_plans.warm_up()
+
+# Anonymous requests for exported pages are answered before Django's middleware (manage.py export_static_pages)
+application = static_pages.wrap(application)
@@ -0,0 +1,192 @@
+"""
+data_loader.py
+Streaming, chunked loader for crop recommendation CSVs with a columnar .npy-style cache
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Compact dtypes: nutrients are whole numbers, the rest fit comfortably in float32
+DTYPES = {
+    'N': np.int16,
+    'P': np.int16,
+    'K': np.int16,
+    'temperature': np.float32,
+    'humidity': np.float32,
+    'ph': np.float32,
+    'rainfall': np.float32,
+}
+LABEL_COL = 'label'
+CHUNK_ROWS = 200_000
+
+
+def file_checksum(path, block_size=1 << 20):
+    """SHA-1 of a file, read in fixed-size blocks"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def iter_chunks(path, chunksize=CHUNK_ROWS):
+    """Yield DataFrames of at most chunksize rows with the compact dtypes.
+
+    Nutrient columns are parsed as float first so missing values survive;
+    they are narrowed to int16 by the caller once NaNs are dealt with.
+    """
+    dtypes = {col: (np.float32 if np.issubdtype(dtype, np.integer) else dtype) for col, dtype in DTYPES.items()}
+    dtypes[LABEL_COL] = 'category'
+    return pd.read_csv(path, dtype=dtypes, usecols=list(dtypes), chunksize=chunksize)
+
+
+class RunningStats:
+    """Count/missing/mean/std/min/max per column, merged chunk by chunk (Chan et al.)"""
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        size = len(self.columns)
+        self.rows = 0
+        self.count = np.zeros(size)
+        self.missing = np.zeros(size, dtype=np.int64)
+        self.mean = np.zeros(size)
+        self.m2 = np.zeros(size)
+        self.min = np.full(size, np.inf)
+        self.max = np.full(size, -np.inf)
+        self.label_counts = {}
+
+    def update(self, chunk):
+        values = chunk[self.columns].to_numpy(dtype=np.float64)
+        self.rows += len(values)
+        present = ~np.isnan(values)
+        count = present.sum(axis=0)
+        self.missing += len(values) - count
+        # Columns with no values in this chunk get weight 0 and leave the totals alone
+        mean = np.nansum(values, axis=0) / np.maximum(count, 1)
+        m2 = np.nansum((np.where(present, values, mean) - mean) ** 2, axis=0)
+        total = self.count + count
+        delta = mean - self.mean
+        weight = count / np.maximum(total, 1)
+        self.mean = self.mean + delta * weight
+        self.m2 = self.m2 + m2 + delta ** 2 * self.count * weight
+        self.count = total
+        self.min = np.minimum(self.min, np.where(present, values, np.inf).min(axis=0))
+        self.max = np.maximum(self.max, np.where(present, values, -np.inf).max(axis=0))
+
+        for label, n in chunk[LABEL_COL].value_counts(sort=False).items():
+            self.label_counts[label] = self.label_counts.get(label, 0) + int(n)
+
+    def describe(self):
+        """Same layout as DataFrame.describe() (without the quartiles)"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std = np.sqrt(self.m2 / (self.count - 1))
+        return pd.DataFrame(
+            [self.count, self.mean, std, self.min, self.max],
+            index=['count', 'mean', 'std', 'min', 'max'],
+            columns=self.columns,
+        )
+
+    def to_dict(self):
+        return {
+            'rows': self.rows,
+            'columns': self.columns,
+            'count': self.count.tolist(),
+            'missing': self.missing.tolist(),
+            'mean': self.mean.tolist(),
+            'm2': self.m2.tolist(),
+            'min': self.min.tolist(),
+            'max': self.max.tolist(),
+            'label_counts': self.label_counts,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls(data['columns'])
+        stats.rows = data['rows']
+        for name in ('count', 'mean', 'm2', 'min', 'max'):
+            setattr(stats, name, np.array(data[name], dtype=np.float64))
+        stats.missing = np.array(data['missing'], dtype=np.int64)
+        stats.label_counts = data['label_counts']
+        return stats
+
+
+def cache_dir_for(path, cache_root, checksum=None):
+    return os.path.join(cache_root, checksum or file_checksum(path))
+
+
+def scan_csv(path, cache_root='ml/cache/columns', chunksize=CHUNK_ROWS, checksum=None):
+    """One streaming pass over the CSV: EDA statistics plus a columnar cache.
+
+    Every column is appended to its own raw binary file as chunks are parsed,
+    so peak memory is one chunk regardless of file size. The cache directory
+    is named after the CSV's checksum (pass it in if already computed); if
+    it already exists the CSV is not parsed at all. Returns (stats, cache_dir).
+    """
+    checksum = checksum or file_checksum(path)
+    cache_dir = cache_dir_for(path, cache_root, checksum)
+    meta_path = os.path.join(cache_dir, 'meta.json')
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            return RunningStats.from_dict(json.load(f)['stats']), cache_dir
+
+    tmp_dir = cache_dir + '.tmp'
+    os.makedirs(tmp_dir, exist_ok=True)
+    stats = RunningStats(DTYPES)
+    labels = {}
+    files = {col: open(os.path.join(tmp_dir, f'{col}.bin'), 'wb') for col in [*DTYPES, LABEL_COL]}
+    try:
+        for chunk in iter_chunks(path, chunksize):
+            stats.update(chunk)
+            for col in DTYPES:
+                # Nutrient NaNs can't be stored as int16; keep them as float32 on disk
+                files[col].write(chunk[col].to_numpy(dtype=np.float32).tobytes())
+            for label in chunk[LABEL_COL].cat.categories:
+                labels.setdefault(label, len(labels))
+            codes = chunk[LABEL_COL].map(labels).astype('float').fillna(-1).to_numpy(np.int16)
+            files[LABEL_COL].write(codes.tobytes())
+    finally:
+        for f in files.values():
+            f.close()
+
+    meta = {
+        'source': os.path.abspath(path),
+        'checksum': checksum,
+        'rows': stats.rows,
+        'dtypes': {col: 'float32' for col in DTYPES},
+        'labels': list(labels),
+        'stats': stats.to_dict(),
+    }
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2, default=str)
+    os.replace(tmp_dir, cache_dir)
+    return stats, cache_dir
+
+
+def load_columns(cache_dir):
+    """Memory-map the cached columns; returns (dict of feature arrays, label codes, label names)"""
+    with open(os.path.join(cache_dir, 'meta.json')) as f:
+        meta = json.load(f)
+    shape = (meta['rows'],)
+    columns = {
+        col: np.memmap(os.path.join(cache_dir, f'{col}.bin'), dtype=dtype, mode='r', shape=shape)
+        for col, dtype in meta['dtypes'].items()
+    }
+    codes = np.memmap(os.path.join(cache_dir, f'{LABEL_COL}.bin'), dtype=np.int16, mode='r', shape=shape)
+    return columns, codes, meta['labels']
+
+
+def load_dataframe(cache_dir):
+    """Build the training DataFrame from the cache with compact dtypes
+
+    Nutrient columns become int16 only if they hold whole numbers and no gaps.
+    """
+    columns, codes, labels = load_columns(cache_dir)
+    df = pd.DataFrame({col: np.asarray(values) for col, values in columns.items()})
+    for col, dtype in DTYPES.items():
+        if np.issubdtype(dtype, np.integer) and (df[col] % 1 == 0).all():
+            df[col] = df[col].astype(dtype)
+    df[LABEL_COL] = pd.Categorical.from_codes(np.asarray(codes), categories=labels)
+    return df
@@ -0,0 +1,89 @@
+"""
+pipeline.py
+Content-addressed cache for the stages of the training pipeline
+"""
+import hashlib
+import inspect
+import json
+import os
+import time
+from collections import namedtuple
+
+import joblib
+import numpy
+import pandas
+import sklearn
+
+StageResult = namedtuple('StageResult', ['value', 'key'])
+
+# Library versions are part of every key: pickled frames/models may not load across them
+_ENVIRONMENT = f'numpy={numpy.__version__};pandas={pandas.__version__};sklearn={sklearn.__version__}'
+
+
+class StageCache:
+    """Skips pipeline stages whose inputs have not changed.
+
+    A stage's key hashes its name, the whole module that defines the stage
+    function (so a change to any helper it calls there counts) plus any
+    extra source files it depends on, its parameters, any external inputs
+    such as a data file checksum, and the keys of the upstream stages it
+    consumes. Its output is stored under that key, so when only the search
+    parameters change, load/preprocess/features/split are read back from
+    disk and only the training stage runs again. Code in other modules
+    counts only when listed in sources.
+
+    Source files are hashed once per StageCache, however many stages share
+    them.
+    """
+
+    def __init__(self, cache_dir='ml/cache/stages', enabled=True):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self._digests = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def file_digest(self, path):
+        path = os.path.abspath(path)
+        if path not in self._digests:
+            with open(path, 'rb') as f:
+                self._digests[path] = hashlib.sha1(f.read()).hexdigest()
+        return self._digests[path]
+
+    def key(self, name, func, params, inputs, after, sources):
+        digest = hashlib.sha1()
+        parts = [
+            name,
+            _ENVIRONMENT,
+            self.file_digest(inspect.getsourcefile(func)),
+            *(self.file_digest(path) for path in sources),
+            json.dumps(params, sort_keys=True, default=repr),
+            *inputs,
+            *(stage.key for stage in after),
+        ]
+        for part in parts:
+            digest.update(part.encode())
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def run(self, name, func, *args, params=None, inputs=(), after=(), sources=()):
+        """Call func(*args, **params), or load its output if this exact stage ran before.
+
+        args are the values handed to the function (usually parts of upstream
+        results); after lists the upstream StageResults they came from, whose
+        keys stand in for hashing the values themselves.
+        """
+        params = params or {}
+        key = self.key(name, func, params, inputs, after, sources)
+        path = os.path.join(self.cache_dir, f'{name}-{key}.joblib')
+
+        if self.enabled and os.path.exists(path):
+            print(f"[stage cache] {name}: unchanged, loaded {key[:12]}")
+            return StageResult(joblib.load(path), key)
+
+        started = time.monotonic()
+        value = func(*args, **params)
+        print(f"[stage cache] {name}: ran in {time.monotonic() - started:.1f}s, stored {key[:12]}")
+        if value is not None:
+            joblib.dump(value, path + '.tmp')
+            os.replace(path + '.tmp', path)
+        return StageResult(value, key)
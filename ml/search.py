@@ -0,0 +1,186 @@
+"""
+search.py
+Budgeted, resumable successive-halving search for the RandomForest hyperparameters
+"""
+import hashlib
+import json
+import math
+import os
+import time
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import ParameterGrid, StratifiedKFold, train_test_split
+
+
+def fingerprint(*arrays):
+    """Content hash of the training data, so cached folds/scores are only reused for the same data"""
+    digest = hashlib.sha1()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(str((array.dtype, array.shape)).encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def sample_candidates(param_grid, n_candidates, random_state):
+    """Pick n_candidates distinct settings from the grid (all of them if None)"""
+    grid = list(ParameterGrid(param_grid))
+    if n_candidates is None or n_candidates >= len(grid):
+        return grid
+    rng = np.random.RandomState(random_state)
+    return [grid[i] for i in sorted(rng.choice(len(grid), n_candidates, replace=False))]
+
+
+def plan_resources(n_samples, min_resources, factor):
+    """Training-set sizes for each rung, growing by factor up to the full set"""
+    n_rungs = 1 + int(math.floor(math.log(max(n_samples / min_resources, 1), factor)))
+    return [int(n_samples / factor ** (n_rungs - 1 - rung)) for rung in range(n_rungs)]
+
+
+def load_or_make_folds(path, y, resources, cv, random_state):
+    """Stratified subsample + CV folds per rung, cached on disk across runs"""
+    if os.path.exists(path):
+        with np.load(path) as cached:
+            return [
+                [(cached[f'r{rung}_train{k}'], cached[f'r{rung}_test{k}']) for k in range(cv)]
+                for rung in range(len(resources))
+            ]
+
+    folds, arrays = [], {}
+    indices = np.arange(len(y))
+    for rung, resource in enumerate(resources):
+        subset = indices
+        if resource < len(y):
+            subset, _ = train_test_split(indices, train_size=resource, stratify=y, random_state=random_state)
+        splitter = StratifiedKFold(n_splits=cv, shuffle=True, random_state=random_state)
+        rung_folds = [(subset[train], subset[test]) for train, test in splitter.split(subset, y[subset])]
+        for k, (train, test) in enumerate(rung_folds):
+            arrays[f'r{rung}_train{k}'] = train
+            arrays[f'r{rung}_test{k}'] = test
+        folds.append(rung_folds)
+
+    np.savez(path + '.tmp.npz', **arrays)
+    os.replace(path + '.tmp.npz', path)
+    return folds
+
+
+def _fit_fold(index, params, X, y, train, test, random_state):
+    """Score one candidate on one fold; single-threaded, the search parallelises across fits"""
+    model = RandomForestClassifier(random_state=random_state, n_jobs=1, **params)
+    model.fit(X[train], y[train])
+    return index, accuracy_score(y[test], model.predict(X[test]))
+
+
+def _trial_key(params, resource, data_hash, cv, random_state):
+    payload = json.dumps([params, resource, data_hash, cv, random_state], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def load_trials(path):
+    """Finished trials from earlier (possibly interrupted) runs, keyed by trial key"""
+    trials = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    trial = json.loads(line)
+                except ValueError:
+                    continue  # partially written last line of a killed run
+                trials[trial['key']] = trial
+    return trials
+
+
+def _ends_mid_line(path):
+    """True if a killed run left a partial last line, which the next trial must not be appended to"""
+    if not os.path.exists(path) or not os.path.getsize(path):
+        return False
+    with open(path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b'\n'
+
+
+def successive_halving_search(X, y, param_grid, n_candidates=60, factor=3, cv=5,
+                              time_budget=None, checkpoint_dir='ml/cache/search',
+                              random_state=42, n_jobs=-1, verbose=1):
+    """Successive halving over a sampled subset of param_grid.
+
+    Every candidate is scored with cv-fold CV on a small stratified subsample;
+    the best 1/factor move on to a factor-times larger one, until the last rung
+    uses the whole training set. All (candidate, fold) fits of a rung run in
+    parallel. Each finished trial is appended to trials.jsonl and the folds are
+    saved next to it, so an interrupted run resumes where it stopped and a
+    re-run on the same data only fits trials it has not seen. Once
+    time_budget (seconds) is used up, queued fits are cancelled and the best
+    candidate of the last rung reached is returned.
+
+    Returns (best_params, best_score, history).
+    """
+    X = np.asarray(X)
+    y = np.asarray(y)
+    started = time.monotonic()
+    os.makedirs(checkpoint_dir, exist_ok=True)
+
+    data_hash = fingerprint(X, y)
+    n_classes = len(np.unique(y))
+    resources = plan_resources(len(y), min_resources=max(2 * cv * n_classes, 1), factor=factor)
+    folds = load_or_make_folds(
+        os.path.join(checkpoint_dir, f'folds-{data_hash[:16]}-{cv}-{factor}-{random_state}.npz'),
+        y, resources, cv, random_state,
+    )
+
+    trials_path = os.path.join(checkpoint_dir, 'trials.jsonl')
+    trials = load_trials(trials_path)
+    candidates = sample_candidates(param_grid, n_candidates, random_state)
+    history = []
+    best_params, best_score = None, -np.inf
+
+    with open(trials_path, 'a') as log:
+        if _ends_mid_line(trials_path):
+            log.write('\n')
+        for rung, resource in enumerate(resources):
+            if time_budget is not None and time.monotonic() - started > time_budget:
+                print(f"Time budget of {time_budget}s used up before rung {rung}; stopping early")
+                break
+
+            keys = [_trial_key(params, resource, data_hash, cv, random_state) for params in candidates]
+            todo = [i for i, key in enumerate(keys) if key not in trials]
+            if verbose:
+                print(f"Rung {rung}: {len(candidates)} candidates on {resource} samples "
+                      f"({len(candidates) - len(todo)} cached, {len(todo) * cv} fits)")
+
+            fold_scores = {i: [] for i in todo}
+            results = Parallel(n_jobs=n_jobs, return_as='generator_unordered')(
+                delayed(_fit_fold)(i, candidates[i], X, y, train, test, random_state)
+                for i in todo for train, test in folds[rung]
+            )
+            for i, score in results:
+                fold_scores[i].append(score)
+                if len(fold_scores[i]) == cv:
+                    trial = {'key': keys[i], 'params': candidates[i], 'resource': resource,
+                             'score': float(np.mean(fold_scores[i]))}
+                    trials[keys[i]] = trial
+                    log.write(json.dumps(trial, default=str) + '\n')
+                    log.flush()
+                if time_budget is not None and time.monotonic() - started > time_budget:
+                    results.close()  # cancels the fits still queued
+                    break
+
+            finished = [i for i, key in enumerate(keys) if key in trials]
+            if not finished:
+                break
+            scores = {i: trials[keys[i]]['score'] for i in finished}
+            order = sorted(finished, key=scores.get, reverse=True)
+            best_params, best_score = candidates[order[0]], scores[order[0]]
+            history.append({'rung': rung, 'resource': resource, 'candidates': len(finished),
+                            'best_score': best_score})
+            if len(finished) < len(candidates):
+                print(f"Time budget of {time_budget}s used up during rung {rung}; stopping early")
+                break
+            candidates = [candidates[i] for i in order[:max(1, math.ceil(len(candidates) / factor))]]
+
+    if verbose:
+        print(f"Search finished in {time.monotonic() - started:.1f}s")
+    return best_params, best_score, history
@@ -0,0 +1,156 @@
+"""
+train_leaf_model.py
+Trains the leaf image disease classifier served by DX_APP/leaf_classifier.py
+
+Expects one sub-directory of images per class under the data directory,
+named like the PlantVillage dataset ("Tomato___Early_blight",
+"Tomato___healthy"), so predictions can be matched to the crop and the
+disease knowledge base.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, classification_report
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+# Shared with the serving path so training and inference build identical features
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from DX_APP.leaf_features import FEATURE_COUNT, FEATURE_VERSION, IMAGE_SIZE, extract
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+def list_images(data_dir, max_per_class=None):
+    """(paths, labels) of every image, one label per sub-directory"""
+    paths, labels = [], []
+    for label in sorted(os.listdir(data_dir)):
+        class_dir = os.path.join(data_dir, label)
+        if not os.path.isdir(class_dir):
+            continue
+        files = sorted(name for name in os.listdir(class_dir) if name.lower().endswith(IMAGE_EXTENSIONS))
+        for name in files[:max_per_class]:
+            paths.append(os.path.join(class_dir, name))
+            labels.append(label)
+    return paths, np.array(labels)
+
+
+def _extract_batch(paths, size):
+    features = np.zeros((len(paths), FEATURE_COUNT), dtype=np.float32)
+    readable = np.ones(len(paths), dtype=bool)
+    for i, path in enumerate(paths):
+        try:
+            features[i] = extract(path, size)
+        except (OSError, ValueError) as e:
+            print(f"  skipping {path}: {e}")
+            readable[i] = False
+    return features, readable
+
+
+def extract_features(paths, size=IMAGE_SIZE, n_jobs=-1, batch_size=256):
+    """Feature matrix of all images, decoded in parallel batches; unreadable images are masked out"""
+    batches = [paths[start:start + batch_size] for start in range(0, len(paths), batch_size)]
+    results = Parallel(n_jobs=n_jobs)(delayed(_extract_batch)(batch, size) for batch in batches)
+    if not results:
+        return np.zeros((0, FEATURE_COUNT), dtype=np.float32), np.zeros(0, dtype=bool)
+    return np.concatenate([r[0] for r in results]), np.concatenate([r[1] for r in results])
+
+
+def train(X_train, y_train, C=1.0):
+    """Standardised features into a multinomial logistic regression: tiny, fast on one CPU core"""
+    model = make_pipeline(StandardScaler(), LogisticRegression(C=C, max_iter=2000))
+    model.fit(X_train, y_train)
+    return model
+
+
+def measure_latency(model, paths, size, repeats=50):
+    """Per-image milliseconds for decode + features + predict_proba, as served"""
+    timings = []
+    for path in paths[:repeats]:
+        started = time.perf_counter()
+        model.predict_proba(extract(path, size).reshape(1, -1))
+        timings.append((time.perf_counter() - started) * 1000)
+    return np.percentile(timings, [50, 95]) if timings else (0.0, 0.0)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Train the leaf image disease classifier')
+    parser.add_argument('data_dir', help='Directory with one sub-directory of images per class')
+    parser.add_argument('--output', default='DX_APP/model_artifacts/leaf_model.joblib',
+                        help='Where to write the model (settings.LEAF_MODEL_PATH)')
+    parser.add_argument('--image-size', type=int, default=IMAGE_SIZE,
+                        help='Side of the square images are downsized to before feature extraction')
+    parser.add_argument('--max-per-class', type=int, default=None,
+                        help='Use at most this many images of each class')
+    parser.add_argument('--test-size', type=float, default=0.2)
+    parser.add_argument('--C', type=float, default=1.0, help='Inverse regularisation strength')
+    parser.add_argument('--jobs', type=int, default=-1, help='Processes for feature extraction')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    print("=== Leaf Image Classifier ===")
+    paths, labels = list_images(args.data_dir, args.max_per_class)
+    if len(set(labels)) < 2:
+        print(f"Error: need at least two class directories with images in {args.data_dir}")
+        return
+    print(f"Found {len(paths)} images in {len(set(labels))} classes")
+    print(pd.Series(labels).value_counts().to_string())
+
+    started = time.perf_counter()
+    X, readable = extract_features(paths, args.image_size, args.jobs)
+    X, labels = X[readable], labels[readable]
+    paths = [path for path, ok in zip(paths, readable) if ok]
+    print(f"\nExtracted {X.shape[1]} features from {len(X)} images in {time.perf_counter() - started:.1f}s")
+
+    X_train, X_test, y_train, y_test, paths_train, paths_test = train_test_split(
+        X, labels, paths, test_size=args.test_size, random_state=42, stratify=labels,
+    )
+    model = train(X_train, y_train, args.C)
+    predictions = model.predict(X_test)
+    accuracy = accuracy_score(y_test, predictions)
+    print(f"\nTest set accuracy: {accuracy:.4f}")
+    print(classification_report(y_test, predictions, zero_division=0))
+
+    p50, p95 = measure_latency(model, paths_test, args.image_size)
+    print(f"Inference latency per image: p50 {p50:.1f} ms, p95 {p95:.1f} ms")
+
+    artifacts = {
+        'model': model,
+        'labels': [str(label) for label in model.classes_],
+        'image_size': args.image_size,
+        'feature_version': FEATURE_VERSION,
+        'accuracy': float(accuracy),
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    joblib.dump(artifacts, args.output)
+    print(f"\nModel saved to: {args.output}")
+
+    metadata_path = os.path.splitext(args.output)[0] + '_metadata.json'
+    with open(metadata_path, 'w') as f:
+        json.dump({
+            'model_type': 'LogisticRegression',
+            'training_date': pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'num_images': len(X),
+            'classes': [str(label) for label in model.classes_],
+            'image_size': args.image_size,
+            'feature_version': FEATURE_VERSION,
+            'accuracy': float(accuracy),
+            'latency_ms': {'p50': float(p50), 'p95': float(p95)},
+        }, f, indent=2)
+    print(f"Metadata saved to: {metadata_path}")
+
+
+if __name__ == "__main__":
+    main()
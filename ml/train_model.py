@@ -3,6 +3,8 @@ train_model.py
 Trains an optimized RandomForest model on crop recommendation data
 """
 import os
+import sys
+import argparse
 import pandas as pd
 import numpy as np
 import pickle
@@ -13,23 +15,38 @@ from sklearn.metrics import classification_report, accuracy_score, confusion_mat
 import warnings
 warnings.filterwarnings('ignore')
 
+# Shared with the serving path so training and inference build identical features
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from DX_APP.features import INPUT_FEATURES, FEATURE_COLUMNS, build_features
+from DX_APP.forest import export_artifacts
+from search import successive_halving_search
+from data_loader import LABEL_COL, file_checksum, load_dataframe, scan_csv
+from pipeline import StageCache
+
 # Load and explore the dataset
-def load_and_explore_data():
-    """Load dataset and perform exploratory data analysis"""
+def load_and_explore_data(path='ml/Crop_recommendation.csv', cache_root='ml/cache/columns', checksum=None):
+    """Load dataset and perform exploratory data analysis
+
+    The CSV is read once in chunks (data_loader.scan_csv): the statistics are
+    computed on the fly and every column is written to a columnar cache, so
+    later runs on the same file skip CSV parsing entirely.
+    """
     try:
-        df = pd.read_csv('ml/Crop_recommendation.csv')
+        stats, cache_dir = scan_csv(path, cache_root, checksum=checksum)
+        df = load_dataframe(cache_dir)
         print(f"Dataset loaded successfully. Shape: {df.shape}")
+        print(f"Columnar cache: {cache_dir}")
         print("\nDataset Info:")
-        print(df.info())
+        df.info()
         print("\nFirst 5 rows:")
         print(df.head())
         print("\nColumn names:", df.columns.tolist())
         print("\nMissing values:")
-        print(df.isnull().sum())
+        print(pd.Series(stats.missing, index=stats.columns))
         print("\nDataset description:")
-        print(df.describe())
+        print(stats.describe())
         print("\nCrop distribution:")
-        print(df['label'].value_counts())
+        print(pd.Series(stats.label_counts, name=LABEL_COL).sort_values(ascending=False))
         
         return df
     except FileNotFoundError:
@@ -52,7 +69,7 @@ def preprocess_data(df):
     df_processed['label_encoded'] = label_encoder.fit_transform(df_processed['label'])
     
     # Get feature names
-    feature_cols = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+    feature_cols = list(INPUT_FEATURES)
     
     # Check for missing values
     if df_processed[feature_cols].isnull().sum().any():
@@ -76,32 +93,28 @@ def feature_engineering(df, feature_cols):
     """Create additional features to improve model performance"""
     print("\n=== Feature Engineering ===")
     
-    # Create interaction features (domain knowledge about crop requirements)
-    df['N_P_ratio'] = df['N'] / (df['P'] + 1)  # N to P ratio
-    df['N_K_ratio'] = df['N'] / (df['K'] + 1)  # N to K ratio
-    df['temp_humidity'] = df['temperature'] * df['humidity'] / 100  # Combined weather factor
-    df['nutrient_sum'] = df['N'] + df['P'] + df['K']  # Total nutrients
-    
-    # Create categorical features based on optimal ranges (simplified)
-    df['ph_category'] = pd.cut(df['ph'], 
-                               bins=[0, 5.5, 6.5, 7.5, 8.5, 14],
-                               labels=['acidic', 'slightly_acidic', 'neutral', 'slightly_alkaline', 'alkaline'])
-    
-    # One-hot encode categorical features
-    df = pd.get_dummies(df, columns=['ph_category'], drop_first=True)
-    
-    # Update feature columns
-    new_feature_cols = feature_cols + [
-        'N_P_ratio', 'N_K_ratio', 'temp_humidity', 'nutrient_sum',
-        'ph_category_slightly_acidic', 'ph_category_neutral', 
-        'ph_category_slightly_alkaline', 'ph_category_alkaline'
-    ]
+    # Interaction features and one-hot pH buckets (see DX_APP/features.py)
+    engineered = build_features(df[feature_cols].to_numpy(dtype=np.float64))
+    new_feature_cols = list(FEATURE_COLUMNS)
+    added_cols = new_feature_cols[len(feature_cols):]
+    df[added_cols] = engineered[:, len(feature_cols):]
     
     print(f"Added {len(new_feature_cols) - len(feature_cols)} new features")
     return df, new_feature_cols
 
-def train_optimized_model(X_train, y_train, X_test, y_test):
-    """Train and optimize RandomForest model"""
+def split_data(df, feature_cols, test_size=0.2, random_state=42):
+    """Stratified train/test split of the engineered features"""
+    X = df[feature_cols]
+    y = df['label_encoded']
+    return train_test_split(X, y, test_size=test_size, random_state=random_state, stratify=y)
+
+def train_optimized_model(X_train, y_train, X_test, y_test, search='halving', time_budget=None,
+                          n_candidates=60, checkpoint_dir='ml/cache/search'):
+    """Train and optimize RandomForest model
+
+    search='halving' runs the budgeted, resumable successive-halving search
+    from search.py; search='grid' runs the exhaustive GridSearchCV.
+    """
     print("\n=== Model Training ===")
     
     # Base model for comparison
@@ -124,23 +137,36 @@ def train_optimized_model(X_train, y_train, X_test, y_test):
         'bootstrap': [True, False]
     }
     
-    # Create and fit GridSearchCV
-    rf = RandomForestClassifier(random_state=42, n_jobs=-1)
-    grid_search = GridSearchCV(
-        estimator=rf,
-        param_grid=param_grid,
-        cv=5,
-        n_jobs=-1,
-        verbose=1,
-        scoring='accuracy'
-    )
-    
-    grid_search.fit(X_train, y_train)
+    if search == 'grid':
+        # Exhaustive: 432 configurations x 5 folds
+        rf = RandomForestClassifier(random_state=42, n_jobs=-1)
+        grid_search = GridSearchCV(
+            estimator=rf,
+            param_grid=param_grid,
+            cv=5,
+            n_jobs=-1,
+            verbose=1,
+            scoring='accuracy'
+        )
+        grid_search.fit(X_train, y_train)
+        best_model = grid_search.best_estimator_
+        best_params, best_score = grid_search.best_params_, grid_search.best_score_
+    else:
+        best_params, best_score, _ = successive_halving_search(
+            X_train, y_train, param_grid,
+            n_candidates=n_candidates,
+            cv=5,
+            time_budget=time_budget,
+            checkpoint_dir=checkpoint_dir,
+            random_state=42,
+        )
+        # Refit the winner on the full training set
+        best_model = RandomForestClassifier(random_state=42, n_jobs=-1, **best_params)
+        best_model.fit(X_train, y_train)
     
     # Get best model
-    best_model = grid_search.best_estimator_
-    print(f"\nBest parameters: {grid_search.best_params_}")
-    print(f"Best cross-validation score: {grid_search.best_score_:.4f}")
+    print(f"\nBest parameters: {best_params}")
+    print(f"Best cross-validation score: {best_score:.4f}")
     
     # Evaluate on test set
     y_pred = best_model.predict(X_test)
@@ -160,7 +186,7 @@ def train_optimized_model(X_train, y_train, X_test, y_test):
     print("\n=== Top 10 Feature Importances ===")
     print(feature_importance.head(10))
     
-    return best_model, grid_search.best_params_
+    return best_model, best_params
 
 def save_model_and_artifacts(model, label_encoder, feature_cols, best_params, accuracy):
     """Save the trained model and related artifacts"""
@@ -173,7 +199,7 @@ def save_model_and_artifacts(model, label_encoder, feature_cols, best_params, ac
         'feature_columns': feature_cols,
         'model_parameters': best_params,
         'accuracy': accuracy,
-        'input_features': ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+        'input_features': list(INPUT_FEATURES)
     }
     
     # Define save path
@@ -189,6 +215,11 @@ def save_model_and_artifacts(model, label_encoder, feature_cols, best_params, ac
         pickle.dump(artifacts, f)
     
     print(f"Model and artifacts saved to: {model_path}")
+    
+    # Uncompressed joblib copy with a flattened forest; the serving registry
+    # memory-maps it (mmap_mode='r') so workers share one copy of the trees
+    joblib_path = export_artifacts(model_path, os.path.join(save_dir, 'crop_recommendation_model.joblib'))
+    print(f"Memory-mappable copy saved to: {joblib_path}")
     print(f"Model accuracy: {accuracy:.4f}")
     
     # Save metadata
@@ -211,37 +242,85 @@ def save_model_and_artifacts(model, label_encoder, feature_cols, best_params, ac
     
     return model_path
 
+def parse_args():
+    parser = argparse.ArgumentParser(description='Train the crop recommendation model')
+    parser.add_argument('--search', choices=['halving', 'grid'], default='halving',
+                        help='Hyperparameter search strategy (default: halving)')
+    parser.add_argument('--time-budget', type=float, default=None,
+                        help='Stop the halving search after this many seconds')
+    parser.add_argument('--n-candidates', type=int, default=60,
+                        help='Parameter settings sampled from the grid for halving (0 = all)')
+    parser.add_argument('--checkpoint-dir', default='ml/cache/search',
+                        help='Where finished trials and CV folds are kept for resuming')
+    parser.add_argument('--stage-cache-dir', default='ml/cache/stages',
+                        help='Where outputs of unchanged pipeline stages are kept')
+    parser.add_argument('--no-stage-cache', action='store_true',
+                        help='Re-run every stage even if its inputs are unchanged')
+    return parser.parse_args()
+
 def main():
     """Main execution function"""
+    args = parse_args()
     print("=" * 60)
     print("CROP RECOMMENDATION MODEL TRAINING")
     print("=" * 60)
     
-    # Step 1: Load and explore data
-    df = load_and_explore_data()
-    if df is None:
+    data_path = 'ml/Crop_recommendation.csv'
+    if not os.path.exists(data_path):
+        print("Error: Crop_recommendation.csv not found!")
+        print("Make sure the file exists in the 'ml' directory")
+        return
+    
+    # Each stage is keyed on its code, parameters and upstream keys and is
+    # skipped when none of them changed (see pipeline.py)
+    stages = StageCache(args.stage_cache_dir, enabled=not args.no_stage_cache)
+    ml_dir = os.path.dirname(os.path.abspath(__file__))
+    
+    # Step 1: Load and explore data (the CSV is hashed once, for the stage key and the columnar cache)
+    loaded = stages.run(
+        'load', load_and_explore_data,
+        params={'path': data_path, 'checksum': file_checksum(data_path)},
+        sources=[os.path.join(ml_dir, 'data_loader.py')],
+    )
+    if loaded.value is None:
         return
     
     # Step 2: Preprocess data
-    df_processed, feature_cols, label_encoder = preprocess_data(df)
+    processed = stages.run('preprocess', preprocess_data, loaded.value, after=[loaded])
+    df_processed, feature_cols, label_encoder = processed.value
     
     # Step 3: Feature engineering
-    df_engineered, enhanced_feature_cols = feature_engineering(df_processed, feature_cols)
-    
-    # Prepare data
-    X = df_engineered[enhanced_feature_cols]
-    y = df_engineered['label_encoded']
+    engineered = stages.run(
+        'features', feature_engineering, df_processed, feature_cols,
+        after=[processed],
+        sources=[os.path.join(os.path.dirname(ml_dir), 'DX_APP', 'features.py')],
+    )
+    df_engineered, enhanced_feature_cols = engineered.value
     
     # Split data
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=y
+    split = stages.run(
+        'split', split_data, df_engineered, enhanced_feature_cols,
+        params={'test_size': 0.2, 'random_state': 42},
+        after=[engineered],
     )
+    X_train, X_test, y_train, y_test = split.value
     
     print(f"\nTraining set: {X_train.shape}")
     print(f"Test set: {X_test.shape}")
     
     # Step 4: Train optimized model
-    model, best_params = train_optimized_model(X_train, y_train, X_test, y_test)
+    trained = stages.run(
+        'train', train_optimized_model, X_train, y_train, X_test, y_test,
+        params={
+            'search': args.search,
+            'time_budget': args.time_budget,
+            'n_candidates': args.n_candidates or None,
+            'checkpoint_dir': args.checkpoint_dir,
+        },
+        after=[split],
+        sources=[os.path.join(ml_dir, 'search.py')],
+    )
+    model, best_params = trained.value
     
     # Step 5: Save model and artifacts
     y_pred = model.predict(X_test)